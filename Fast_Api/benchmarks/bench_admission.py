@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks.loadgen import make_requests, run_load, synthetic_rows
+
+# Допуск запросов под перегрузкой: пакетные клиенты (/predict_batch) насыщают сервис, параллельно
+# идёт бот — /predict с постоянной частотой. Для каждой конфигурации поднимается отдельный uvicorn
+# с нужными ADMISSION_*; в отчёте — задержка бота, пропускная способность bulk и отказы по причинам.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_admission --bulk-clients 16 --duration 20
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    "без допуска": {"ADMISSION_ENABLED": "false"},
+    "допуск, без приоритетов": {"ADMISSION_ENABLED": "true", "ADMISSION_BULK_MAX_IN_FLIGHT": "0"},
+    "допуск, bulk ≤ 2": {"ADMISSION_ENABLED": "true", "ADMISSION_BULK_MAX_IN_FLIGHT": "2"},
+}
+
+
+def _start_server(port, env):
+    process = subprocess.Popen([sys.executable, "run_api.py"], cwd=API_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, env={**os.environ, "API_PORT": str(port), **env})
+    import httpx
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("API не поднялся за 120 с")
+
+
+async def _scenario(url, args, interactive, bulk):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.bulk_clients + 8)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        (bot, _, _), (batches, elapsed, _) = await asyncio.gather(
+            run_load(client, "/predict", interactive, concurrency=8, rate=args.rate, duration=args.duration),
+            run_load(client, "/predict_batch", bulk, concurrency=args.bulk_clients, rate=None,
+                     duration=args.duration))
+        stats = (await client.get("/admission/stats")).json()
+    return bot, batches, elapsed, stats
+
+
+def _codes(results):
+    codes = {}
+    for _, outcome in results:
+        codes[str(outcome)] = codes.get(str(outcome), 0) + 1
+    return " ".join(f"{code}:{count}" for code, count in sorted(codes.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Задержка бота при перегрузке пакетными запросами")
+    parser.add_argument("--bulk-clients", type=int, default=16, help="Одновременных клиентов /predict_batch")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=5.0, help="Запросов бота в секунду")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Таймаут клиента, с (как у бота)")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args(argv)
+
+    rows = synthetic_rows(args.bulk_clients * args.batch_size * 4)
+    interactive = make_requests(rows[:1000], "/predict", 1)
+    bulk = make_requests(rows, "/predict_batch", args.batch_size)
+
+    header = f"{'Конфигурация':24} | {'бот p50':>9} | {'бот p99':>9} | {'коды бота':>22} | " \
+             f"{'строк/с':>8} | {'коды bulk':>24}"
+    print(header)
+    print("-" * len(header))
+    for name, env in CONFIGS.items():
+        process = _start_server(args.port, env)
+        try:
+            bot, batches, elapsed, stats = asyncio.run(
+                _scenario(f"http://127.0.0.1:{args.port}", args, interactive, bulk))
+        finally:
+            process.terminate()
+            process.wait()
+        latencies = np.array([latency for latency, outcome in bot if outcome == 200]) * 1000
+        done = sum(outcome == 200 for _, outcome in batches)
+        p50, p99 = (f"{np.percentile(latencies, q):6.0f} ms" if len(latencies) else "—" for q in (50, 99))
+        print(f"{name:24} | {p50:>9} | {p99:>9} | {_codes(bot):>22} | "
+              f"{done * args.batch_size / elapsed:8.0f} | {_codes(batches):>24}")
+        if stats["enabled"]:
+            print(f"{'':24}   отклонено: " + ", ".join(
+                f"{priority}: {sum(s['shed'].values())}" for priority, s in stats["classes"].items()))
+
+
+if __name__ == "__main__":
+    main()
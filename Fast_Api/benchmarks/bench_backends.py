@@ -0,0 +1,52 @@
+import os
+import joblib
+import numpy as np
+from serving.settings import MODELS_DIR
+from serving.backends import build_backend
+from serving.model_store import warmup_batch
+from benchmarks.bench_tree_engine import _timings
+
+# Задержка и точность всех бэкендов инференса (native / compiled / onnx) на этой машине.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_backends
+
+MODELS = ["RandomForest_Sleep.pkl", "XGBoost_Sleep.pkl"]
+BACKENDS = ["native", "compiled", "onnx"]
+
+
+def main(repeats=200, batch_sizes=(100, 1000)):
+    X = warmup_batch(max(batch_sizes), random_state=42)
+
+    header = f"{'Модель':22} | {'Бэкенд':8} | {'1 строка p50':>12} | {'1 строка p99':>12} | "
+    header += " | ".join(f"{f'{size} строк p50':>14}" for size in batch_sizes)
+    header += f" | {'макс. расхождение':>17} | {'метки':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for file_name in MODELS:
+        native = joblib.load(os.path.join(MODELS_DIR, file_name))
+        reference = native.predict_proba(X)
+
+        for backend_name in BACKENDS:
+            try:
+                engine = build_backend(backend_name, native)
+            except (ValueError, ImportError) as e:
+                print(f"{file_name:22} | {backend_name:8} | недоступен: {e}")
+                continue
+
+            probs = engine.predict_proba(X)
+            diff = float(np.max(np.abs(reference - probs)))
+            agreement = float(np.mean(reference.argmax(axis=1) == probs.argmax(axis=1)))
+
+            single = _timings(engine.predict_proba, X[:1], repeats)
+            row = f"{file_name:22} | {backend_name:8} | {np.percentile(single, 50):9.3f} ms | " \
+                  f"{np.percentile(single, 99):9.3f} ms | "
+            row += " | ".join(
+                f"{np.percentile(_timings(engine.predict_proba, X[:size], max(repeats // size, 5)), 50):11.3f} ms"
+                for size in batch_sizes
+            )
+            row += f" | {diff:17.1e} | {agreement:7.2%}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from serving.schema import FEATURES
+from benchmarks.bench_executor import SAMPLES_PATH
+
+# /predict_batch в JSON против бинарной матрицы (f4/f8) и Arrow IPC на одном и том же пакете.
+# Запросы идут в приложение напрямую через httpx.ASGITransport; время включает
+# сериализацию запроса на стороне клиента и разбор ответа.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_binary_format --rows 1000
+
+
+def _payloads(rows):
+    with open(SAMPLES_PATH) as f:
+        samples = json.load(f)
+    rng = np.random.default_rng(0)
+    records = [{**samples[i % len(samples)], "Age": float(rng.uniform(18, 65))} for i in range(rows)]
+    X = np.array([[r[c] for c in FEATURES] for r in records])
+
+    payloads = {
+        "json": ({"json": records}, lambda r: r.json()["predictions"]),
+        "matrix f8": ({"content": X.astype("<f8").tobytes(), "headers": {
+            "Content-Type": "application/x-sleep-matrix; dtype=f8", "X-Columns": ",".join(FEATURES)}},
+            lambda r: np.frombuffer(r.content, dtype="<f8")),
+        "matrix f4": ({"content": X.astype("<f4").tobytes(), "headers": {
+            "Content-Type": "application/x-sleep-matrix; dtype=f4", "X-Columns": ",".join(FEATURES)}},
+            lambda r: np.frombuffer(r.content, dtype="<f4")),
+    }
+    try:
+        import pyarrow as pa
+
+        table = pa.table({c: X[:, i].astype(np.float32) for i, c in enumerate(FEATURES)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        payloads["arrow f4"] = ({"content": sink.getvalue().to_pybytes(),
+                                 "headers": {"Content-Type": "application/vnd.apache.arrow.stream"}},
+                                lambda r: pa.ipc.open_stream(r.content).read_all())
+    except ImportError:
+        print("⚠️ pyarrow не установлен — Arrow пропущен")
+    return payloads
+
+
+async def _run(rows, repeats):
+    import httpx
+    import run_api
+
+    run_api.load_model()
+    payloads = _payloads(rows)
+    results = {}
+    transport = httpx.ASGITransport(app=run_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, (request, decode) in payloads.items():
+            latencies = []
+            for i in range(repeats + 3):
+                start = time.perf_counter()
+                response = await client.post("/predict_batch", **request)
+                response.raise_for_status()
+                decode(response)
+                if i >= 3:  # первые запросы — прогрев
+                    latencies.append(time.perf_counter() - start)
+            size = len(request["content"]) if "content" in request else len(json.dumps(request["json"]))
+            results[name] = (size, np.median(latencies) * 1000)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args.rows, args.repeats))
+    print(f"{'Формат':10} | {'тело, KB':>9} | {'p50 пакета':>11} | {'строк/с':>9}")
+    print("-" * 50)
+    for name, (size, p50_ms) in results.items():
+        print(f"{name:10} | {size / 1024:>9.1f} | {p50_ms:>8.2f} ms | {args.rows / p50_ms * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
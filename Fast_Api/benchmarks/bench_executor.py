@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from serving.settings import BASE_DIR
+
+# Пропускная способность API: модель в потоках FastAPI (thread) против пула процессов (process).
+# Каждый режим запускается в отдельном процессе (настройки читаются из env при импорте run_api),
+# запросы идут в приложение напрямую через httpx.ASGITransport, кэш и таблица ответов отключены.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_executor --concurrency 16 --requests 2000
+
+SAMPLES_PATH = os.path.join(BASE_DIR, "..", "tests", "Json_test_samples", "api_test_features_collinearity.json")
+
+
+async def measure(client, path, payloads, concurrency):
+    """Гоняет payloads с заданным числом одновременных запросов, возвращает запросов/с и p50/p99."""
+    latencies = []
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    async def worker():
+        while not queue.empty():
+            payload = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return {
+        "rps": round(len(payloads) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+async def _run_mode(n_requests, concurrency, batch_size):
+    import httpx
+    import run_api
+
+    with open(SAMPLES_PATH) as f:
+        samples = json.load(f)
+    # Уникальные строки, чтобы ни один запрос не схлопнулся в кэше
+    rng = np.random.default_rng(0)
+    rows = [{**samples[i % len(samples)], "Age": float(rng.uniform(18, 65))} for i in range(n_requests)]
+    batches = [rows[i:i + batch_size] for i in range(0, n_requests, batch_size)]
+
+    run_api.load_model()
+    try:
+        transport = httpx.ASGITransport(app=run_api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await measure(client, "/predict", rows[:concurrency], concurrency)  # прогрев
+            single = await measure(client, "/predict", rows, concurrency)
+            batch = await measure(client, "/predict_batch", batches, concurrency)
+    finally:
+        run_api.store.close()
+    return {"predict": single, "predict_batch": batch}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--mode", choices=["thread", "process"], help="Внутренний флаг: один режим в этом процессе")
+    args = parser.parse_args()
+
+    if args.mode:
+        result = asyncio.run(_run_mode(args.requests, args.concurrency, args.batch_size))
+        print(json.dumps(result))
+        return
+
+    print(f"{'Исполнитель':12} | {'эндпоинт':14} | {'запросов/с':>10} | {'p50':>9} | {'p99':>9}")
+    print("-" * 66)
+    for mode in ("thread", "process"):
+        env = {**os.environ, "INFERENCE_EXECUTOR": mode, "PREDICTION_CACHE_SIZE": "0",
+               "ANSWER_TABLE_PATH": os.path.join(BASE_DIR, "models", "no_answer_table")}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_executor", "--mode", mode, "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--batch-size", str(args.batch_size)],
+            env=env, cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for endpoint, stats in result.items():
+            print(f"{mode:12} | {endpoint:14} | {stats['rps']:>10} | {stats['p50_ms']:>6} ms | {stats['p99_ms']:>6} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import time
+import tracemalloc
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from benchmarks.loadgen import synthetic_rows
+from serving.drift import DEFAULT_DATA_PATH
+from serving.schema import FEATURES
+from serving.settings import MODELS_DIR
+
+# float64 против float32 (INFERENCE_DTYPE в API, DATA_DTYPE в обучении): задержка и пик памяти
+# на вызов модели вместе со сборкой матрицы из строк запроса (как в /predict и /predict_batch),
+# обучение на train и совпадение предсказаний на test. Разбиение — как в load_data:
+# TEST_SIZE=0.1, VALIDATION_SIZE=0.2, RANDOM_STATE=42 (ml_experiments/config/experiment_config.py).
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_float32
+
+DTYPES = (np.float64, np.float32)
+TRAINERS = {
+    "RandomForest": lambda: RandomForestClassifier(n_estimators=200, max_depth=20, min_samples_split=5,
+                                                   class_weight="balanced", random_state=42),
+    "LogisticRegression": lambda: Pipeline([("scaler", StandardScaler()),
+                                            ("model", LogisticRegression(C=1, max_iter=1000))]),
+}
+
+
+def load_split():
+    """(x_train, y_train, x_test, y_test) в float64, как load_data (valid отделяется и не используется)."""
+    data = pd.read_csv(DEFAULT_DATA_PATH)
+    rest, test = train_test_split(data, test_size=0.1, stratify=data["sleep_efficiency_label"], random_state=42)
+    train, _ = train_test_split(rest, test_size=0.2 / 0.9, stratify=rest["sleep_efficiency_label"], random_state=42)
+    return (train[FEATURES].to_numpy(), train["sleep_efficiency_label"].to_numpy(),
+            test[FEATURES].to_numpy(), test["sleep_efficiency_label"].to_numpy())
+
+
+def _p50_ms(fn, repeats):
+    fn()
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times) * 1000)
+
+
+def _peak_kb(fn):
+    """Пик памяти, выделенной за вызов (NumPy сообщает свои буферы в tracemalloc), КБ."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def inference(x_test, repeats=300, batch_size=1000):
+    rows = [[row[feature] for feature in FEATURES] for row in synthetic_rows(batch_size)]
+    header = f"{'Модель':14} | {'dtype':7} | {'1 строка p50':>12} | {f'{batch_size} строк p50':>15} | " \
+             f"{'пик памяти':>10} | {'test: совпадение':>16}"
+    print(header)
+    print("-" * len(header))
+    for name in ("RandomForest", "XGBoost"):
+        model = joblib.load(f"{MODELS_DIR}/{name}_Sleep.pkl")
+        reference = model.predict_proba(x_test.astype(np.float64))
+        for dtype in DTYPES:
+            # Сборка матрицы из строк запроса + вызов модели — то, что API делает на каждый запрос
+            single = _p50_ms(lambda: model.predict_proba(np.array(rows[:1], dtype=dtype)), repeats)
+            batch = _p50_ms(lambda: model.predict_proba(np.array(rows, dtype=dtype)), max(repeats // 10, 10))
+            peak = _peak_kb(lambda: model.predict_proba(np.array(rows, dtype=dtype)))
+            probs = model.predict_proba(x_test.astype(dtype))
+            same = "бит в бит" if np.array_equal(probs, reference) else f"{np.abs(probs - reference).max():.1e}"
+            print(f"{name:14} | {np.dtype(dtype).name:7} | {single:9.3f} ms | {batch:12.3f} ms | "
+                  f"{peak:7.0f} KB | {same:>16}")
+
+
+def training(x_train, y_train, x_test, y_test, repeats=3):
+    header = f"{'Модель':18} | {'dtype':7} | {'обучение':>9} | {'пик памяти':>10} | {'test: метки':>11} | " \
+             f"{'вероятности':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, build in TRAINERS.items():
+        reference = None
+        for dtype in DTYPES:
+            x_tr, x_te = x_train.astype(dtype), x_test.astype(dtype)
+            fit_ms = _p50_ms(lambda: build().fit(x_tr, y_train), repeats)
+            peak = _peak_kb(lambda: build().fit(x_tr, y_train))
+            model = build().fit(x_tr, y_train)
+            probs = model.predict_proba(x_te)
+            if reference is None:
+                reference = probs
+            labels = "совпадают" if np.array_equal(probs.argmax(1), reference.argmax(1)) else "различаются"
+            diff = "бит в бит" if np.array_equal(probs, reference) else f"{np.abs(probs - reference).max():.1e}"
+            print(f"{name:18} | {np.dtype(dtype).name:7} | {fit_ms:6.0f} ms | {peak:7.0f} KB | {labels:>11} | "
+                  f"{diff:>11}")
+
+
+def main():
+    x_train, y_train, x_test, y_test = load_split()
+    print(f"Инференс (test: {len(x_test)} строк)")
+    inference(x_test)
+    print(f"\nОбучение (train: {len(x_train)} строк)")
+    training(x_train, y_train, x_test, y_test)
+
+
+if __name__ == "__main__":
+    main()
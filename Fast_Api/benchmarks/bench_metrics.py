@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from serving.settings import BASE_DIR
+from serving.metrics import ServiceMetrics, RequestTimer
+from benchmarks.bench_executor import SAMPLES_PATH, measure
+
+# Накладные расходы метрик на горячем пути.
+# 1) Сами замеры: RequestTimer с четырьмя этапами + запись в счётчики и гистограммы, без HTTP.
+# 2) /predict целиком через httpx.ASGITransport с METRICS_ENABLED=true и false. Все запросы —
+#    одна строка, которая после первого раза отвечается из кэша: обработчик максимально короткий,
+#    и доля инструментирования в нём наибольшая.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_metrics
+
+
+def instrumentation_cost(repeats=200_000):
+    """Время одного цикла замеров запроса в микросекундах."""
+    metrics = ServiceMetrics()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        timer = RequestTimer()
+        timer.model_version = "bench"
+        for stage in ("validation", "features", "inference", "serialization"):
+            timer.stage(stage)
+        metrics.in_flight.inc("/predict")
+        metrics.in_flight.dec("/predict")
+        metrics.observe("/predict", 200, timer)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+async def _run_mode(n_requests):
+    import httpx
+    import run_api
+
+    with open(SAMPLES_PATH) as f:
+        sample = json.load(f)[0]
+
+    run_api.load_model()
+    transport = httpx.ASGITransport(app=run_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await measure(client, "/predict", [sample] * 200, 1)  # прогрев
+        return await measure(client, "/predict", [sample] * n_requests, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--metrics", choices=["true", "false"], help="Внутренний флаг: один режим в этом процессе")
+    args = parser.parse_args()
+
+    if args.metrics:
+        print(json.dumps(asyncio.run(_run_mode(args.requests))))
+        return
+
+    print(f"⏱️ Замеры одного запроса без HTTP: {instrumentation_cost():.2f} мкс")
+    print(f"{'METRICS_ENABLED':16} | {'запросов/с':>10} | {'p50':>9} | {'p99':>9}")
+    print("-" * 54)
+    for enabled in ("false", "true"):
+        env = {**os.environ, "METRICS_ENABLED": enabled,
+               "ANSWER_TABLE_PATH": os.path.join(BASE_DIR, "models", "no_answer_table")}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_metrics", "--metrics", enabled, "--requests", str(args.requests)],
+            env=env, cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{enabled:16} | {stats['rps']:>10} | {stats['p50_ms']:>6} ms | {stats['p99_ms']:>6} ms")
+
+
+if __name__ == "__main__":
+    main()
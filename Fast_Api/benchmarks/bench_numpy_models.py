@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from serving.drift import DEFAULT_DATA_PATH
+from serving.numpy_models import export_model
+from serving.schema import FEATURES
+
+# Холодный старт и задержка: Pipeline sklearn из .pkl против экспорта в NumPy (serving/numpy_models.py).
+# Модели обучаются на обучающем CSV с параметрами из сеток ml_experiments/config/model_config.py.
+# Холодный старт меряется в отдельном процессе: импорт, загрузка, первое предсказание и пик памяти.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_numpy_models
+
+MODELS = {
+    "LogisticRegression": lambda: Pipeline([("scaler", StandardScaler()),
+                                            ("model", LogisticRegression(C=1, max_iter=1000))]),
+    "GaussianNB": lambda: Pipeline([("scaler", StandardScaler()), ("model", GaussianNB())]),
+    "KNeighborsClassifier": lambda: Pipeline([("scaler", StandardScaler()),
+                                              ("model", KNeighborsClassifier(n_neighbors=7, weights="distance"))]),
+}
+
+COLD_START = """
+import time
+started = time.perf_counter()
+import numpy as np
+{load}
+model.predict_proba(np.zeros((1, {n_features})))
+seconds = time.perf_counter() - started
+# VmHWM, а не ru_maxrss: ru_maxrss наследует пик родителя через fork/exec
+hwm = [line.split()[1] for line in open("/proc/self/status") if line.startswith("VmHWM")][0]
+print(seconds, int(hwm) / 1024)
+"""
+LOADERS = {
+    "sklearn": "import joblib\nmodel = joblib.load({path!r})",
+    "numpy": "from serving.numpy_models import NumpyModel\nmodel = NumpyModel.load({path!r})",
+}
+
+
+def _cold_start(runtime, path, repeats):
+    """Медиана времени до первого предсказания в новом процессе, с, и пик RSS, МБ."""
+    script = COLD_START.format(load=LOADERS[runtime].format(path=path), n_features=len(FEATURES))
+    runs = [subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.split()
+            for _ in range(repeats)]
+    return float(np.median([float(seconds) for seconds, _ in runs])), float(np.median([float(rss) for _, rss in runs]))
+
+
+def _timings(fn, X, repeats):
+    fn(X)  # прогрев
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main(repeats=200, cold_repeats=5, batch_size=1000):
+    data = pd.read_csv(DEFAULT_DATA_PATH)
+    x_train, y_train = data[FEATURES].to_numpy(dtype=np.float64), data["sleep_efficiency_label"].to_numpy()
+    batch = x_train[np.random.default_rng(42).integers(0, len(x_train), batch_size)]
+
+    header = f"{'Модель':22} | {'Среда':7} | {'Старт':>9} | {'Пик RSS':>9} | {'Размер':>9} | " \
+             f"{'1 строка p50':>12} | {f'{batch_size} строк p50':>15} | {'расхождение':>11}"
+    print(header)
+    print("-" * len(header))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, build in MODELS.items():
+            native = build().fit(x_train, y_train)
+            exported = export_model(native)
+            pkl_path = os.path.join(directory, f"{name}.pkl")
+            numpy_path = os.path.join(directory, f"{name}.numpy")
+            joblib.dump(native, pkl_path)
+            exported.save(numpy_path)
+            sizes = {"sklearn": os.path.getsize(pkl_path),
+                     "numpy": sum(os.path.getsize(os.path.join(numpy_path, f)) for f in os.listdir(numpy_path))}
+            diff = float(np.max(np.abs(native.predict_proba(batch) - exported.predict_proba(batch))))
+
+            for runtime, model in [("sklearn", native), ("numpy", exported)]:
+                seconds, rss = _cold_start(runtime, pkl_path if runtime == "sklearn" else numpy_path, cold_repeats)
+                single = _timings(model.predict_proba, batch[:1], repeats)
+                many = _timings(model.predict_proba, batch, max(repeats // 20, 5))
+                print(f"{name:22} | {runtime:7} | {seconds * 1000:6.0f} ms | {rss:6.0f} MB | "
+                      f"{sizes[runtime] / 1024:6.1f} KB | {np.percentile(single, 50):9.3f} ms | "
+                      f"{np.percentile(many, 50):12.3f} ms | {diff:11.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+import time
+import joblib
+import numpy as np
+from serving.settings import BASE_DIR, MODELS_DIR
+from serving.tree_engine import compile_model
+
+# Сравнение задержки: нативный predict_proba (sklearn / XGBoost) против скомпилированного движка.
+# Запуск из папки Fast_Api:  python -m benchmarks.bench_tree_engine
+
+SAMPLES_PATH = os.path.join(BASE_DIR, "..", "tests", "Json_test_samples", "api_test_features_collinearity.json")
+MODELS = ["RandomForest_Sleep.pkl", "XGBoost_Sleep.pkl"]
+
+
+def _timings(fn, X, repeats):
+    fn(X)  # прогрев
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main(repeats=200, batch_sizes=(10, 100, 1000)):
+    with open(SAMPLES_PATH) as f:
+        samples = np.array([list(row.values()) for row in json.load(f)], dtype=np.float64)
+
+    rng = np.random.default_rng(42)
+    batches = {size: samples[rng.integers(0, len(samples), size)] for size in batch_sizes}
+
+    header = f"{'Модель':22} | {'Движок':9} | {'1 строка p50':>12} | {'1 строка p99':>12} | "
+    header += " | ".join(f"{f'{size} строк p50':>14}" for size in batch_sizes)
+    header += f" | {'совпадение':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for file_name in MODELS:
+        native = joblib.load(os.path.join(MODELS_DIR, file_name))
+        compiled = compile_model(native)
+        identical = all(
+            np.array_equal(native.predict_proba(batch), compiled.predict_proba(batch))
+            for batch in batches.values()
+        )
+
+        for engine_name, engine in [("native", native), ("compiled", compiled)]:
+            single = _timings(engine.predict_proba, samples[:1], repeats)
+            row = f"{file_name:22} | {engine_name:9} | {np.percentile(single, 50):9.3f} ms | " \
+                  f"{np.percentile(single, 99):9.3f} ms | "
+            row += " | ".join(
+                f"{np.percentile(_timings(engine.predict_proba, batch, max(repeats // size, 5)), 50):11.3f} ms"
+                for size, batch in batches.items()
+            )
+            row += f" | {str(identical):>10}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from serving.settings import BASE_DIR
+from serving.schema import SleepData, FEATURES
+from benchmarks.bench_executor import SAMPLES_PATH
+
+# Нагрузочный генератор для API предсказаний.
+# Гоняет /predict, /predict_batch или /predict_stream с заданной конкурентностью (замкнутый цикл)
+# или с заданной частотой запросов (открытый цикл) и пишет JSON-отчёт: пропускная способность,
+# p50/p95/p99, ошибки по кодам. Отчёты разных релизов сравниваются флагом --compare.
+#
+# Запуск из папки Fast_Api:
+#   python -m benchmarks.loadgen --concurrency 16 --duration 10            # в процессе, через ASGI
+#   python -m benchmarks.loadgen --url http://127.0.0.1:8080 --rate 200    # против запущенного uvicorn
+#   python -m benchmarks.loadgen --source synthetic --out load.json --compare load_prev.json
+
+DATA_PATH = os.path.join(BASE_DIR, "..", "Data", "processed_data",
+                         "Sleep_Efficiency_clear_yes_collinearity_forXG_RF_NO_REM.csv")
+INTEGER_FEATURES = {name for name, field in SleepData.model_fields.items() if field.annotation is int}
+
+
+def fixture_rows(path=SAMPLES_PATH):
+    """Записи из JSON-фикстуры тестов (tests/Json_test_samples)."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def synthetic_rows(n, path=DATA_PATH, random_state=0):
+    """
+    n синтетических записей: каждый признак независимо выбирается из его значений в обучающем CSV.
+
+    Комбинации получаются новыми (кэш предсказаний и таблица ответов почти не попадают),
+    а диапазоны и частоты отдельных признаков — как в реальных данных.
+    """
+    with open(path, newline="") as f:
+        data = list(csv.DictReader(f))
+    rng = np.random.default_rng(random_state)
+    columns = {feature: rng.choice([float(row[feature]) for row in data], size=n) for feature in FEATURES}
+    return [{feature: int(columns[feature][i]) if feature in INTEGER_FEATURES else float(columns[feature][i])
+             for feature in FEATURES} for i in range(n)]
+
+
+def make_requests(rows, endpoint, batch_size):
+    """Аргументы client.post для каждого запроса."""
+    if endpoint == "/predict":
+        return [{"json": row} for row in rows]
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    if endpoint == "/predict_stream":
+        return [{"content": "".join(json.dumps(row) + "\n" for row in batch),
+                 "headers": {"Content-Type": "application/x-ndjson"}} for batch in batches]
+    return [{"json": batch} for batch in batches]
+
+
+async def run_load(client, endpoint, requests, concurrency, rate=None, duration=None, max_requests=None):
+    """
+    Отправляет запросы по кругу из requests, пока не истечёт duration или не будет отправлено max_requests.
+
+    Без rate — замкнутый цикл: concurrency воркеров шлют запросы друг за другом.
+    С rate — открытый цикл: запрос i назначен на момент i / rate, задержка считается от назначенного
+    момента, а не от фактической отправки, поэтому очередь при перегрузке попадает в перцентили.
+
+    Returns:
+        (список (задержка в секундах, код ответа или имя исключения), время прогона, версия модели)
+    """
+    results = []
+    model_version = None
+    counter = 0
+    started = time.perf_counter()
+
+    def next_slot():
+        nonlocal counter
+        index = counter
+        if max_requests is not None and index >= max_requests:
+            return None
+        scheduled = started + index / rate if rate else time.perf_counter()
+        if duration is not None and scheduled - started >= duration:
+            return None
+        counter += 1
+        return index, scheduled
+
+    async def worker():
+        nonlocal model_version
+        while (slot := next_slot()) is not None:
+            index, scheduled = slot
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await client.post(endpoint, **requests[index % len(requests)])
+                outcome = response.status_code
+                if model_version is None and outcome == 200:
+                    model_version = response.headers.get("x-model-version") or response.json().get("model_version")
+            except Exception as e:
+                outcome = type(e).__name__
+            results.append((time.perf_counter() - scheduled, outcome))
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return results, time.perf_counter() - started, model_version
+
+
+def summarize(results, elapsed, rows_per_request=1):
+    """Сводка прогона: всё, что попадает в отчёт, кроме конфигурации."""
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = {}
+    for _, outcome in results:
+        if outcome != 200:
+            errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+    n_errors = sum(errors.values())
+    return {
+        "requests": len(results),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "rows_per_s": round((len(results) - n_errors) * rows_per_request / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 3) if len(latencies) else None,
+            **{f"p{q}": round(float(np.percentile(latencies, q)), 3) if len(latencies) else None
+               for q in (50, 95, 99)},
+            "max": round(float(latencies.max()), 3) if len(latencies) else None,
+        },
+        "errors": errors,
+        "error_rate": round(n_errors / len(results), 5) if results else 0.0,
+    }
+
+
+def compare(base, new):
+    """Печатает изменение ключевых показателей нового отчёта относительно базового."""
+    metrics = [("throughput_rps", lambda r: r["throughput_rps"]), ("error_rate", lambda r: r["error_rate"])]
+    metrics += [(f"latency {q}", lambda r, q=q: r["latency_ms"][q]) for q in ("p50", "p95", "p99")]
+    print(f"{'показатель':16} | {'база':>10} | {'новый':>10} | {'изменение':>10}")
+    print("-" * 56)
+    for name, get in metrics:
+        old, value = get(base), get(new)
+        change = f"{(value - old) / old * 100:+.1f}%" if old else "—"
+        print(f"{name:16} | {old:>10} | {value:>10} | {change:>10}")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _run(args, requests):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    run = dict(endpoint=args.endpoint, requests=requests, concurrency=args.concurrency, rate=args.rate,
+               duration=args.duration, max_requests=args.requests)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            return await run_load(client, **run)
+
+    import run_api
+
+    # Startup- и shutdown-хуки приложения выполняются как при настоящем запуске
+    async with run_api.app.router.lifespan_context(run_api.app):
+        transport = httpx.ASGITransport(app=run_api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=args.timeout) as client:
+            return await run_load(client, **run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API предсказаний")
+    parser.add_argument("--url", help="Адрес запущенного API; без него приложение поднимается в процессе (ASGI)")
+    parser.add_argument("--endpoint", default="/predict", choices=["/predict", "/predict_batch", "/predict_stream"])
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов")
+    parser.add_argument("--rate", type=float, help="Запросов в секунду (открытый цикл); без него — замкнутый цикл")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона, с")
+    parser.add_argument("--requests", type=int, help="Остановиться после стольких запросов")
+    parser.add_argument("--source", default="fixtures", choices=["fixtures", "synthetic"])
+    parser.add_argument("--fixtures", default=SAMPLES_PATH, help="JSON-фикстура для --source fixtures")
+    parser.add_argument("--rows", type=int, default=10_000, help="Сколько синтетических записей сгенерировать")
+    parser.add_argument("--batch-size", type=int, default=100, help="Записей в запросе /predict_batch и /predict_stream")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Куда записать JSON-отчёт (по умолчанию — только stdout)")
+    parser.add_argument("--compare", help="Базовый отчёт, с которым сравнить этот прогон")
+    args = parser.parse_args(argv)
+
+    rows = fixture_rows(args.fixtures) if args.source == "fixtures" else synthetic_rows(args.rows, random_state=args.seed)
+    requests = make_requests(rows, args.endpoint, args.batch_size)
+    results, elapsed, model_version = asyncio.run(_run(args, requests))
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "target": args.url or "asgi",
+        "model_version": model_version,
+        "config": {key: getattr(args, key) for key in
+                   ("endpoint", "concurrency", "rate", "duration", "requests", "source", "batch_size", "seed")},
+        **summarize(results, elapsed, 1 if args.endpoint == "/predict" else args.batch_size),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
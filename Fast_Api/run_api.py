@@ -1,11 +1,75 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-import joblib
+from fastapi import APIRouter, BackgroundTasks, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import contextmanager
+from typing import List, Optional
+import hmac
 import numpy as np
 import os
-import json
-import uvicorn
-model = None  # глобально, но не загружаем сразу
+import sys
+from serving.settings import (MODEL_PATH, MODELS_DIR, INFERENCE_BACKEND, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL,
+                              ANSWER_TABLE_PATH, MICROBATCH_ENABLED, MICROBATCH_MAX_SIZE, MICROBATCH_WINDOW_MS,
+                              MODEL_WATCH, MODEL_WATCH_INTERVAL, MODEL_REGISTRY_NAME, MODEL_REGISTRY_ALIAS,
+                              ADMIN_TOKEN, API_WORKERS, INFERENCE_EXECUTOR, METRICS_ENABLED, STREAM_CHUNK_ROWS,
+                              STREAM_MAX_LINE_BYTES, SHADOW_MODEL_PATH, SHADOW_SAMPLE_RATE, SHADOW_QUEUE_SIZE,
+                              REQUEST_LOG_DIR, REQUEST_LOG_FORMAT, REQUEST_LOG_BUFFER_ROWS, REQUEST_LOG_FLUSH_INTERVAL,
+                              REQUEST_LOG_ROTATE_ROWS, REQUEST_LOG_ROTATE_SECONDS, REQUEST_LOG_MAX_FILES,
+                              DRIFT_ENABLED, DRIFT_REFERENCE_PATH, DRIFT_WINDOW_ROWS, DRIFT_MIN_ROWS,
+                              MODEL_FAMILIES, MODEL_CACHE_BUDGET_MB, ADMISSION_ENABLED, ADMISSION_MAX_IN_FLIGHT,
+                              ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_BULK_MAX_IN_FLIGHT,
+                              ADMISSION_MAX_LOOP_LAG_MS, INFERENCE_DTYPE, TRACE_ENABLED, TRACE_SAMPLE_RATE,
+                              TRACE_FILE, TRACE_COLLECTOR_URL, TRACE_BATCH_SIZE, TRACE_FLUSH_INTERVAL,
+                              TRACE_QUEUE_SIZE)
+from serving.schema import SleepData, ReloadRequest, FEATURES, LABELS
+from serving.model_store import ModelStore, ModelWatcher, load_from_file, warmup_batch
+from serving.model_cache import ModelCache, UnknownModel
+from serving.answer_table import open_for_model
+from serving.cache import PredictionCache, canonical_key
+from serving.batching import MicroBatcher
+from serving.executor import ExecutorSaturated
+from serving import binary_format
+from serving.binary_format import BinaryFormatError, binary_route_class
+from serving.streaming import RequestStreamingResponse, score_stream, stream_format
+from serving.shadow import ShadowScorer
+from serving.request_log import RequestLog
+from serving.drift import DriftMonitor, load_reference
+from serving.explain import explain_rows
+from serving.admission import AdmissionController, AdmissionMiddleware, PRIORITIES, SHED_REASONS
+from serving.introspection import process_rss
+from serving.tracing import SpanExporter, Tracer, TracingMiddleware
+from serving.metrics import StartupTimer, ServiceMetrics, MetricsMiddleware, Counter, Gauge, current_timer
+# Тип матрицы признаков из JSON-запросов (INFERENCE_DTYPE): с float32 деревья получают её без копии
+FEATURE_DTYPE = np.dtype(INFERENCE_DTYPE)
+# Отметки холодного старта считаются от запуска процесса, а не от импорта модуля
+startup_timer = StartupTimer()
+startup_timer.mark("imported")
+prediction_cache = PredictionCache(max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+# Активная модель живёт в хранилище; запрос берёт снимок store.active один раз
+store = ModelStore(backend=INFERENCE_BACKEND, executor=INFERENCE_EXECUTOR,
+                   prepare_answer_table=lambda version: open_for_model(version, ANSWER_TABLE_PATH),
+                   # Новая модель — старые предсказания в кэше больше не действительны
+                   on_swap=lambda serving: prediction_cache.invalidate(serving.version))
+# Остальные модели (заголовок X-Model или путь /models/{model}/...) грузятся по первому запросу
+# Их предсказания кэшируются, пока модель в кэше моделей
+model_cache = ModelCache(store, MODEL_FAMILIES, int(MODEL_CACHE_BUDGET_MB * 1024 * 1024),
+                         on_load=lambda serving: prediction_cache.track(serving.version),
+                         on_evict=lambda serving: prediction_cache.untrack(serving.version))
+micro_batcher = None
+model_watcher = None
+shadow_scorer = None
+request_log = None
+drift_monitor = None
+service_metrics = ServiceMetrics()
+# Допуск к инференсу: лишние запросы отклоняются 429/503 до разбора тела, а не копятся в пуле потоков
+admission_controller = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+    bulk_max_in_flight=ADMISSION_BULK_MAX_IN_FLIGHT or None,
+    max_loop_lag=ADMISSION_MAX_LOOP_LAG_MS / 1000 or None) if ADMISSION_ENABLED else None
+# Спаны запроса по этапам RequestTimer; без TRACE_FILE и TRACE_COLLECTOR_URL запросы не трассируются
+tracer = Tracer(SpanExporter(path=TRACE_FILE, url=TRACE_COLLECTOR_URL, batch_size=TRACE_BATCH_SIZE,
+                             flush_interval=TRACE_FLUSH_INTERVAL, queue_size=TRACE_QUEUE_SIZE),
+                sample_rate=TRACE_SAMPLE_RATE) if TRACE_ENABLED else None
 # === Загрузка модели ===
 
 
@@ -19,25 +83,159 @@ app = FastAPI(
 
 @app.on_event("startup")
 def load_model():
-    global model
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path = os.path.join(base_dir, "models", "RandomForest_Sleep.pkl")
-    model = joblib.load(model_path)
-    print(f"✅ Модель загружена из: {model_path}")
-
-
-# === Схема входных данных ===
-class SleepData(BaseModel):
-    Age: float
-    Gender: int
-    Sleep_duration: float
-    Awakenings: float
-    Caffeine_consumption: float
-    Alcohol_consumption: float
-    Smoking_status: int
-    Exercise_frequency: float
-    bed_hour: float
-    wake_hour: float
+    # В pre-fork режиме модель уже загружена мастером до fork — повторная загрузка
+    # в воркере дала бы ему собственную копию вместо общих страниц
+    if store.active is not None:
+        return
+    # MODEL_PATH может указывать на .pkl или на скомпилированный артефакт (каталог .compiled),
+    # который открывается через mmap без импорта sklearn
+    store.reload({"kind": "file", "path": MODEL_PATH})
+    startup_timer.mark("model_loaded")
+
+
+@app.on_event("startup")
+def start_model_watcher():
+    global model_watcher
+    if MODEL_WATCH == "file":
+        source = {"kind": "file", "path": MODEL_PATH}
+    elif MODEL_WATCH == "registry":
+        source = {"kind": "registry", "model_name": MODEL_REGISTRY_NAME, "alias": MODEL_REGISTRY_ALIAS}
+    else:
+        return
+    model_watcher = ModelWatcher(store, source, interval=MODEL_WATCH_INTERVAL)
+    model_watcher.start()
+
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    if model_watcher is not None:
+        model_watcher.stop()
+    store.close()
+
+
+@app.exception_handler(ExecutorSaturated)
+def executor_saturated(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    global micro_batcher
+    if not MICROBATCH_ENABLED:
+        return
+    if not hasattr(store.active.model, "predict_proba"):
+        print("⚠️ Микробатчинг требует predict_proba — отключён")
+        return
+
+    # Каждая строка передаёт predict_proba своего снимка модели (см. _predict_one_batched)
+    micro_batcher = MicroBatcher(lambda X: store.active.model.predict_proba(X),
+                                 max_batch_size=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_WINDOW_MS,
+                                 dtype=FEATURE_DTYPE)
+    await micro_batcher.start()
+    print(f"📦 Микробатчинг включён: до {MICROBATCH_MAX_SIZE} строк, окно {MICROBATCH_WINDOW_MS} мс")
+
+
+@app.on_event("startup")
+def start_shadow_scorer():
+    global shadow_scorer
+    if not SHADOW_MODEL_PATH or shadow_scorer is not None:
+        return
+    try:
+        model, version, _ = load_from_file(SHADOW_MODEL_PATH)
+        model.predict_proba(warmup_batch(dtype=FEATURE_DTYPE))
+    except Exception as e:
+        # Претендент не должен мешать основному сервису подняться
+        print(f"⚠️ Теневая модель не загружена, теневая оценка отключена: {type(e).__name__}: {e}")
+        return
+    shadow_scorer = ShadowScorer(model, version, sample_rate=SHADOW_SAMPLE_RATE, queue_size=SHADOW_QUEUE_SIZE)
+    shadow_scorer.start()
+
+
+@app.on_event("shutdown")
+def stop_shadow_scorer():
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+
+
+@app.on_event("startup")
+def start_request_log():
+    global request_log
+    if not REQUEST_LOG_DIR or request_log is not None:
+        return
+    try:
+        request_log = RequestLog(REQUEST_LOG_DIR, FEATURES, LABELS, capacity=REQUEST_LOG_BUFFER_ROWS,
+                                 flush_interval=REQUEST_LOG_FLUSH_INTERVAL, rotate_rows=REQUEST_LOG_ROTATE_ROWS,
+                                 rotate_seconds=REQUEST_LOG_ROTATE_SECONDS, file_format=REQUEST_LOG_FORMAT,
+                                 max_files=REQUEST_LOG_MAX_FILES)
+    except (ImportError, ValueError) as e:
+        # Без журнала сервис работает как раньше
+        print(f"⚠️ Журнал запросов отключён: {type(e).__name__}: {e}")
+        return
+    request_log.start()
+
+
+@app.on_event("shutdown")
+def stop_request_log():
+    if request_log is not None:
+        request_log.stop()
+
+
+@app.on_event("startup")
+def start_drift_monitor():
+    global drift_monitor
+    if not DRIFT_ENABLED or drift_monitor is not None:
+        return
+    if not os.path.exists(DRIFT_REFERENCE_PATH):
+        print(f"⚠️ Эталон дрейфа {DRIFT_REFERENCE_PATH} не найден (python -m serving.drift) — мониторинг отключён")
+        return
+    drift_monitor = DriftMonitor(load_reference(DRIFT_REFERENCE_PATH), FEATURES,
+                                 window_rows=DRIFT_WINDOW_ROWS, min_rows=DRIFT_MIN_ROWS)
+    print(f"📉 Мониторинг дрейфа: окно {DRIFT_WINDOW_ROWS} строк, эталон {DRIFT_REFERENCE_PATH}")
+
+
+@app.on_event("shutdown")
+async def stop_admission():
+    if admission_controller is not None:
+        await admission_controller.stop()
+
+
+@app.on_event("startup")
+def start_tracing():
+    if tracer is not None and tracer.exporter.enabled:
+        tracer.exporter.start()
+        print(f"🧵 Трассировка: {tracer.exporter.path or tracer.exporter.url}, "
+              f"выборка {tracer.sample_rate:.0%} трасс без traceparent")
+
+
+@app.on_event("shutdown")
+def stop_tracing():
+    # Остаток очереди дописывается при остановке
+    if tracer is not None:
+        tracer.exporter.stop()
+
+
+@app.on_event("shutdown")
+def close_model_cache():
+    model_cache.close()
+
+
+# Задержка цикла меряется после остальных шагов старта: загрузка модели блокирует цикл
+@app.on_event("startup")
+async def start_admission():
+    if admission_controller is not None:
+        admission_controller.start()
+
+
+@app.on_event("startup")
+def mark_ready():
+    # Последний startup-хук: модель загружена и прогрета (ModelStore.prepare), фоновые задачи запущены
+    print(f"🟢 Сервис готов через {startup_timer.mark('ready')} с после старта процесса")
+
+
+@app.on_event("shutdown")
+async def stop_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.stop()
 
 
 # === Главная страница ===
@@ -46,27 +244,590 @@ def root():
     return {"message": "Отправь POST-запрос на /predict для предсказания качества сна."}
 
 
-# === Эндпоинт предсказания ===
-@app.post("/predict")
-def predict(data: SleepData):
-    X = np.array([[getattr(data, field) for field in data.__fields__]])
-    y_pred = model.predict(X)[0]
+# === Проверки живости и готовности ===
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready(response: Response):
+    if store.active is None or "ready" not in startup_timer.marks:
+        response.status_code = 503
+        return {"ready": False}
+    return {"ready": True, "model_version": store.active.version, "startup_seconds": startup_timer.snapshot()}
+
 
+def _mark_first_prediction():
+    if "first_prediction" not in startup_timer.marks:
+        print(f"🚀 Первое предсказание через {startup_timer.mark('first_prediction')} с после старта процесса")
+
+
+# === Выбор модели на запрос ===
+@contextmanager
+def _model_errors(model):
+    try:
+        yield
+    except UnknownModel as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Модель {model} не загружена: {type(e).__name__}: {e}")
+
+
+async def _select_model(model):
+    """Снимок модели на запрос: основная, если model пусто, иначе модель из кэша (холодная — грузится)."""
+    if not model:
+        return store.active
+    with _model_errors(model):
+        return await model_cache.get_async(model)
+
+
+def _select_model_sync(model):
+    if not model:
+        return store.active
+    with _model_errors(model):
+        return model_cache.get(model)
+
+
+# === Инференс одной записи ===
+def _predict_one(model, X):
+    """(ответ, вероятности классов или None) — вероятности нужны журналу запросов, в ответ не идут."""
     if hasattr(model, "predict_proba"):
+        # Метка — argmax вероятностей, как и в predict самих моделей: один вызов модели вместо двух
         probs = model.predict_proba(X)[0]
+        y_pred = model.classes_[int(np.argmax(probs))]
         confidence = float(np.max(probs))
         return {
             "sleep_efficiency_label": int(y_pred),
-            "sleep_quality": ["bad", "good", "medium"][int(y_pred)],
+            "sleep_quality": LABELS[int(y_pred)],
             "confidence": round(confidence, 3)
-        }
+        }, probs
 
+    y_pred = model.predict(X)[0]
     return {
         "sleep_quality_label": int(y_pred),
-        "sleep_quality": ["bad", "good", "medium"][int(y_pred)]
-    }
+        "sleep_quality": LABELS[int(y_pred)]
+    }, None
+
+
+async def _predict_one_batched(model, row):
+    """Одна строка через микробатчер: метка — argmax вероятностей пакетного вызова."""
+    probs = await micro_batcher.submit(row, model.predict_proba)
+    best = int(np.argmax(probs))
+    y_pred = int(model.classes_[best])
+    return {
+        "sleep_efficiency_label": y_pred,
+        "sleep_quality": LABELS[y_pred],
+        "confidence": round(float(probs[best]), 3)
+    }, probs
+
+
+def _score_rows(active, X):
+    """
+    Метки, уверенности и вероятности для матрицы признаков (/predict_batch, /predict_stream).
+
+    Строки из домена таблицы ответов берутся из неё, как в /predict: один и тот же вектор получает
+    одну метку на всех эндпоинтах. Остальные строки оцениваются одним вызовом модели.
+    """
+    classes = active.model.classes_
+    table = active.answer_table
+    if table is None:
+        hit = np.zeros(len(X), dtype=bool)
+    else:
+        hit, table_labels, table_probs = table.lookup_rows(X)
+    if not hit.any():
+        probs = active.model.predict_proba(X)
+        columns = probs.argmax(axis=1)
+    else:
+        # Таблица собрана для той же версии модели: столбцы вероятностей — в порядке classes_
+        probs = np.empty((len(X), len(classes)), dtype=np.float64)
+        columns = np.empty(len(X), dtype=np.int64)
+        probs[hit] = table_probs
+        columns[hit] = np.searchsorted(classes, table_labels)
+        if not hit.all():
+            probs[~hit] = active.model.predict_proba(X[~hit])
+            columns[~hit] = probs[~hit].argmax(axis=1)
+    return classes[columns], probs[np.arange(len(X)), columns], probs
+
+
+# === Бинарный формат (матрица или Arrow) на эндпоинтах предсказания ===
+def _score_binary(model, body, content_type, columns, features):
+    """Разбор тела, один вызов predict_proba и сериализация ответа — целиком в потоке, без объектов на поле."""
+    timer = current_timer()
+    media_type, options = binary_format.parse_content_type(content_type)
+    if media_type == binary_format.ARROW_CONTENT_TYPE:
+        X, dtype = binary_format.decode_arrow(body, features)
+    else:
+        dtype = options.get("dtype", "f8")
+        X = binary_format.decode_matrix(body, dtype, [c.strip() for c in columns.split(",") if c.strip()], features)
+    timer.stage("features")
+
+    probs = model.predict_proba(X) if len(X) else np.empty((0, len(model.classes_)))
+    timer.stage("inference")
+    return media_type, dtype, X, probs
+
+
+async def predict_binary(request: Request):
+    """
+    Запрос в бинарном формате (см. serving/binary_format.py): матрица признаков идёт в модель
+    представлением numpy над телом запроса, ответ — матрица вероятностей в том же формате.
+    """
+    timer = current_timer()
+    body = await request.body()
+    timer.stage("validation")
+    active = await _select_model(request.path_params.get("model") or request.headers.get("x-model"))
+    timer.model_version = active.version
+    if not hasattr(active.model, "predict_proba"):
+        raise HTTPException(status_code=422, detail="Модель не отдаёт вероятности: бинарный формат недоступен")
+
+    try:
+        media_type, dtype, X, probs = await run_in_threadpool(
+            _score_binary, active.model, body, request.headers.get("content-type"),
+            request.headers.get("x-columns", ""), active.features)
+    except BinaryFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow IPC недоступен: на сервере не установлен pyarrow")
+    if len(probs):
+        _mark_first_prediction()
+        best = probs.argmax(axis=1)
+        _record(request.url.path, active, X, active.model.classes_[best], probs[np.arange(len(best)), best],
+                  probs)
+
+    columns = [LABELS[int(c)] for c in active.model.classes_]
+    if media_type == binary_format.ARROW_CONTENT_TYPE:
+        content = binary_format.encode_arrow(probs, dtype, columns, active.version)
+    else:
+        content = binary_format.encode_matrix(probs, dtype)
+        media_type = f"{media_type}; dtype={dtype}"
+    return Response(content=content, media_type=media_type,
+                    headers={"X-Columns": ",".join(columns), "X-Model-Version": active.version})
+
+
+# Маршруты предсказания: JSON обрабатывает FastAPI, бинарный Content-Type уходит в predict_binary
+predict_router = APIRouter(route_class=binary_route_class(predict_binary))
+
+
+def _shadow(background_tasks, row, label, confidence):
+    """Отобранный запрос уходит претенденту фоновой задачей — уже после отправки ответа."""
+    if shadow_scorer is not None and shadow_scorer.sample():
+        background_tasks.add_task(shadow_scorer.submit, [row], [label], [confidence])
+
+
+def _record(endpoint, active, X, labels, confidences, probs=None, classes=None):
+    """
+    Оценённые строки — в гистограммы дрейфа и журнал запросов (только счётчики и копия в буфер, без диска).
+    classes — метки столбцов probs, по умолчанию classes_ модели.
+    """
+    if drift_monitor is not None:
+        drift_monitor.update(X)
+    if request_log is not None:
+        if probs is not None and classes is None:
+            classes = active.model.classes_
+        request_log.append(endpoint, active.version, X, labels, confidences, current_timer().elapsed_ms(),
+                           probs=probs, classes=classes)
+
+
+async def _with_explanation(result, active, row):
+    # Объяснения есть только у RandomForest и XGBoost при EXPLAIN_ENABLED=true; без них — предсказание
+    # с "explanation": null, а не ошибка: бот всегда просит explain и строит советы и без вкладов
+    if active.explainer is None:
+        return {**result, "explanation": None}
+    explanation = await run_in_threadpool(explain_rows, active.explainer, np.array([row], dtype=FEATURE_DTYPE),
+                                          active.features)
+    current_timer().stage("explain")
+    return {**result, "explanation": explanation[0]}
+
+
+# === Эндпоинт предсказания ===
+@predict_router.post("/predict", openapi_extra=binary_format.OPENAPI_EXTRA)
+async def predict(data: SleepData, background_tasks: BackgroundTasks, explain: bool = False,
+                  x_model: Optional[str] = Header(default=None)):
+    timer = current_timer()
+    timer.stage("validation")
+    row = [getattr(data, field) for field in FEATURES]
+    # Снимок модели на весь запрос: перезагрузка посреди запроса его не затронет
+    active = await _select_model(x_model)
+    timer.model_version = active.version
+    timer.stage("features")
+
+    # Ответ из таблицы для дискретного домена бота — без вызова модели
+    if active.answer_table is not None:
+        hit = active.answer_table.lookup(row)
+        if hit is not None:
+            label, confidence, probs = hit
+            timer.stage("answer_table")
+            _mark_first_prediction()
+            if not x_model:
+                _shadow(background_tasks, row, label, confidence)
+            _record("/predict", active, [row], [label], [confidence], [probs], active.answer_table.classes)
+            result = {
+                "sleep_efficiency_label": label,
+                "sleep_quality": LABELS[label],
+                "confidence": confidence,
+                "model_version": active.version
+            }
+            # Метка и уверенность посчитаны по середине корзины — объясняется тот же вектор
+            return await _with_explanation(result, active, active.answer_table.center(row)) if explain else result
+
+    key = canonical_key(row, active.version)
+    # В кэше лежит и вектор вероятностей: попадание тоже пишется в журнал с proba_*
+    if micro_batcher is not None:
+        result, probs = await prediction_cache.get_or_compute_async(
+            key, lambda: _predict_one_batched(active.model, row))
+    else:
+        X = np.array([row], dtype=FEATURE_DTYPE)
+        result, probs = await run_in_threadpool(prediction_cache.get_or_compute, key,
+                                                lambda: _predict_one(active.model, X))
+    timer.stage("inference")
+    _mark_first_prediction()
+    if "confidence" in result:
+        if not x_model:
+            _shadow(background_tasks, row, result["sleep_efficiency_label"], result["confidence"])
+        _record("/predict", active, [row], [result["sleep_efficiency_label"]], [result["confidence"]], [probs])
+    else:
+        _record("/predict", active, [row], [result["sleep_quality_label"]], [np.nan])
+    result = {**result, "model_version": active.version}
+    return await _with_explanation(result, active, row) if explain else result
+
+
+# === Метрики Prometheus ===
+@app.get("/metrics")
+def metrics():
+    return Response(content=service_metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# === Статистика кэша предсказаний ===
+@app.get("/cache/stats")
+def cache_stats():
+    return prediction_cache.stats()
+
+
+# === Статистика таблицы ответов ===
+@app.get("/answer_table/stats")
+def answer_table_stats():
+    answer_table = store.active.answer_table
+    if answer_table is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_table.stats()}
+
+
+# === Сравнение с моделью-претендентом ===
+@app.get("/shadow/stats")
+def shadow_stats():
+    if shadow_scorer is None:
+        return {"enabled": False}
+    return {"enabled": True, "primary_version": store.active.version, **shadow_scorer.stats()}
+
+
+# === Трассировка ===
+@app.get("/tracing/stats")
+def tracing_stats():
+    if tracer is None:
+        return {"enabled": False}
+    return {"enabled": tracer.exporter.enabled, **tracer.stats()}
+
+
+# === Журнал запросов ===
+@app.get("/request_log/stats")
+def request_log_stats():
+    if request_log is None:
+        return {"enabled": False}
+    return {"enabled": True, **request_log.stats()}
+
+
+# === Дрейф входных признаков относительно обучающих данных ===
+@app.get("/drift")
+def drift(detail: bool = False):
+    """PSI и KS по каждому признаку; detail=true добавляет границы корзин и доли эталона и живых данных."""
+    if drift_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **drift_monitor.scores(detail)}
+
+
+# === Допуск запросов и сброс нагрузки ===
+@app.get("/admission/stats")
+def admission_stats():
+    if admission_controller is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission_controller.stats()}
+
+
+# === Статистика микробатчинга ===
+@app.get("/batching/stats")
+def batching_stats():
+    if micro_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **micro_batcher.stats()}
+
+
+# === Пакетное предсказание ===
+@predict_router.post("/predict_batch", openapi_extra=binary_format.OPENAPI_EXTRA)
+def predict_batch(records: List[SleepData], background_tasks: BackgroundTasks, explain: bool = False,
+                  x_model: Optional[str] = Header(default=None)):
+    """
+    Предсказание для списка записей за один вызов модели.
+
+    Все записи собираются в одну непрерывную матрицу признаков, модель вызывается
+    один раз (predict_proba), метки берутся как argmax вероятностей.
+    Порядок ответов совпадает с порядком входных записей.
+    С explain=true к каждой записи добавляются вклады признаков (один обход ансамбля на весь пакет).
+    """
+    timer = current_timer()
+    timer.stage("validation")
+    active = _select_model_sync(x_model)
+    model = active.model
+    timer.model_version = active.version
+    if not records:
+        return {"predictions": [], "model_version": active.version}
+
+    X = np.array([[getattr(r, field) for field in FEATURES] for r in records], dtype=FEATURE_DTYPE)
+    timer.stage("features")
+
+    if not hasattr(model, "predict_proba"):
+        y_pred = model.predict(X)
+        _record("/predict_batch", active, X, y_pred, np.full(len(X), np.nan))
+        return {"predictions": [
+            {"sleep_quality_label": int(y), "sleep_quality": LABELS[int(y)]}
+            for y in y_pred
+        ], "model_version": active.version}
+
+    y_pred, confidence, probs = _score_rows(active, X)
+    timer.stage("inference")
+    _mark_first_prediction()
+    if shadow_scorer is not None and not x_model:
+        background_tasks.add_task(shadow_scorer.submit_sampled, X, y_pred, confidence)
+    _record("/predict_batch", active, X, y_pred, confidence, probs)
+
+    predictions = [
+        {
+            "sleep_efficiency_label": int(y),
+            "sleep_quality": LABELS[int(y)],
+            "confidence": round(float(c), 3)
+        }
+        for y, c in zip(y_pred, confidence)
+    ]
+    if explain:
+        # Ответы из таблицы посчитаны по серединам корзин — объясняются те же векторы, что и в /predict
+        explained = active.answer_table.centers(X) if active.answer_table is not None else X
+        explanations = explain_rows(active.explainer, explained, active.features) if active.explainer is not None \
+            else [None] * len(predictions)
+        for prediction, explanation in zip(predictions, explanations):
+            prediction["explanation"] = explanation
+        timer.stage("explain")
+    return {"predictions": predictions, "model_version": active.version}
+
+
+# Те же эндпоинты с моделью в пути: /models/XGBoost/predict, /models/XGBoost@3/predict_batch
+@predict_router.post("/models/{model}/predict", openapi_extra=binary_format.OPENAPI_EXTRA)
+async def predict_with_model(model: str, data: SleepData, background_tasks: BackgroundTasks, explain: bool = False):
+    return await predict(data, background_tasks, explain, x_model=model)
+
+
+@predict_router.post("/models/{model}/predict_batch", openapi_extra=binary_format.OPENAPI_EXTRA)
+def predict_batch_with_model(model: str, records: List[SleepData], background_tasks: BackgroundTasks,
+                             explain: bool = False):
+    return predict_batch(records, background_tasks, explain, x_model=model)
+
+
+app.include_router(predict_router)
+
+
+# === Модели, доступные для выбора на запрос, и кэш загруженных ===
+@app.get("/models")
+def models():
+    return {"primary": store.active.version if store.active else None, **model_cache.stats()}
+
+
+# === Потоковая оценка больших выгрузок (NDJSON или CSV) ===
+def _score_stream_chunk(active, X):
+    """
+    Пакет потока: в журнал запросов выгрузки не пишутся (объём), но в гистограммы дрейфа строки
+    идут — это тоже живые данные, а update стоит один счётчик на признак.
+    """
+    scored = _score_rows(active, X)
+    if drift_monitor is not None:
+        drift_monitor.update(X)
+    return scored
+
+
+@app.post("/predict_stream")
+async def predict_stream(request: Request):
+    """
+    Тело — NDJSON (application/x-ndjson) или CSV с заголовком (text/csv) любого размера.
+    Строки оцениваются пакетами по STREAM_CHUNK_ROWS, ответ в том же формате идёт по мере готовности;
+    ошибки отдельных строк возвращаются на их месте, поток не прерывается.
+    """
+    fmt = stream_format(binary_format.parse_content_type(request.headers.get("content-type"))[0])
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Ожидается application/x-ndjson или text/csv")
+    # Снимок модели на весь поток: все строки оцениваются одной версией
+    active = await _select_model(request.headers.get("x-model"))
+    current_timer().model_version = active.version
+    if not hasattr(active.model, "predict_proba"):
+        raise HTTPException(status_code=422, detail="Модель не отдаёт вероятности: потоковая оценка недоступна")
+
+    body = score_stream(request.stream(), fmt, lambda X: run_in_threadpool(_score_stream_chunk, active, X),
+                        chunk_rows=STREAM_CHUNK_ROWS, max_line_bytes=STREAM_MAX_LINE_BYTES, dtype=FEATURE_DTYPE)
+    return RequestStreamingResponse(body, media_type=fmt.media_type, headers={"X-Model-Version": active.version})
+
+
+# === Горячая перезагрузка модели ===
+def _check_admin(token):
+    # Без ADMIN_TOKEN админские эндпоинты закрыты: /admin/reload загружает pickle, это исполнение кода
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Админские эндпоинты выключены: ADMIN_TOKEN не задан")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Неверный X-Admin-Token")
+
+
+def _model_file(path):
+    """Путь к файлу модели из запроса: только внутри MODELS_DIR (после разрешения ссылок и ..)."""
+    models_dir = os.path.realpath(MODELS_DIR)
+    resolved = os.path.realpath(os.path.join(os.path.dirname(models_dir), path))
+    if os.path.commonpath([resolved, models_dir]) != models_dir:
+        raise HTTPException(status_code=400, detail=f"Модель можно загрузить только из {MODELS_DIR}")
+    return resolved
+
+
+@app.get("/admin/model")
+def admin_model(x_admin_token: Optional[str] = Header(default=None)):
+    _check_admin(x_admin_token)
+    return store.status()
+
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(request: ReloadRequest, x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Загружает новую модель в фоне и подменяет активную после прогрева.
+    Ход перезагрузки и ошибки — в GET /admin/model.
+    """
+    _check_admin(x_admin_token)
+    if API_WORKERS > 1:
+        # Запрос попадает в один воркер: остальные остались бы на старой версии модели
+        raise HTTPException(status_code=409, detail="При API_WORKERS > 1 /admin/reload перезагрузил бы только "
+                                                    "один воркер; для смены модели используйте MODEL_WATCH")
+    if request.kind == "file":
+        source = {"kind": "file", "path": _model_file(request.path) if request.path else MODEL_PATH}
+    else:
+        source = {"kind": "registry", "model_name": request.model_name or MODEL_REGISTRY_NAME,
+                  "version": request.version, "stage": request.stage,
+                  "alias": request.alias or (None if request.version or request.stage else MODEL_REGISTRY_ALIAS)}
+
+    if not store.reload_in_background(source):
+        raise HTTPException(status_code=409, detail="Перезагрузка модели уже выполняется")
+    return {"status": "reloading", "source": source, "active_version": store.active.version}
+
+
+# === Память модели: деревья, массивы узлов, RSS процесса ===
+@app.get("/debug/model_memory")
+def debug_model_memory(model: Optional[str] = None, estimators: bool = False,
+                       x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Размер загруженной модели (по умолчанию — основной; model — из кэша моделей, как X-Model):
+    деревья, узлы, глубина, байты массивов, RSS процесса до и после загрузки.
+    estimators=true — статистика каждого дерева.
+    """
+    _check_admin(x_admin_token)
+    active = _select_model_sync(model)
+    return {"rss_bytes": process_rss(), **active.memory(estimators=estimators)}
+
+
+# Метрики, которые ведут другие компоненты, выгружаются из них в момент запроса /metrics
+service_metrics.registry.register(Gauge(
+    "sleep_api_model_load_seconds", "Время загрузки и прогрева активной модели, с", ("model_version",),
+    callback=lambda: {(store.active.version,): store.last_reload_seconds} if store.active else {}))
+service_metrics.registry.register(Counter(
+    "sleep_api_model_reloads_total", "Перезагрузки модели по исходу", ("outcome",),
+    callback=lambda: {("success",): store.reloads, ("failure",): store.failures}))
+service_metrics.registry.register(Gauge(
+    "sleep_api_startup_seconds", "Отметки холодного старта от запуска процесса, с", ("mark",),
+    callback=lambda: {(mark,): seconds for mark, seconds in startup_timer.snapshot().items()}))
+service_metrics.registry.register(Counter(
+    "sleep_api_prediction_cache_total", "Обращения к кэшу предсказаний по результату", ("result",),
+    callback=lambda: {(result,): value for result, value in prediction_cache.stats().items()
+                      if result in ("hits", "misses", "collapsed", "evictions", "expirations")}))
+
+service_metrics.registry.register(Counter(
+    "sleep_api_shadow_rows_total", "Строки теневой оценки претендентом по исходу", ("result",),
+    callback=lambda: {} if shadow_scorer is None else {
+        ("sampled",): shadow_scorer.sampled, ("dropped",): shadow_scorer.dropped, ("errors",): shadow_scorer.errors,
+        ("scored",): shadow_scorer.scored, ("agreed",): shadow_scorer.agreed}))
+
+service_metrics.registry.register(Counter(
+    "sleep_api_request_log_rows_total", "Строки журнала запросов по исходу", ("result",),
+    callback=lambda: {} if request_log is None else {
+        ("appended",): request_log.appended, ("dropped",): request_log.dropped,
+        ("written",): request_log.written, ("lost",): request_log.lost}))
+
+service_metrics.registry.register(Gauge(
+    "sleep_api_feature_drift_psi", "PSI живых значений признака относительно обучающих данных", ("feature",),
+    callback=lambda: {} if drift_monitor is None else {
+        (feature,): score["psi"] for feature, score in drift_monitor.scores()["features"].items()}))
+
+service_metrics.registry.register(Counter(
+    "sleep_api_model_cache_total", "Обращения к кэшу моделей по модели и результату", ("model", "result"),
+    callback=lambda: {(model, result): value for model, stats in model_cache.stats()["models"].items()
+                      for result, value in stats.items() if result != "load_seconds"}))
+service_metrics.registry.register(Gauge(
+    "sleep_api_model_cache_bytes", "Оценка памяти моделей в кэше моделей, байт", ("model",),
+    callback=lambda: {(entry["model"],): entry["bytes"] for entry in model_cache.stats()["cached"]}))
+service_metrics.registry.register(Gauge(
+    "sleep_api_model_cache_load_seconds", "Время последней загрузки и прогрева модели из кэша моделей, с", ("model",),
+    callback=lambda: {(model,): stats["load_seconds"] for model, stats in model_cache.stats()["models"].items()
+                      if stats["load_seconds"] is not None}))
+
+service_metrics.registry.register(Counter(
+    "sleep_api_admission_total", "Запросы к инференсу по классу приоритета и решению о допуске",
+    ("priority", "result"),
+    callback=lambda: {} if admission_controller is None else {
+        **{(priority, "admitted"): admission_controller.admitted[priority] for priority in PRIORITIES},
+        **{(priority, reason): admission_controller.shed[(priority, reason)]
+           for priority in PRIORITIES for reason in SHED_REASONS}}))
+service_metrics.registry.register(Gauge(
+    "sleep_api_admission_queue", "Запросы к инференсу в работе и в очереди по классу приоритета",
+    ("priority", "state"),
+    callback=lambda: {} if admission_controller is None else {
+        **{(priority, "in_flight"): admission_controller.in_flight[priority] for priority in PRIORITIES},
+        **{(priority, "queued"): admission_controller.queued(priority) for priority in PRIORITIES}}))
+
+service_metrics.registry.register(Counter(
+    "sleep_api_trace_spans_total", "Спаны трассировки по исходу", ("result",),
+    callback=lambda: {} if tracer is None else {
+        ("exported",): tracer.exporter.exported, ("dropped",): tracer.exporter.dropped,
+        ("lost",): tracer.exporter.lost}))
+
+# Допуск — внутри middleware метрик: отклонённые запросы попадают в sleep_api_requests_total как rejected
+if admission_controller is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Трассировка — между метриками и допуском: спаны строятся из RequestTimer метрик,
+# а отклонённые запросы тоже попадают в трассу
+if tracer is not None:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Middleware добавляется после объявления маршрутов: ему нужен список статических путей.
+# Без него current_timer() в обработчиках возвращает заглушку
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=service_metrics,
+                       paths=[route.path for route in app.routes if "{" not in route.path])
 
 
 if __name__ == "__main__":
     port = int(os.getenv("API_PORT", 8080))
-    uvicorn.run("run_api:app", host="0.0.0.0", port=port)
+    if API_WORKERS > 1:
+        # Модель грузится один раз в мастере, воркеры получают её через fork (copy-on-write)
+        import run_api
+        from serving.prefork import serve
+
+        if run_api.store.executor == "process":
+            # Воркеры pre-fork и так занимают все ядра; пул процессов, созданный мастером до fork,
+            # в воркерах неработоспособен
+            print("⚠️ INFERENCE_EXECUTOR=process не используется вместе с API_WORKERS > 1")
+            run_api.store.executor = "thread"
+        if not serve(run_api.app, run_api.load_model, host="0.0.0.0", port=port, workers=API_WORKERS):
+            sys.exit(1)
+    else:
+        import uvicorn
+
+        uvicorn.run("run_api:app", host="0.0.0.0", port=port)
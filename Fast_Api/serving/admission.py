@@ -0,0 +1,280 @@
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+
+# === Допуск запросов и сброс нагрузки ===
+#
+# Один воркер uvicorn принимает соединения без ограничений: при перегрузке запросы копятся в пуле
+# потоков, и задержка растёт у всех — в том числе у бота с таймаутом клиента 10 с. Контроллер допуска
+# стоит перед обработчиками (ASGI-middleware, до разбора тела) и пропускает к инференсу не больше
+# max_in_flight запросов. Остальные ждут в очереди; лишние отклоняются сразу:
+#   - очередь заполнена                                  — 429 (queue_full);
+#   - ожидаемое время в очереди больше queue_timeout     — 503 (latency), без ожидания;
+#   - запрос простоял в очереди queue_timeout            — 503 (queue_timeout);
+#   - цикл событий отстаёт больше max_loop_lag          — 503 (loop_lag).
+# Последнее нужно потому, что при насыщенном CPU очередь копится раньше приложения: в сокетах
+# и в самом цикле событий, который не успевает читать запросы. Этого не видно по числу запросов
+# в работе, зато видно по задержке цикла: фоновая задача засыпает на LOOP_LAG_INTERVAL и меряет,
+# насколько позже проснулась.
+# Ответ несёт Retry-After — оценку, через сколько секунд очередь разойдётся.
+#
+# Классы приоритета: interactive (/predict — бот и одиночные запросы) и bulk (/predict_batch,
+# /predict_stream). Освободившееся место сначала получает interactive, а bulk одновременно занимает
+# не больше bulk_max_in_flight мест — пакетная выгрузка не вытесняет бота.
+# Всё работает в цикле событий, поэтому блокировки не нужны.
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+SHED_REASONS = ("queue_full", "latency", "queue_timeout", "loop_lag")
+LOOP_LAG_INTERVAL = 0.05
+
+_MODEL_ROUTE = re.compile(r"^/models/[^/]+(?P<endpoint>/predict(?:_batch)?)$")
+
+
+def classify(path):
+    """Класс приоритета эндпоинта инференса или None — запрос проходит без контроля (метрики, health, admin)."""
+    match = _MODEL_ROUTE.match(path)
+    if match is not None:
+        path = match["endpoint"]
+    if path == "/predict":
+        return INTERACTIVE
+    if path in ("/predict_batch", "/predict_stream"):
+        return BULK
+    return None
+
+
+class AdmissionController:
+    """
+    Учёт запросов в работе и в очереди, решение о допуске и счётчики отклонённых.
+
+    Args:
+        max_in_flight (int): Сколько запросов инференса обрабатывается одновременно.
+        max_queue (int): Сколько запросов может ждать места; больше — 429.
+        queue_timeout (float): Сколько секунд запрос может ждать в очереди; больше — 503.
+        bulk_max_in_flight (int, optional): Сколько мест одновременно может занять bulk.
+            None — классы не различаются (приоритеты выключены).
+        max_loop_lag (float, optional): Задержка цикла событий, с, выше которой новые запросы отклоняются.
+            None — не отслеживается.
+        clock (callable): Источник времени (для тестов).
+    """
+
+    def __init__(self, max_in_flight=32, max_queue=128, queue_timeout=2.0, bulk_max_in_flight=None,
+                 max_loop_lag=None, clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bulk_max_in_flight = bulk_max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.clock = clock
+        self.loop_lag = 0.0
+        self._lag_task = None
+
+        self.in_flight = dict.fromkeys(PRIORITIES, 0)
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        # Сглаженное время обработки допущенного запроса по классам, с: по нему оценивается ожидание
+        # в очереди. Раздельно, чтобы долгий /predict_stream не завышал оценку для /predict
+        self.service_seconds = dict.fromkeys(PRIORITIES)
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = {(priority, reason): 0 for priority in PRIORITIES for reason in SHED_REASONS}
+        self.queue_wait_seconds = dict.fromkeys(PRIORITIES, 0.0)
+
+    @property
+    def priorities(self):
+        return self.bulk_max_in_flight is not None
+
+    def _class(self, priority):
+        return priority if self.priorities else INTERACTIVE
+
+    def queued(self, priority=None):
+        if priority is not None:
+            return len(self._waiters[priority])
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _has_room(self, priority):
+        if sum(self.in_flight.values()) >= self.max_in_flight:
+            return False
+        return priority != BULK or self.in_flight[BULK] < self.bulk_max_in_flight
+
+    def expected_wait(self, priority, ahead):
+        """Оценка ожидания в очереди, с, когда впереди ahead запросов: места освобождаются max_in_flight за раз."""
+        seconds = self.service_seconds[self._class(priority)]
+        if seconds is None:
+            return 0.0
+        slots = self.bulk_max_in_flight if priority == BULK and self.priorities else self.max_in_flight
+        return (ahead + 1) * seconds / max(slots, 1)
+
+    def retry_after(self, priority=INTERACTIVE):
+        """Через сколько секунд повторить запрос: оценка времени, за которое разойдётся текущая очередь."""
+        return max(1, math.ceil(self.expected_wait(priority, self.queued())))
+
+    async def acquire(self, priority):
+        """
+        Допуск запроса класса priority. Возвращает None, если запрос допущен (тогда обязателен release),
+        иначе — причину отказа из SHED_REASONS.
+        """
+        priority = self._class(priority)
+        if self.max_loop_lag is not None and self.loop_lag > self.max_loop_lag:
+            return self._shed(priority, "loop_lag")
+        # Очередь пуста (или впереди только bulk, а пришёл interactive) и есть место — без ожидания
+        ahead = self.queued(INTERACTIVE) + (self.queued(BULK) if priority == BULK else 0)
+        if ahead == 0 and self._has_room(priority):
+            self._admit(priority, 0.0)
+            return None
+
+        if self.queued() >= self.max_queue:
+            return self._shed(priority, "queue_full")
+        if self.expected_wait(priority, ahead) > self.queue_timeout:
+            return self._shed(priority, "latency")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        enqueued = self.clock()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Клиент ушёл: если место ему уже выдано — отдаём следующему
+            if self._leave(priority, waiter):
+                self.release(priority)
+            raise
+
+        if self._leave(priority, waiter):
+            self._count(priority, self.clock() - enqueued)
+            return None
+        return self._shed(priority, "queue_timeout")
+
+    def _leave(self, priority, waiter):
+        """Убирает ожидающего из очереди. True — место ему уже выдано в _wake."""
+        if waiter.done() and not waiter.cancelled():
+            return True
+        waiter.cancel()
+        try:
+            self._waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+        return False
+
+    def _admit(self, priority, waited):
+        self.in_flight[priority] += 1
+        self._count(priority, waited)
+
+    def _count(self, priority, waited):
+        self.admitted[priority] += 1
+        self.queue_wait_seconds[priority] += waited
+
+    def _shed(self, priority, reason):
+        self.shed[(priority, reason)] += 1
+        return reason
+
+    def _wake(self):
+        """Раздаёт свободные места ожидающим, interactive — первым."""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._has_room(priority):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # Место занимается сразу, чтобы новый запрос не обогнал разбуженного
+                    self.in_flight[priority] += 1
+                    waiter.set_result(None)
+
+    def release(self, priority, seconds=None):
+        """Запрос закончен (за seconds секунд, если он дошёл до обработчика): место переходит следующему."""
+        priority = self._class(priority)
+        self.in_flight[priority] -= 1
+        if seconds is not None:
+            previous = self.service_seconds[priority]
+            self.service_seconds[priority] = seconds if previous is None else 0.9 * previous + 0.1 * seconds
+        self._wake()
+
+    async def _watch_loop_lag(self):
+        while True:
+            started = self.clock()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(self.clock() - started - LOOP_LAG_INTERVAL, 0.0)
+            # Рост учитывается сразу, спад — плавно: одно удачное пробуждение не снимает перегрузку
+            self.loop_lag = lag if lag > self.loop_lag else 0.7 * self.loop_lag + 0.3 * lag
+
+    def start(self):
+        """Запускает замер задержки цикла событий (вызывается из работающего цикла)."""
+        if self.max_loop_lag is not None and self._lag_task is None:
+            self._lag_task = asyncio.get_running_loop().create_task(self._watch_loop_lag())
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+            self._lag_task = None
+            self.loop_lag = 0.0
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "bulk_max_in_flight": self.bulk_max_in_flight,
+            "max_loop_lag": self.max_loop_lag,
+            "loop_lag_ms": round(self.loop_lag * 1000, 3),
+            "classes": {
+                priority: {
+                    "in_flight": self.in_flight[priority],
+                    "queued": self.queued(priority),
+                    "service_ms": round(self.service_seconds[priority] * 1000, 3)
+                    if self.service_seconds[priority] is not None else None,
+                    "retry_after": self.retry_after(priority),
+                    "admitted": self.admitted[priority],
+                    "mean_queue_wait_ms": round(1000 * self.queue_wait_seconds[priority] /
+                                                max(self.admitted[priority], 1), 3),
+                    "shed": {reason: self.shed[(priority, reason)] for reason in SHED_REASONS},
+                }
+                for priority in PRIORITIES
+            },
+        }
+
+
+REJECT_STATUS = {"queue_full": 429, "latency": 503, "queue_timeout": 503, "loop_lag": 503}
+REJECT_DETAIL = {
+    "queue_full": "Очередь запросов заполнена",
+    "latency": "Ожидание в очереди превысило бы допустимое",
+    "queue_timeout": "Запрос не дождался места в очереди",
+    "loop_lag": "Сервис перегружен",
+}
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware: POST на эндпоинты инференса проходят через AdmissionController, остальные — как есть.
+
+    Отказ отправляется до чтения тела запроса: перегруженный сервис не тратит время на разбор JSON,
+    который всё равно не будет оценён.
+    """
+
+    def __init__(self, app, controller, classify=classify):
+        self.app = app
+        self.controller = controller
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        priority = self.classify(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self.controller.acquire(priority)
+        if reason is not None:
+            body = json.dumps({"detail": REJECT_DETAIL[reason], "reason": reason}, ensure_ascii=False).encode()
+            await send({"type": "http.response.start", "status": REJECT_STATUS[reason], "headers": [
+                (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after(priority)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority, time.perf_counter() - started)
@@ -0,0 +1,303 @@
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+from serving.settings import MODEL_PATH, ANSWER_TABLE_PATH, ANSWER_TABLE_AGE, ANSWER_TABLE_SLEEP_DURATION
+from serving.schema import FEATURES
+from serving.model_store import file_version
+
+# === Предрассчитанная таблица ответов для дискретного домена бота ===
+#
+# Бот (tg_bot/bot/questions.py + convert_to_12_hour) ограничивает почти все ответы
+# маленькой сеткой: часы 1–12, флаги 0/1, кофеин кратен 25 и не больше 125.
+# Офлайн-шаг перебирает весь домен, оценивает его моделью одним проходом и пишет
+# компактную таблицу (метка + вероятности классов) в .npy, который API открывает через mmap.
+# Индекс записи считается арифметикой по смешанному основанию, без вызова модели.
+
+# Дискретные признаки: (start, step, count), значение должно точно попасть в сетку
+DISCRETE_GRID = {
+    "Gender": (0, 1, 2),
+    "Awakenings": (0, 1, 5),
+    "Caffeine_consumption": (0, 25, 6),
+    "Alcohol_consumption": (0, 1, 6),
+    "Smoking_status": (0, 1, 2),
+    "Exercise_frequency": (0, 1, 6),
+    "bed_hour": (1, 1, 12),
+    "wake_hour": (1, 1, 12),
+}
+
+CONFIDENCE_SCALE = 1000
+
+
+def table_dtype(n_classes):
+    """Запись таблицы: метка и вероятности всех классов (× CONFIDENCE_SCALE), уверенность — вероятность метки."""
+    return np.dtype([("label", np.uint8), ("proba", np.uint16, (n_classes,))])
+
+
+def parse_buckets(spec):
+    """
+    Разбирает описание корзин "start:stop:step" для непрерывного признака.
+
+    Значение v попадает в корзину floor((v - start) / step), а оценивается
+    моделью по её середине. Например, "3.5:10.5:1" для Sleep_duration даёт
+    корзины с центрами 4, 5, ..., 10 — целые часы попадают точно в центр.
+    """
+    start, stop, step = (float(part) for part in spec.split(":"))
+    count = int(round((stop - start) / step))
+    if count <= 0:
+        raise ValueError(f"Пустая сетка корзин: {spec}")
+    return start, step, count
+
+
+def build_grid(age_spec=ANSWER_TABLE_AGE, sleep_duration_spec=ANSWER_TABLE_SLEEP_DURATION):
+    """Полное описание домена: для каждого признака (mode, start, step, count)."""
+    grid = {}
+    for feature in FEATURES:
+        if feature == "Age":
+            grid[feature] = ("bucket",) + parse_buckets(age_spec)
+        elif feature == "Sleep_duration":
+            grid[feature] = ("bucket",) + parse_buckets(sleep_duration_spec)
+        else:
+            grid[feature] = ("exact",) + DISCRETE_GRID[feature]
+    return grid
+
+
+def _grid_values(spec):
+    mode, start, step, count = spec
+    offset = 0.5 if mode == "bucket" else 0.0
+    return start + (np.arange(count) + offset) * step
+
+
+class AnswerTable:
+    """
+    Таблица ответов, открытая через mmap.
+
+    Args:
+        table (np.ndarray): Массив записей table_dtype(n_classes).
+        meta (dict): Метаданные сборки (сетка, версия модели, согласованность).
+    """
+
+    def __init__(self, table, meta):
+        self.table = table
+        self.meta = meta
+        self.model_version = meta["model_version"]
+        self._specs = [tuple(meta["grid"][feature]) for feature in FEATURES]
+        self.classes = meta["classes"]
+        self._column = {label: column for column, label in enumerate(self.classes)}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path=ANSWER_TABLE_PATH):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        table = np.load(path + ".npy", mmap_mode="r")
+        return cls(table, meta)
+
+    def index(self, row):
+        """Плоский индекс записи или None, если строка вне домена таблицы."""
+        flat = 0
+        for value, (mode, start, step, count) in zip(row, self._specs):
+            position = (value - start) / step
+            if mode == "exact":
+                digit = int(position)
+                if digit != position:
+                    return None
+            else:
+                digit = math.floor(position)
+            if not 0 <= digit < count:
+                return None
+            flat = flat * count + digit
+        return flat
+
+    def center(self, row):
+        """
+        Вектор признаков, по которому посчитана запись строки: непрерывные признаки — середины
+        их корзин, дискретные — как есть. Объяснение ответа из таблицы строится по нему.
+        """
+        return [start + (math.floor((value - start) / step) + 0.5) * step if mode == "bucket" else value
+                for value, (mode, start, step, count) in zip(row, self._specs)]
+
+    def lookup(self, row):
+        """
+        Возвращает (метка, уверенность, вероятности классов в порядке classes) или None, если нужен
+        вызов модели.
+        """
+        flat = self.index(row)
+        if flat is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = self.table[flat]
+        label = int(entry["label"])
+        probs = entry["proba"] / CONFIDENCE_SCALE
+        return label, float(probs[self._column[label]]), probs
+
+    def index_rows(self, X):
+        """index для матрицы признаков: (плоские индексы, маска строк внутри домена)."""
+        X = np.asarray(X, dtype=np.float64)
+        flat = np.zeros(len(X), dtype=np.int64)
+        inside = np.ones(len(X), dtype=bool)
+        for column, (mode, start, step, count) in enumerate(self._specs):
+            position = (X[:, column] - start) / step
+            digit = np.floor(position)
+            if mode == "exact":
+                inside &= digit == position
+            inside &= (digit >= 0) & (digit < count)
+            flat = flat * count + np.where(inside, digit, 0).astype(np.int64)
+        return flat, inside
+
+    def lookup_rows(self, X):
+        """
+        lookup для матрицы признаков (/predict_batch, /predict_stream).
+
+        Returns:
+            tuple: (маска строк из таблицы, их метки, их вероятности классов в порядке classes).
+        """
+        flat, inside = self.index_rows(X)
+        hits = int(inside.sum())
+        self.hits += hits
+        self.misses += len(flat) - hits
+        entries = self.table[flat[inside]]
+        return inside, entries["label"].astype(np.int64), entries["proba"] / CONFIDENCE_SCALE
+
+    def centers(self, X):
+        """center для матрицы признаков; строки вне домена таблицы остаются как есть."""
+        X = np.array(X)
+        inside = self.index_rows(X)[1]
+        for column, (mode, start, step, count) in enumerate(self._specs):
+            if mode == "bucket":
+                values = X[inside, column].astype(np.float64)
+                X[inside, column] = start + (np.floor((values - start) / step) + 0.5) * step
+        return X
+
+    def stats(self):
+        return {
+            "model_version": self.model_version,
+            "rows": int(len(self.table)),
+            "bytes": int(self.table.nbytes),
+            "grid": self.meta["grid"],
+            "agreement": self.meta.get("agreement"),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def open_for_model(model_version, path=ANSWER_TABLE_PATH):
+    """Открывает таблицу через mmap, если она собрана для этой версии модели; иначе None."""
+    if not os.path.exists(path + ".npy"):
+        return None
+
+    table = AnswerTable.load(path)
+    if "classes" not in table.meta:
+        print(f"⚠️ Таблица ответов {path} в старом формате (без вероятностей классов) — пересоберите её "
+              f"(python -m serving.answer_table); таблица не используется")
+        return None
+    if table.model_version != model_version or table.meta["features"] != FEATURES:
+        print(f"⚠️ Таблица ответов собрана для модели {table.model_version}, а загружена {model_version} — "
+              f"таблица не используется")
+        return None
+
+    print(f"📖 Таблица ответов подключена: {len(table.table):,} строк, "
+          f"совпадение с моделью {table.meta['agreement']:.2%}")
+    return table
+
+
+def _decode(flat_indices, grid):
+    """Признаки строк домена по их плоским индексам (обратная арифметика индекса)."""
+    shape = [grid[feature][3] for feature in FEATURES]
+    digits = np.unravel_index(flat_indices, shape)
+    return np.column_stack([
+        _grid_values(grid[feature])[digit] for feature, digit in zip(FEATURES, digits)
+    ])
+
+
+def _score(model, X):
+    probs = model.predict_proba(X)
+    labels = np.asarray(model.classes_)[probs.argmax(axis=1)]
+    return labels.astype(np.uint8), np.rint(probs * CONFIDENCE_SCALE).astype(np.uint16)
+
+
+def build_answer_table(model, model_version, path=ANSWER_TABLE_PATH, grid=None, chunk_size=200_000,
+                       agreement_samples=20_000, random_state=42):
+    """
+    Перебирает весь домен, оценивает его моделью пакетами и пишет таблицу на диск.
+
+    Args:
+        model: Загруженная модель с predict_proba.
+        model_version (str): Версия модели; API использует таблицу только при совпадении версии.
+        path (str): Путь без расширения (.npy — таблица, .json — метаданные).
+        grid (dict, optional): Описание домена (см. build_grid). Default is build_grid().
+        chunk_size (int): Сколько строк домена оценивать за один вызов модели.
+        agreement_samples (int): Сколько случайных строк внутри домена сверить с моделью
+            (расхождения возможны только из-за корзин Age и Sleep_duration).
+    """
+    grid = grid or build_grid()
+    total = int(np.prod([grid[feature][3] for feature in FEATURES]))
+    print(f"🧮 Домен таблицы: {total:,} строк")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    classes = [int(c) for c in model.classes_]
+    table = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=table_dtype(len(classes)), shape=(total,))
+
+    start_time = time.perf_counter()
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        labels, probs = _score(model, _decode(np.arange(start, stop), grid))
+        table["label"][start:stop] = labels
+        table["proba"][start:stop] = probs
+    table.flush()
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Таблица посчитана за {elapsed:.1f} с ({total / elapsed:,.0f} строк/с)")
+
+    # Согласованность: случайные строки домена с непрерывными признаками внутри корзин
+    rng = np.random.default_rng(random_state)
+    flat = rng.integers(0, total, agreement_samples)
+    X = _decode(flat, grid)
+    for column, feature in enumerate(FEATURES):
+        mode, _, step, _ = grid[feature]
+        if mode == "bucket":
+            X[:, column] += rng.uniform(-0.5, 0.5, agreement_samples) * step
+    agreement = float(np.mean(_score(model, X)[0] == table["label"][flat]))
+    print(f"🎯 Совпадение с моделью внутри корзин: {agreement:.2%}")
+
+    meta = {
+        "model_version": model_version,
+        "features": FEATURES,
+        "classes": classes,
+        "grid": {feature: list(spec) for feature, spec in grid.items()},
+        "rows": total,
+        "agreement": agreement,
+        "build_seconds": round(elapsed, 1),
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"💾 Таблица сохранена: {path}.npy ({table.nbytes / 1e6:.1f} MB)")
+    return meta
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Сборка таблицы ответов для дискретного домена бота")
+    parser.add_argument("--model", default=MODEL_PATH, help="Путь к .pkl модели")
+    parser.add_argument("--out", default=ANSWER_TABLE_PATH, help="Путь к таблице без расширения")
+    parser.add_argument("--age", default=ANSWER_TABLE_AGE, help="Корзины Age: start:stop:step")
+    parser.add_argument("--sleep-duration", default=ANSWER_TABLE_SLEEP_DURATION,
+                        help="Корзины Sleep_duration: start:stop:step")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    # Оценка домена идёт большими пакетами — распараллеливаем лес по всем ядрам
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(estimator, "n_jobs"):
+        estimator.n_jobs = -1
+
+    build_answer_table(model, file_version(args.model), path=args.out,
+                       grid=build_grid(args.age, args.sleep_duration))
+
+
+if __name__ == "__main__":
+    main()
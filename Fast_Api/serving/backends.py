@@ -0,0 +1,61 @@
+import numpy as np
+from serving.schema import FEATURES
+from serving.tree_engine import CompiledForest, compile_model
+from serving.numpy_models import NumpyModel, export_model
+
+# === Бэкенды инференса ===
+#
+# Бэкенд превращает загруженную модель (Pipeline sklearn/XGBoost) в объект с тем же
+# интерфейсом predict / predict_proba / classes_, но другим исполнителем:
+#   native   — модель как есть;
+#   compiled — ансамбль деревьев в массивах NumPy (serving/tree_engine.py);
+#   numpy    — LogisticRegression, GaussianNB и KNN на NumPy без sklearn (serving/numpy_models.py);
+#   onnx     — экспорт в ONNX и onnxruntime (serving/onnx_backend.py, пакеты необязательны).
+# Если бэкенд не поддерживает модель, он выбрасывает ValueError или ImportError.
+
+
+class BackendMismatch(ValueError):
+    """Вероятности бэкенда расходятся с нативной моделью больше допустимого."""
+
+
+def _onnx(model):
+    from serving.onnx_backend import to_onnx_model
+
+    return to_onnx_model(model, n_features=len(FEATURES))
+
+
+BACKENDS = {
+    "native": lambda model: model,
+    "compiled": compile_model,
+    "numpy": export_model,
+    "onnx": _onnx,
+}
+
+
+def is_serving_artifact(model):
+    """Модель открыта из артефакта бэкенда (.compiled / .numpy / .onnx) и нативной версии для сверки нет."""
+    from serving.onnx_backend import OnnxModel
+
+    return isinstance(model, (CompiledForest, NumpyModel, OnnxModel))
+
+
+def build_backend(name, model):
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд инференса: {name} (доступны: {', '.join(BACKENDS)})")
+    return BACKENDS[name](model)
+
+
+def check_equivalence(native, candidate, X, tolerance):
+    """
+    Сверяет вероятности бэкенда с нативной моделью на пакете X.
+
+    Возвращает максимальное абсолютное расхождение; при превышении tolerance или
+    несовпадении классов выбрасывает BackendMismatch.
+    """
+    if not np.array_equal(np.asarray(native.classes_), np.asarray(candidate.classes_)):
+        raise BackendMismatch(f"Классы бэкенда {candidate.classes_} не совпадают с моделью {native.classes_}")
+
+    diff = float(np.max(np.abs(native.predict_proba(X) - candidate.predict_proba(X))))
+    if diff > tolerance:
+        raise BackendMismatch(f"Расхождение вероятностей {diff:.2e} больше допустимого {tolerance:.0e}")
+    return diff
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import numpy as np
+from serving.metrics import Histogram
+
+# === Асинхронный микробатчинг запросов /predict ===
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_BUCKETS_MS = [0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250]
+
+
+class MicroBatcher:
+    """
+    Диспетчер, который собирает одиночные строки из конкурентных запросов в пакеты.
+
+    Пакет закрывается, когда набралось max_batch_size строк или истекло окно max_wait_ms
+    с момента прихода первой строки. На пакет делается один вызов predict_proba
+    (в пуле потоков, чтобы не блокировать event loop), и future каждого вызывающего
+    получает свою строку вероятностей.
+
+    Строки, поставленные с разными predict_proba (например, до и после горячей
+    перезагрузки модели), в один вызов не смешиваются.
+
+    Args:
+        predict_proba (callable): Функция X -> вероятности по умолчанию.
+        max_batch_size (int): Максимальный размер пакета.
+        max_wait_ms (float): Окно ожидания новых строк после первой строки пакета.
+        dtype: Тип матрицы пакета (см. INFERENCE_DTYPE).
+    """
+
+    def __init__(self, predict_proba, max_batch_size=32, max_wait_ms=2.0, dtype=np.float64):
+        self.predict_proba = predict_proba
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.dtype = dtype
+
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, row, predict_proba=None):
+        """Ставит строку признаков в очередь и ждёт её вероятности."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future, time.perf_counter(), predict_proba or self.predict_proba))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            started = time.perf_counter()
+            self.batch_size.observe(len(batch))
+            groups = {}
+            for row, future, enqueued, predict_proba in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+                groups.setdefault(predict_proba, []).append((row, future))
+
+            for predict_proba, items in groups.items():
+                await self._score(loop, predict_proba, items)
+
+    async def _score(self, loop, predict_proba, items):
+        try:
+            # Сборка матрицы тоже внутри try: строка другой длины не должна останавливать цикл
+            # пакетов и оставлять остальных ждущих без ответа
+            X = np.array([row for row, _ in items], dtype=self.dtype)
+            probs = await loop.run_in_executor(None, predict_proba, X)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), row_probs in zip(items, probs):
+            if not future.done():
+                future.set_result(row_probs)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
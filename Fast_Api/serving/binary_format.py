@@ -0,0 +1,148 @@
+import numpy as np
+from fastapi.routing import APIRoute
+
+# === Бинарный формат для машинных клиентов ===
+#
+# Для пакетных клиентов разбор JSON и валидация SleepData по полю стоят дороже самого
+# инференса. Альтернатива на тех же эндпоинтах, выбирается по Content-Type:
+#
+#   application/x-sleep-matrix; dtype=f4|f8 — сырая матрица little-endian float32/float64
+#       по строкам; порядок столбцов объявляется в заголовке X-Columns через запятую.
+#   application/vnd.apache.arrow.stream — Arrow IPC поток с record batch'ами,
+#       столбцы по именам признаков (нужен pyarrow).
+#
+# Ответ — в том же формате: матрица вероятностей классов, столбцы — метки классов (bad, good, medium).
+
+MATRIX_CONTENT_TYPE = "application/x-sleep-matrix"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+DTYPES = {"f4": np.dtype("<f4"), "f8": np.dtype("<f8")}
+
+# Описание альтернативных тел запроса для OpenAPI (сливается с JSON-схемой эндпоинта)
+OPENAPI_EXTRA = {"requestBody": {"content": {
+    MATRIX_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+    ARROW_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+}}}
+
+
+class BinaryFormatError(ValueError):
+    """Тело запроса не соответствует объявленному формату или признакам модели."""
+
+
+def parse_content_type(header):
+    """'application/x-sleep-matrix; dtype=f4' -> ('application/x-sleep-matrix', {'dtype': 'f4'})"""
+    media_type, *params = (header or "").split(";")
+    options = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        options[key.strip().lower()] = value.strip().strip('"')
+    return media_type.strip().lower(), options
+
+
+def is_binary(header):
+    return parse_content_type(header)[0] in (MATRIX_CONTENT_TYPE, ARROW_CONTENT_TYPE)
+
+
+def column_order(columns, features):
+    """
+    Сверяет объявленные столбцы с признаками модели.
+
+    Returns:
+        None, если порядок совпадает (матрица идёт в модель как есть),
+        иначе индексы столбцов в порядке признаков модели.
+    """
+    if list(columns) == list(features):
+        return None
+    if sorted(columns) != sorted(features):
+        missing = sorted(set(features) - set(columns))
+        unknown = sorted(set(columns) - set(features))
+        raise BinaryFormatError(f"Столбцы не совпадают с признаками модели: нет {missing}, лишние {unknown}; "
+                                f"ожидается {','.join(features)}")
+    return [list(columns).index(feature) for feature in features]
+
+
+def decode_matrix(body, dtype, columns, features):
+    """Сырое тело -> матрица (n_rows, n_features): представление над буфером запроса без копирования."""
+    if dtype not in DTYPES:
+        raise BinaryFormatError(f"Неизвестный dtype={dtype!r}, допустимы: {', '.join(DTYPES)}")
+    if not columns:
+        raise BinaryFormatError("Не указан порядок столбцов (заголовок X-Columns)")
+    row_bytes = DTYPES[dtype].itemsize * len(columns)
+    if len(body) % row_bytes:
+        raise BinaryFormatError(f"Размер тела {len(body)} байт не кратен строке из {len(columns)} x {dtype}")
+
+    order = column_order(columns, features)
+    X = np.frombuffer(body, dtype=DTYPES[dtype]).reshape(-1, len(columns))
+    if order is not None:
+        X = X[:, order]
+    if not np.isfinite(X).all():
+        raise BinaryFormatError("Матрица содержит NaN или бесконечность")
+    return X
+
+
+def encode_matrix(probs, dtype):
+    return np.ascontiguousarray(probs, dtype=DTYPES[dtype]).tobytes()
+
+
+def decode_arrow(body, features):
+    """
+    Arrow IPC поток -> матрица (n_rows, n_features) и dtype ответа.
+
+    Столбцы выбираются по именам в порядке признаков модели; Arrow хранит данные по столбцам,
+    поэтому построчная матрица для модели — одна копия.
+    """
+    import pyarrow as pa
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise BinaryFormatError(f"Некорректный Arrow IPC поток: {e}") from e
+    column_order(table.column_names, features)
+
+    types = {table.schema.field(name).type for name in features}
+    if types == {pa.float32()}:
+        dtype = "f4"
+    elif types <= {pa.float32(), pa.float64()}:
+        dtype = "f8"
+    else:
+        raise BinaryFormatError(f"Признаки должны быть float32 или float64, получено: {sorted(map(str, types))}")
+    if any(table.column(name).null_count for name in features):
+        raise BinaryFormatError("Arrow-таблица содержит пропуски")
+
+    X = np.empty((table.num_rows, len(features)), dtype=DTYPES[dtype])
+    for i, name in enumerate(features):
+        X[:, i] = table.column(name).to_numpy()
+    if not np.isfinite(X).all():
+        raise BinaryFormatError("Матрица содержит NaN или бесконечность")
+    return X, dtype
+
+
+def encode_arrow(probs, dtype, columns, model_version):
+    import pyarrow as pa
+
+    probs = np.asarray(probs, dtype=DTYPES[dtype])
+    batch = pa.record_batch([pa.array(probs[:, i]) for i in range(probs.shape[1])], names=list(columns))
+    schema = batch.schema.with_metadata({"model_version": model_version})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+
+def binary_route_class(score):
+    """
+    Класс маршрута, который отдаёт запросы с бинарным Content-Type в score(request),
+    а все остальные — обычному обработчику FastAPI (JSON + pydantic).
+    """
+
+    class BinaryAwareRoute(APIRoute):
+        def get_route_handler(self):
+            json_handler = super().get_route_handler()
+
+            async def route_handler(request):
+                if is_binary(request.headers.get("content-type")):
+                    return await score(request)
+                return await json_handler(request)
+
+            return route_handler
+
+    return BinaryAwareRoute
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+
+# === Кэш предсказаний (LRU + TTL) ===
+
+
+def canonical_key(row, model_version):
+    """
+    Канонический ключ кэша: версия модели + вектор признаков, приведённый к float32.
+
+    Деревья sklearn и XGBoost сравнивают признаки во float32, поэтому входы,
+    совпадающие после округления до float32, дают одно и то же предсказание.
+    -0.0 приводится к 0.0, чтобы не плодить дубликаты ключей.
+    """
+    vector = np.asarray(row, dtype=np.float32) + np.float32(0.0)
+    return model_version, vector.tobytes()
+
+
+class PredictionCache:
+    """
+    Ограниченный in-process кэш предсказаний с вытеснением по размеру (LRU) и по времени (TTL).
+
+    Одновременные запросы с одинаковым ключом схлопываются: вычисление выполняет
+    первый запрос, остальные ждут его результат.
+
+    Кэшируются только живые версии моделей: основная (invalidate) и модели кэша моделей
+    (track / untrack). Запрос к другой версии идёт мимо кэша и в hits/misses не считается.
+
+    Args:
+        max_size (int): Максимальное число записей; 0 отключает кэш.
+        ttl (float): Время жизни записи в секундах.
+        clock (callable, optional): Источник времени (для тестов). Default is time.monotonic.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.model_version = None
+        self._versions = {}  # версия -> сколько загруженных моделей её обслуживают
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _claim(self, key):
+        """
+        Проверяет кэш под блокировкой.
+
+        Возвращает ("hit", value), ("wait", future) — значение уже вычисляет другой
+        запрос, ("own", future) — вычислять должен текущий запрос, или ("bypass", None) —
+        версия модели не живая, результат не кэшируется.
+        """
+        with self._lock:
+            if key[0] not in self._versions:
+                self.bypassed += 1
+                return "bypass", None
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return "hit", value
+                del self._entries[key]
+                self.expirations += 1
+
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self.collapsed += 1
+                return "wait", pending
+
+            pending = Future()
+            self._in_flight[key] = pending
+            self.misses += 1
+            return "own", pending
+
+    def _complete(self, key, pending, value):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            # Модель могла смениться или уйти из кэша моделей, пока шло вычисление — такой результат не кэшируем
+            if key[0] in self._versions:
+                self._entries[key] = (self.clock() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        pending.set_result(value)
+
+    def _fail(self, key, pending, error):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        pending.set_exception(error)
+
+    def get_or_compute(self, key, compute):
+        """Возвращает значение из кэша или вычисляет его через compute() и сохраняет."""
+        if not self.enabled:
+            return compute()
+
+        state, value = self._claim(key)
+        if state == "hit":
+            return value
+        if state == "bypass":
+            return compute()
+        if state == "wait":
+            return value.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            self._fail(key, value, e)
+            raise
+        self._complete(key, value, result)
+        return result
+
+    async def get_or_compute_async(self, key, compute):
+        """Асинхронный вариант get_or_compute: compute() возвращает корутину."""
+        if not self.enabled:
+            return await compute()
+
+        state, value = self._claim(key)
+        if state == "hit":
+            return value
+        if state == "bypass":
+            return await compute()
+        if state == "wait":
+            return await asyncio.wrap_future(value)
+
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._fail(key, value, e)
+            raise
+        self._complete(key, value, result)
+        return result
+
+    def invalidate(self, model_version):
+        """Смена основной модели: запоминает новую версию, записи прежней сбрасываются."""
+        with self._lock:
+            previous, self.model_version = self.model_version, model_version
+            self._retain(model_version)
+            if previous is not None:
+                self._release(previous)
+
+    def track(self, model_version):
+        """Версия загружена в кэш моделей (X-Model): её предсказания тоже кэшируются."""
+        with self._lock:
+            self._retain(model_version)
+
+    def untrack(self, model_version):
+        """Модель вытеснена из кэша моделей: записи её версии сбрасываются, если её больше никто не обслуживает."""
+        with self._lock:
+            self._release(model_version)
+
+    def _retain(self, model_version):
+        self._versions[model_version] = self._versions.get(model_version, 0) + 1
+
+    def _release(self, model_version):
+        left = self._versions.get(model_version, 0) - 1
+        if left > 0:
+            self._versions[model_version] = left
+            return
+        self._versions.pop(model_version, None)
+        for key in [key for key in self._entries if key[0] == model_version]:
+            del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "model_version": self.model_version,
+                "versions": sorted(self._versions),
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "collapsed": self.collapsed,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "bypassed": self.bypassed,
+            }
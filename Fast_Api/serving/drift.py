@@ -0,0 +1,179 @@
+import argparse
+import bisect
+import json
+import os
+import threading
+import numpy as np
+from serving.settings import BASE_DIR, DRIFT_REFERENCE_PATH
+from serving.schema import FEATURES
+
+# === Мониторинг дрейфа признаков ===
+#
+# Эталон — распределение каждого признака в обучающем CSV. Он считается один раз офлайн-шагом
+# сборки модели (python -m serving.drift, как и таблица ответов) и хранится как гистограмма
+# с фиксированными границами корзин:
+#   - признак с небольшим числом значений (флаги, часы, число пробуждений) — корзина на значение,
+#     границы посередине между соседними значениями;
+#   - остальные — децили обучающих данных.
+# Крайние корзины открыты, поэтому любое живое значение куда-то попадает.
+#
+# В API каждая оценённая строка раскладывается по тем же корзинам: на признак — двоичный поиск
+# по ≤ 12 границам и увеличение одного счётчика, память фиксирована. Живые счётчики ведутся
+# в двух сменяющихся окнах по window_rows строк; оценки считаются по обоим окнам, то есть
+# по последним window_rows–2·window_rows строкам, и пересчитываются только при запросе /drift.
+
+DEFAULT_DATA_PATH = os.path.join(BASE_DIR, "..", "Data", "processed_data",
+                                 "Sleep_Efficiency_clear_yes_collinearity_forXG_RF_NO_REM.csv")
+DISCRETE_MAX_VALUES = 12
+QUANTILE_BINS = 10
+# Сглаживание долей для PSI: пустая корзина не даёт бесконечности
+PSI_EPSILON = 1e-4
+# Общепринятые пороги PSI: < 0.1 — стабильно, 0.1–0.25 — умеренный сдвиг, > 0.25 — значимый
+PSI_THRESHOLDS = (0.1, 0.25)
+
+
+def build_reference(data_path=DEFAULT_DATA_PATH, features=FEATURES):
+    """
+    Эталонные гистограммы признаков по обучающему CSV.
+
+    Returns:
+        dict: {"source", "rows", "features": {имя: {"kind", "edges", "proportions"}}},
+        где edges — внутренние границы корзин (корзин на одну больше), proportions — доли строк в корзинах.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(data_path)
+    reference = {"source": os.path.relpath(os.path.abspath(data_path), os.path.join(BASE_DIR, "..")),
+                 "rows": len(df), "features": {}}
+    for feature in features:
+        values = df[feature].to_numpy(dtype=np.float64)
+        unique = np.unique(values)
+        if len(unique) <= DISCRETE_MAX_VALUES:
+            kind, edges = "discrete", (unique[:-1] + unique[1:]) / 2
+        else:
+            kind = "quantile"
+            edges = np.unique(np.round(np.quantile(values, np.arange(1, QUANTILE_BINS) / QUANTILE_BINS), 6))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        reference["features"][feature] = {
+            "kind": kind,
+            "edges": edges.tolist(),
+            "proportions": (counts / len(values)).tolist(),
+        }
+    return reference
+
+
+def psi(expected, actual, epsilon=PSI_EPSILON):
+    """Population Stability Index между долями эталона и живыми долями по одним и тем же корзинам."""
+    expected = np.asarray(expected) + epsilon
+    actual = np.asarray(actual) + epsilon
+    expected, actual = expected / expected.sum(), actual / actual.sum()
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected, actual):
+    """Статистика Колмогорова–Смирнова по корзинам: наибольшее расхождение накопленных долей."""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+def _status(value):
+    if value < PSI_THRESHOLDS[0]:
+        return "stable"
+    return "moderate" if value < PSI_THRESHOLDS[1] else "significant"
+
+
+class DriftMonitor:
+    """
+    Живые гистограммы признаков в фиксированной памяти и их сравнение с эталоном (PSI и KS).
+
+    Args:
+        reference (dict): Эталон из build_reference (или его JSON).
+        features (list): Порядок признаков в строках, которые передаются в update.
+        window_rows (int): Размер окна живых данных в строках.
+        min_rows (int): Меньше строк — оценки не считаются (status insufficient_data).
+    """
+
+    def __init__(self, reference, features=FEATURES, window_rows=10_000, min_rows=100):
+        missing = [feature for feature in features if feature not in reference["features"]]
+        if missing:
+            raise ValueError(f"В эталоне дрейфа нет признаков: {missing}")
+        self.reference = reference
+        self.features = list(features)
+        self.window_rows = window_rows
+        self.min_rows = min_rows
+        self._edges = [reference["features"][feature]["edges"] for feature in self.features]
+        self._edges_np = [np.asarray(edges, dtype=np.float64) for edges in self._edges]
+        self._expected = [np.asarray(reference["features"][feature]["proportions"]) for feature in self.features]
+        # Текущее и предыдущее окно: по массиву счётчиков корзин на признак
+        self._current = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self._edges]
+        self._previous = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self._edges]
+        self._current_rows = 0
+        self._previous_rows = 0
+        self.total_rows = 0
+        self._lock = threading.Lock()
+
+    def update(self, X):
+        """Раскладывает строки X (n_rows, n_features) по корзинам эталона."""
+        X = np.asarray(X, dtype=np.float64)
+        with self._lock:
+            if len(X) == 1:
+                # Одиночный запрос: двоичный поиск по короткому списку дешевле вызовов NumPy
+                for counts, edges, value in zip(self._current, self._edges, X[0].tolist()):
+                    counts[bisect.bisect_right(edges, value)] += 1
+            else:
+                for f, (counts, edges) in enumerate(zip(self._current, self._edges_np)):
+                    counts += np.bincount(np.searchsorted(edges, X[:, f], side="right"), minlength=len(counts))
+            self._current_rows += len(X)
+            self.total_rows += len(X)
+            if self._current_rows >= self.window_rows:
+                self._previous, self._current = self._current, [np.zeros_like(c) for c in self._current]
+                self._previous_rows, self._current_rows = self._current_rows, 0
+
+    def scores(self, detail=False):
+        """
+        PSI и KS по каждому признаку для последних строк окна.
+
+        Args:
+            detail (bool): Добавить границы корзин и доли эталона и живых данных.
+        """
+        with self._lock:
+            live = [current + previous for current, previous in zip(self._current, self._previous)]
+            rows = self._current_rows + self._previous_rows
+        result = {"rows": rows, "total_rows": self.total_rows, "window_rows": self.window_rows,
+                  "reference": {"source": self.reference.get("source"), "rows": self.reference.get("rows")}}
+        if rows < self.min_rows:
+            return {**result, "status": "insufficient_data", "features": {}}
+
+        features = {}
+        for feature, expected, counts, edges in zip(self.features, self._expected, live, self._edges):
+            actual = counts / rows
+            features[feature] = {"psi": round(psi(expected, actual), 4), "ks": round(ks(expected, actual), 4)}
+            features[feature]["status"] = _status(features[feature]["psi"])
+            if detail:
+                features[feature].update(edges=edges, reference=[round(p, 4) for p in expected.tolist()],
+                                         live=[round(p, 4) for p in actual.tolist()])
+        worst = max(features, key=lambda name: features[name]["psi"])
+        return {**result, "status": features[worst]["status"], "max_psi_feature": worst, "features": features}
+
+
+def load_reference(path=DRIFT_REFERENCE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Эталонные гистограммы признаков для мониторинга дрейфа")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Обучающий CSV")
+    parser.add_argument("--out", default=DRIFT_REFERENCE_PATH, help="Куда записать эталон (JSON)")
+    args = parser.parse_args()
+
+    reference = build_reference(args.data)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(reference, f, indent=2)
+    bins = sum(len(spec["proportions"]) for spec in reference["features"].values())
+    print(f"💾 Эталон дрейфа: {args.out} ({reference['rows']} строк, {len(reference['features'])} признаков, "
+          f"{bins} корзин)")
+
+
+if __name__ == "__main__":
+    main()
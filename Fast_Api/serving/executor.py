@@ -0,0 +1,177 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+# === Инференс в пуле процессов ===
+#
+# predict_proba леса занимает GIL и конкурирует с разбором запросов и сериализацией
+# ответов в потоках FastAPI. ProcessPoolModel выносит вызовы модели в отдельные процессы,
+# у каждого из которых своя копия модели. Строки передаются через заранее выделенные
+# блоки разделяемой памяти: в очередь процессу уходят только имя блока и размеры пакета.
+#
+# Если процесс пула умер (OOM killer, SIGKILL), ProcessPoolExecutor ломается целиком и
+# отклоняет все следующие задачи. Тогда пул пересоздаётся с той же моделью, а часть пакета
+# отправляется ещё раз — один раз: повторная поломка уходит вызывающему.
+
+# Состояние процесса пула: модель и подключённые блоки разделяемой памяти
+_worker_model = None
+_worker_buffers = {}
+
+
+class ExecutorSaturated(RuntimeError):
+    """Все слоты пула заняты дольше допустимого — запрос нужно отклонить."""
+
+
+def _init_worker(model, warmup):
+    global _worker_model
+    _worker_model = model
+    # Прогрев в самом процессе пула, пока он ещё не получил запросы
+    model.predict_proba(warmup)
+
+
+def _buffer(name):
+    shm = _worker_buffers.get(name)
+    if shm is None:
+        shm = _worker_buffers[name] = SharedMemory(name=name)
+    return shm
+
+
+def _predict_slot(in_name, out_name, n_rows, n_features, n_classes):
+    X = np.ndarray((n_rows, n_features), dtype=np.float64, buffer=_buffer(in_name).buf)
+    out = np.ndarray((n_rows, n_classes), dtype=np.float64, buffer=_buffer(out_name).buf)
+    out[:] = _worker_model.predict_proba(X)
+    return n_rows
+
+
+def _ping():
+    return True
+
+
+class _Slot:
+    """Пара блоков разделяемой памяти (вход и выход) на slot_rows строк."""
+
+    def __init__(self, slot_rows, n_features, n_classes):
+        self.input = SharedMemory(create=True, size=slot_rows * n_features * 8)
+        self.output = SharedMemory(create=True, size=slot_rows * n_classes * 8)
+        self.X = np.ndarray((slot_rows, n_features), dtype=np.float64, buffer=self.input.buf)
+        self.probs = np.ndarray((slot_rows, n_classes), dtype=np.float64, buffer=self.output.buf)
+
+    def release(self):
+        # Представления numpy держат буфер — их нужно отпустить до close()
+        del self.X, self.probs
+        for shm in (self.input, self.output):
+            shm.close()
+            shm.unlink()
+
+
+class ProcessPoolModel:
+    """
+    Обёртка над моделью, которая выполняет predict_proba в пуле процессов.
+
+    Повторяет интерфейс классификатора, которым пользуется API (predict, predict_proba,
+    classes_), поэтому подставляется в ModelStore вместо самой модели.
+
+    Args:
+        model: Загруженная модель; копия передаётся в каждый процесс пула при старте.
+        n_features (int): Число признаков.
+        workers (int): Число процессов пула.
+        queue_limit (int): Сколько пакетов может быть в работе одновременно (число слотов памяти).
+        queue_timeout (float): Сколько секунд ждать свободный слот, прежде чем выбросить ExecutorSaturated.
+        slot_rows (int): Ёмкость слота в строках; большие пакеты идут через слот частями.
+        start_method (str): Способ запуска процессов multiprocessing (spawn, forkserver, fork).
+        warmup (np.ndarray, optional): Пакет для прогрева каждого процесса.
+    """
+
+    def __init__(self, model, n_features, workers=2, queue_limit=8, queue_timeout=1.0, slot_rows=1024,
+                 start_method="spawn", warmup=None):
+        self.classes_ = np.asarray(model.classes_)
+        self.n_features = n_features
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.slot_rows = slot_rows
+        self.wrapped_type = type(model).__name__
+        self.saturated = 0
+        self.restarts = 0
+
+        self._model = model
+        self._warmup = warmup if warmup is not None else np.zeros((1, n_features))
+        self._context = multiprocessing.get_context(start_method)
+        self._pool_lock = threading.Lock()
+        self._pool = self._start_pool()
+        self._slots = queue.Queue()
+        for _ in range(queue_limit):
+            self._slots.put(_Slot(slot_rows, n_features, len(self.classes_)))
+
+        # Процессы пула запускаются по требованию — поднимаем все сразу, пока сервис не готов
+        wait([self._pool.submit(_ping) for _ in range(workers)])
+
+    def _start_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                   initializer=_init_worker, initargs=(self._model, self._warmup))
+
+    def _restart(self, broken):
+        """Заменяет сломанный пул новым; если другой поток уже заменил его — ничего не делает."""
+        with self._pool_lock:
+            if self._pool is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._start_pool()
+                self.restarts += 1
+                print(f"♻️ Процесс пула инференса упал, пул перезапущен (перезапусков: {self.restarts})")
+            return self._pool
+
+    def _run_chunk(self, slot, n_rows, n_classes):
+        pool = self._pool
+        for attempt in range(2):
+            try:
+                return pool.submit(_predict_slot, slot.input.name, slot.output.name,
+                                   n_rows, self.n_features, n_classes).result()
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                pool = self._restart(pool)
+
+    def predict_proba(self, X):
+        # Приведение к float64 происходит при копировании в блок памяти, отдельная копия не нужна
+        X = np.asarray(X)
+        try:
+            slot = self._slots.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            self.saturated += 1
+            raise ExecutorSaturated(f"Пул инференса занят: {self.queue_limit} пакетов в работе")
+
+        try:
+            n_classes = len(self.classes_)
+            probs = np.empty((len(X), n_classes), dtype=np.float64)
+            for start in range(0, len(X), self.slot_rows):
+                chunk = X[start:start + self.slot_rows]
+                slot.X[:len(chunk)] = chunk
+                self._run_chunk(slot, len(chunk), n_classes)
+                probs[start:start + len(chunk)] = slot.probs[:len(chunk)]
+            return probs
+        finally:
+            self._slots.put(slot)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def stats(self):
+        return {
+            "executor": "process",
+            "model_type": self.wrapped_type,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "free_slots": self._slots.qsize(),
+            "saturated": self.saturated,
+            "restarts": self.restarts,
+        }
+
+    def close(self):
+        """Дожидается текущих пакетов, останавливает процессы и освобождает разделяемую память."""
+        self._pool.shutdown(wait=True)
+        while not self._slots.empty():
+            self._slots.get_nowait().release()
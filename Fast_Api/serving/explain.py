@@ -0,0 +1,44 @@
+from serving.schema import LABELS
+from serving.tree_engine import compile_model
+
+# === Объяснения предсказаний ===
+#
+# Вклады признаков считает CompiledForest.explain (метод Saabas по путям в деревьях).
+# Для нативной модели sklearn/XGBoost при загрузке строится её скомпилированная копия —
+# она совпадает с исходной моделью побитово (см. tree_engine.py), так что объяснение
+# относится ровно к тому предсказанию, которое вернул API.
+
+
+def build_explainer(model):
+    """CompiledForest для explain или None, если модель не ансамбль деревьев."""
+    try:
+        explainer = compile_model(model)
+    except ValueError as e:
+        print(f"⚠️ Объяснения недоступны: {e}")
+        return None
+    if explainer.kind == "boosting" and explainer.node_value is None:
+        print("⚠️ Объяснения недоступны: в артефакте нет значений внутренних узлов — перекомпилируйте модель")
+        return None
+    return explainer
+
+
+def explain_rows(explainer, X, features):
+    """
+    Объяснения для каждой строки X в формате ответа API.
+
+    units — в чём измеряются вклады: probability (RandomForest, bias + сумма вкладов = вероятность класса)
+    или margin (XGBoost, отступ до softmax). По каждому классу — вклад каждого признака.
+    """
+    bias, contributions = explainer.explain(X)
+    units = "probability" if explainer.kind == "forest" else "margin"
+    labels = [LABELS[int(c)] for c in explainer.classes_]
+    return [
+        {
+            "units": units,
+            "bias": {label: round(float(b[k]), 4) for k, label in enumerate(labels)},
+            "contributions": {label: {feature: round(float(row[i, k]), 4) for i, feature in enumerate(features)}
+                              for k, label in enumerate(labels)},
+        }
+        for b, row in zip(bias, contributions)
+    ]
+
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import pickle
+import numpy as np
+from serving.tree_engine import CompiledForest, _tree_depth
+
+# === Память модели: деревья, массивы узлов и RSS процесса ===
+#
+# Сколько занимает загруженная модель, видно по её устройству: у деревьев sklearn это массивы
+# узлов (64 байта на узел) и значений (n_classes × 8 байт на узел), у XGBoost — узлы RegTree
+# и их статистики, у скомпилированного ансамбля — его массивы. Неподрезанные деревья
+# (max_depth=None) дают десятки тысяч узлов, и разницу между версиями модели видно сразу.
+# Отчёт строится по самой модели без загрузки заново; RSS процесса до и после загрузки
+# снимается в ModelStore.reload и в кэше моделей.
+#
+# Запуск из папки Fast_Api (отчёт по файлу в новом процессе, как при старте API):
+#   python -m serving.introspection --model models/RandomForest_Sleep.pkl
+#   python -m serving.introspection --model models/RandomForest_Sleep.pkl --json --estimators
+
+# Размеры структур дерева XGBoost: RegTree::Node (родитель, потомки, признак, порог/значение листа)
+# и RTreeNodeStat (loss_chg, sum_hess, base_weight, leaf_child_cnt)
+XGB_NODE_BYTES = 20
+XGB_STAT_BYTES = 16
+
+# Массивы CompiledForest, у которых по строке на узел: «узлы» и «значения» — как у деревьев sklearn
+COMPILED_NODE_ARRAYS = ("feature", "threshold", "left", "right", "children", "is_leaf", "default_left")
+COMPILED_VALUE_ARRAYS = ("value", "node_value")
+
+
+def process_rss():
+    """Текущий RSS процесса в байтах или None, если /proc недоступен."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def model_nbytes(model):
+    """
+    Оценка памяти модели: размер её pickle, где массивы NumPy не копируются (protocol 5, out-of-band).
+
+    Для деревьев sklearn и бустинга XGBoost это почти вся занимаемая память: массивы узлов и сам бустер.
+    """
+    buffers = []
+    size = len(pickle.dumps(model, protocol=5, buffer_callback=buffers.append))
+    return size + sum(buffer.raw().nbytes for buffer in buffers)
+
+
+def _final_estimator(model):
+    """Последний шаг Pipeline или сама модель."""
+    return model.steps[-1][1] if hasattr(model, "steps") else model
+
+
+def _sklearn_tree(tree):
+    # Память выделяется на capacity узлов; после обучения и загрузки она равна node_count
+    capacity = getattr(tree, "capacity", tree.node_count)
+    state = tree.__getstate__()
+    value_row = state["values"][:1].nbytes
+    return {
+        "nodes": int(tree.node_count),
+        "leaves": int(tree.n_leaves),
+        "depth": int(tree.max_depth),
+        "node_bytes": int(capacity * state["nodes"].dtype.itemsize),
+        "value_bytes": int(capacity * value_row),
+    }
+
+
+def _xgboost_trees(booster):
+    trees = json.loads(booster.save_raw("json"))["learner"]["gradient_booster"]["model"]["trees"]
+    stats = []
+    for tree in trees:
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        stats.append({
+            "nodes": len(left),
+            "leaves": int((left == -1).sum()),
+            "depth": _tree_depth(left, np.asarray(tree["right_children"], dtype=np.int64)),
+            "node_bytes": len(left) * XGB_NODE_BYTES,
+            "value_bytes": len(left) * XGB_STAT_BYTES,
+        })
+    return stats
+
+
+def _compiled_trees(forest):
+    def row_bytes(names):
+        return sum(getattr(forest, name)[:1].nbytes for name in names if getattr(forest, name) is not None)
+
+    node_row, value_row = row_bytes(COMPILED_NODE_ARRAYS), row_bytes(COMPILED_VALUE_ARRAYS)
+    ends = list(forest.roots[1:]) + [forest.n_nodes]
+    stats = []
+    for start, end in zip(forest.roots, ends):
+        own = np.arange(end - start)
+        # У листа скомпилированного дерева потомок — он сам
+        left, right = forest.left[start:end] - start, forest.right[start:end] - start
+        leaf = left == own
+        n = int(end - start)
+        stats.append({
+            "nodes": n,
+            "leaves": int(leaf.sum()),
+            "depth": _tree_depth(np.where(leaf, -1, left), np.where(leaf, -1, right)),
+            "node_bytes": n * node_row,
+            "value_bytes": n * value_row,
+        })
+    return stats
+
+
+def estimator_stats(model):
+    """
+    Деревья модели: узлы, листья, глубина и байты массивов узлов и значений каждого дерева.
+
+    Поддерживаются деревья и ансамбли sklearn (в том числе внутри Pipeline), XGBoost и CompiledForest.
+    Для остальных моделей — None.
+    """
+    estimator = _final_estimator(model)
+    if isinstance(estimator, CompiledForest):
+        return _compiled_trees(estimator)
+    if hasattr(estimator, "get_booster"):
+        return _xgboost_trees(estimator.get_booster())
+    if hasattr(estimator, "tree_"):
+        return [_sklearn_tree(estimator.tree_)]
+    estimators = getattr(estimator, "estimators_", None)
+    if estimators is not None:
+        # У градиентного бустинга sklearn estimators_ — матрица (итерации × классы)
+        trees = np.ravel(np.asarray(estimators, dtype=object))
+        if len(trees) and all(hasattr(tree, "tree_") for tree in trees):
+            return [_sklearn_tree(tree.tree_) for tree in trees]
+    return None
+
+
+def model_memory(model, estimators=False):
+    """
+    Отчёт о памяти модели.
+
+    Args:
+        model: Загруженная модель (как её обслуживает API).
+        estimators (bool): Добавить список деревьев (см. estimator_stats).
+
+    Returns:
+        dict: тип модели, число деревьев, суммы узлов и листьев, максимальная глубина,
+            байты массивов узлов и значений, полный размер в памяти (model_nbytes; None —
+            модель не сериализуется, например пул процессов).
+    """
+    trees = estimator_stats(model)
+    try:
+        deserialized = model_nbytes(model)
+    except Exception:
+        deserialized = None
+    report = {
+        "model_type": type(_final_estimator(model)).__name__,
+        "deserialized_bytes": deserialized,
+        "n_estimators": None,
+    }
+    if trees is not None:
+        report.update({
+            "n_estimators": len(trees),
+            "nodes": sum(tree["nodes"] for tree in trees),
+            "leaves": sum(tree["leaves"] for tree in trees),
+            "max_depth": max((tree["depth"] for tree in trees), default=0),
+            "mean_depth": round(float(np.mean([tree["depth"] for tree in trees])), 2) if trees else 0.0,
+            "node_bytes": sum(tree["node_bytes"] for tree in trees),
+            "value_bytes": sum(tree["value_bytes"] for tree in trees),
+        })
+        if estimators:
+            report["estimators"] = trees
+    return report
+
+
+def _megabytes(value, digits):
+    """Байты в MB для печати; None (замер недоступен) — «н/д»."""
+    return "н/д" if value is None else f"{value / 1e6:.{digits}f} MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память модели: деревья, массивы узлов и RSS до и после загрузки")
+    parser.add_argument("--model", required=True, help="Путь к .pkl, .onnx или каталогу артефакта")
+    parser.add_argument("--estimators", action="store_true", help="Добавить статистику каждого дерева")
+    parser.add_argument("--json", action="store_true", help="Печатать отчёт JSON (для run_experiment)")
+    args = parser.parse_args(argv)
+
+    rss_before = process_rss()
+    from serving.model_store import load_from_file
+
+    model, version, _ = load_from_file(args.model)
+    rss_after = process_rss()
+    report = {"model_version": version, "rss_before_load_bytes": rss_before, "rss_after_load_bytes": rss_after,
+              **model_memory(model, estimators=args.estimators)}
+    if args.json:
+        print(json.dumps(report))
+        return report
+
+    print(f"📐 {version}: {report['model_type']}, в памяти {_megabytes(report['deserialized_bytes'], 2)}")
+    print(f"   RSS процесса: {_megabytes(rss_before, 1)} до загрузки → {_megabytes(rss_after, 1)} после "
+          f"(с импортом библиотек модели)")
+    if report["n_estimators"] is not None:
+        print(f"   Деревьев {report['n_estimators']}, узлов {report['nodes']}, листьев {report['leaves']}, "
+              f"глубина max {report['max_depth']} / mean {report['mean_depth']}")
+        print(f"   Массивы узлов {report['node_bytes'] / 1e6:.2f} MB, значений {report['value_bytes'] / 1e6:.2f} MB")
+        for index, tree in enumerate(report.get("estimators", [])):
+            print(f"   {index:4d}: узлов {tree['nodes']:6d}, листьев {tree['leaves']:6d}, глубина {tree['depth']:3d}, "
+                  f"{(tree['node_bytes'] + tree['value_bytes']) / 1024:8.1f} KB")
+    return report
+
+
+if __name__ == "__main__":
+    main()
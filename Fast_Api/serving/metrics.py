@@ -0,0 +1,342 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+
+# === Простые метрики сервиса ===
+#
+# Счётчики, гейджи и гистограммы с метками плюс вывод в текстовом формате Prometheus.
+# На горячем пути — только bisect и инкремент под блокировкой; строки формата
+# собираются лишь при запросе /metrics.
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин (как у Prometheus: значение попадает
+    в первую корзину с границей le >= value).
+
+    Args:
+        buckets (list): Возрастающие верхние границы корзин; корзина +Inf добавляется сама.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Накопленные счётчики по корзинам, общее число наблюдений и их сумма."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else f"{bound:g}"] = running
+
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+
+def process_uptime():
+    """
+    Сколько секунд назад запущен текущий процесс (Linux: /proc/self/stat, точность — тик ядра).
+    Где /proc недоступен, возвращает 0 — отсчёт пойдёт от момента вызова.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Поле 22 (starttime) — в тиках с загрузки системы; имя процесса в скобках может содержать пробелы
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class StartupTimer:
+    """
+    Отметки холодного старта в секундах от запуска процесса: загрузка модели,
+    готовность, первое предсказание. Каждая отметка ставится один раз.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter() - process_uptime()
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = round(time.perf_counter() - self.origin, 4)
+        return self.marks[name]
+
+    def snapshot(self):
+        return dict(self.marks)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Монотонный счётчик с метками.
+
+    Args:
+        name (str): Имя метрики Prometheus.
+        help (str): Описание.
+        labels (tuple): Имена меток.
+        callback (callable, optional): Если задан, значения берутся из него в момент выгрузки:
+            callback() -> {кортеж значений меток: значение}. Так выгружаются счётчики,
+            которые уже ведут другие компоненты (кэш, хранилище модели).
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), callback=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        if self.callback is not None:
+            items = list(self.callback().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in items]
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать (аргументы — как у Counter)."""
+
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class HistogramVec:
+    """
+    Семейство гистограмм с общими границами корзин, по одной на набор значений меток.
+
+    Args:
+        name (str): Имя метрики Prometheus.
+        help (str): Описание.
+        labels (tuple): Имена меток.
+        buckets (list): Границы корзин.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = list(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def child(self, *label_values):
+        child = self._children.get(label_values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(label_values, Histogram(self.buckets))
+        return child
+
+    def observe(self, *label_values, value):
+        self.child(*label_values).observe(value)
+
+    def samples(self):
+        samples = []
+        for key, child in list(self._children.items()):
+            snapshot = child.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                samples.append((self.name + "_bucket", _format_labels(self.labels, key, ("le", bound)), count))
+            samples.append((self.name + "_sum", _format_labels(self.labels, key), snapshot["sum"]))
+            samples.append((self.name + "_count", _format_labels(self.labels, key), snapshot["count"]))
+        return samples
+
+
+class Registry:
+    """Набор метрик, которые выгружает /metrics."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Текстовый формат Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# === Поэтапные замеры запроса ===
+
+_current_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """
+    Замеры этапов одного запроса: stage(name) записывает время с предыдущей отметки.
+    Создаётся middleware и доступен обработчику через current_timer().
+    """
+
+    __slots__ = ("started", "last", "stages", "model_version")
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.stages = []
+        self.model_version = None
+
+    def stage(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self.last))
+        self.last = now
+
+    def elapsed_ms(self):
+        """Время с начала запроса, мс."""
+        return (time.perf_counter() - self.started) * 1000
+
+
+class _NullTimer:
+    """Заглушка, когда запрос пришёл не через MetricsMiddleware (например, вызов обработчика напрямую)."""
+
+    model_version = None
+
+    def stage(self, name):
+        pass
+
+    def elapsed_ms(self):
+        return float("nan")
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def current_timer():
+    return _current_timer.get() or _NULL_TIMER
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: замеры этапов, счётчики запросов по исходу и версии модели, гейдж запросов в работе.
+
+    Этапы до обработчика (разбор тела и валидация pydantic) и после него (сериализация ответа)
+    видны только снаружи, поэтому отметки ставятся здесь: при входе в обработчик он сам
+    вызывает timer.stage("validation"), а при отправке заголовков ответа middleware
+    записывает stage("serialization").
+
+    Args:
+        app: ASGI-приложение.
+        metrics (ServiceMetrics): Куда писать замеры.
+        paths (iterable): Пути, для которых гейдж запросов в работе ведётся отдельно; остальные — "other".
+    """
+
+    def __init__(self, app, metrics, paths=()):
+        self.app = app
+        self.metrics = metrics
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        status = 500
+        # Маршрут ещё не выбран — метка по пути, если это известный статический путь
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        metrics.in_flight.inc(path)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timer.stage("serialization")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timer.reset(token)
+            metrics.in_flight.dec(path)
+            # Путь маршрута, а не фактический URL: у /models/{name}/... не должно быть метки на каждое имя.
+            # Запрос, отклонённый до маршрутизации (допуск), помечается статическим путём
+            route = scope.get("route")
+            metrics.observe(getattr(route, "path", None) or (path if path != "other" else "unmatched"), status, timer)
+
+
+def outcome(status):
+    if status < 400:
+        return "success"
+    if status in (429, 503):
+        return "rejected"
+    return "client_error" if status < 500 else "server_error"
+
+
+STAGE_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+
+
+class ServiceMetrics:
+    """Метрики API, которые отдаёт /metrics."""
+
+    def __init__(self):
+        self.registry = Registry()
+        self.requests = self.registry.register(Counter(
+            "sleep_api_requests_total", "Запросы по эндпоинту, исходу и версии модели",
+            ("endpoint", "outcome", "model_version")))
+        self.latency = self.registry.register(HistogramVec(
+            "sleep_api_request_duration_ms", "Полное время запроса, мс", ("endpoint",), STAGE_BUCKETS_MS))
+        self.stage_latency = self.registry.register(HistogramVec(
+            "sleep_api_stage_duration_ms", "Время этапа обработки запроса, мс", ("endpoint", "stage"),
+            STAGE_BUCKETS_MS))
+        self.in_flight = self.registry.register(Gauge(
+            "sleep_api_in_flight_requests", "Запросы в работе", ("path",)))
+
+    def observe(self, endpoint, status, timer):
+        total_ms = (time.perf_counter() - timer.started) * 1000
+        self.requests.inc(endpoint, outcome(status), timer.model_version or "none")
+        self.latency.observe(endpoint, value=total_ms)
+        for stage, seconds in timer.stages:
+            self.stage_latency.observe(endpoint, stage, value=seconds * 1000)
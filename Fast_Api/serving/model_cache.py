@@ -0,0 +1,241 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from serving.settings import (MODELS_DIR, MODEL_REGISTRY_ALIAS, MLFLOW_MODEL_NAME, MODEL_CACHE_FAILURE_TTL,
+                              MODEL_CACHE_LOADS_PER_MINUTE)
+from serving.model_store import ModelStore, load_source
+from serving.introspection import model_nbytes, process_rss
+
+# === Несколько моделей в одном процессе: выбор на запрос и кэш загруженных моделей ===
+#
+# Запрос выбирает модель заголовком X-Model или путём /models/{model}/...: "XGBoost",
+# "XGBoost@3" (версия в реестре) или "XGBoost@staging" (алиас). Имя в реестре строится так же,
+# как в run_experiment: f"{семейство}_{MLFLOW_MODEL_NAME}". Без версии сначала ищется локальный
+# models/<имя>.pkl, затем алиас MODEL_REGISTRY_ALIAS в реестре.
+#
+# Модели загружаются лениво при первом запросе и живут в LRU-кэше с бюджетом памяти:
+# когда загруженные модели перестают в него помещаться, вытесняются давно не использованные.
+# Одновременные запросы к одной холодной модели ждут одну загрузку. Основная модель
+# (store.active) в кэш не попадает и бюджет не занимает.
+#
+# Спецификацию выбирает клиент, поэтому загрузки ограничены: неудачная (нет такой версии,
+# реестр недоступен) запоминается на failure_ttl секунд, и повторные запросы получают ошибку
+# сразу, а новых загрузок — не больше loads_per_minute в минуту.
+
+SPEC_PATTERN = re.compile(r"^(?P<family>[A-Za-z][A-Za-z0-9]*)(?:@(?P<ref>[A-Za-z0-9_.-]{1,64}))?$")
+
+
+class UnknownModel(LookupError):
+    """Запрошено семейство, которого нет в MODEL_FAMILIES, или спецификация с недопустимыми символами."""
+
+
+class ModelUnavailable(RuntimeError):
+    """Модель недавно не загрузилась или превышен лимит загрузок — новая попытка не делается."""
+
+
+def resolve_source(name, ref=None, models_dir=MODELS_DIR, alias=MODEL_REGISTRY_ALIAS):
+    """Источник модели (см. load_source) для имени в реестре и необязательной версии или алиаса."""
+    if ref is None:
+        path = os.path.join(models_dir, f"{name}.pkl")
+        if os.path.exists(path):
+            return {"kind": "file", "path": path}
+        return {"kind": "registry", "model_name": name, "alias": alias}
+    if re.fullmatch(r"v?\d+", ref):
+        return {"kind": "registry", "model_name": name, "version": ref.lstrip("v")}
+    return {"kind": "registry", "model_name": name, "alias": ref}
+
+
+class ModelCache:
+    """
+    Лениво заполняемый LRU-кэш подготовленных моделей (ServingModel) с бюджетом памяти.
+
+    Args:
+        store (ModelStore): Чем готовить модель (бэкенд, объяснения, прогрев) и где основная модель.
+        families (list): Допустимые семейства моделей.
+        budget_bytes (int): Сколько памяти могут занимать модели кэша. Модель, которая больше бюджета,
+            всё равно загружается, но вытесняет все остальные.
+        suffix (str): Вторая часть имени в реестре (MLFLOW_MODEL_NAME).
+        load (callable): source -> (модель, версия, признаки); по умолчанию load_source.
+        failure_ttl (float): Сколько секунд помнить неудачную загрузку.
+        loads_per_minute (int): Сколько загрузок допускается за минуту; 0 — без ограничения.
+        on_load (callable, optional): Вызывается с ServingModel после загрузки.
+        on_evict (callable, optional): Вызывается с ServingModel после вытеснения.
+        clock (callable): Источник времени (для тестов).
+    """
+
+    def __init__(self, store, families, budget_bytes, suffix=MLFLOW_MODEL_NAME, load=load_source,
+                 models_dir=MODELS_DIR, failure_ttl=MODEL_CACHE_FAILURE_TTL,
+                 loads_per_minute=MODEL_CACHE_LOADS_PER_MINUTE, on_load=None, on_evict=None, clock=time.monotonic):
+        self.store = store
+        self.families = list(families)
+        self.budget_bytes = budget_bytes
+        self.suffix = suffix
+        self.load = load
+        self.models_dir = models_dir
+        self.failure_ttl = failure_ttl
+        self.loads_per_minute = loads_per_minute
+        self.on_load = on_load
+        self.on_evict = on_evict
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (ServingModel, nbytes)
+        self._in_flight = {}  # key -> Future
+        self._failures = {}  # key -> (до какого момента помнить, текст ошибки)
+        self._load_times = deque()  # начала загрузок за последнюю минуту
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        # Счётчики по моделям переживают вытеснение, чтобы метрики оставались монотонными
+        self.counters = {}
+
+    def resolve(self, spec):
+        """
+        Разбирает "Семейство[@версия|@алиас]" в (ключ кэша, источник модели).
+
+        Raises:
+            UnknownModel: семейство не из MODEL_FAMILIES или недопустимые символы.
+        """
+        match = SPEC_PATTERN.match(spec or "")
+        if match is None or match["family"] not in self.families:
+            raise UnknownModel(f"Неизвестная модель {spec!r}: ожидается одно из {self.families}, "
+                               f"при необходимости с @версией или @алиасом")
+        name = f"{match['family']}_{self.suffix}"
+        ref = match["ref"]
+        return (f"{name}@{ref}" if ref else name), resolve_source(name, ref, self.models_dir)
+
+    def _count(self, key, counter, value=1):
+        stats = self.counters.setdefault(key, {"hits": 0, "loads": 0, "failures": 0, "failures_cached": 0,
+                                               "collapsed": 0, "evictions": 0, "primary": 0, "load_seconds": None})
+        stats[counter] = stats[counter] + value if counter != "load_seconds" else value
+
+    def _claim(self, key, source):
+        """
+        ("hit", ServingModel), ("wait", future) — модель уже грузит другой запрос, или ("own", future).
+
+        Raises:
+            ModelUnavailable: загрузка недавно не удалась или превышен лимит загрузок в минуту.
+        """
+        with self._lock:
+            primary = self.store.active
+            if primary is not None and primary.source == source:
+                self._count(key, "primary")
+                return "hit", primary
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count(key, "hits")
+                return "hit", entry[0]
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self._count(key, "collapsed")
+                return "wait", pending
+            now = self.clock()
+            failure = self._failures.get(key)
+            if failure is not None:
+                if failure[0] > now:
+                    self._count(key, "failures_cached")
+                    raise ModelUnavailable(f"{failure[1]} (повтор через {failure[0] - now:.0f} с)")
+                del self._failures[key]
+            while self._load_times and self._load_times[0] <= now - 60:
+                self._load_times.popleft()
+            if self.loads_per_minute and len(self._load_times) >= self.loads_per_minute:
+                raise ModelUnavailable(f"Превышен лимит загрузок моделей: {self.loads_per_minute} в минуту")
+            self._load_times.append(now)
+            pending = Future()
+            self._in_flight[key] = pending
+            return "own", pending
+
+    def _load(self, key, source, pending):
+        started = time.perf_counter()
+        try:
+            rss = process_rss()
+            model, version, features = self.load(source)
+            nbytes = model_nbytes(model)
+            serving = self.store.prepare(model, version, source, features, rss_before_load=rss)
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                self._count(key, "failures")
+                if self.failure_ttl > 0:
+                    now = self.clock()
+                    # Истёкшие записи убираются здесь, чтобы словарь не рос от разных @версий
+                    self._failures = {failed: entry for failed, entry in self._failures.items() if entry[0] > now}
+                    self._failures[key] = (now + self.failure_ttl, f"{type(e).__name__}: {e}")
+            pending.set_exception(e)
+            print(f"❌ Модель {key} не загружена: {type(e).__name__}: {e}")
+            raise
+
+        evicted = []
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._entries[key] = (serving, nbytes)
+            self.used_bytes += nbytes
+            self._count(key, "loads")
+            self._count(key, "load_seconds", round(time.perf_counter() - started, 3))
+            # Вытесняем давно не использованные, но не только что загруженную
+            while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+                old_key, (old, old_bytes) = self._entries.popitem(last=False)
+                self.used_bytes -= old_bytes
+                self._count(old_key, "evictions")
+                evicted.append((old_key, old))
+        for old_key, old in evicted:
+            # Запросы, уже взявшие снимок, доходят до конца; ресурсы (пул процессов) закрываются позже
+            ModelStore._retire(old)
+            if self.on_evict is not None:
+                self.on_evict(old)
+            print(f"♻️ Модель {old_key} вытеснена из кэша моделей")
+        if self.on_load is not None:
+            self.on_load(serving)
+        print(f"📦 Модель {key} загружена: {serving.version}, {nbytes / 1e6:.1f} MB, "
+              f"кэш {self.used_bytes / 1e6:.1f} / {self.budget_bytes / 1e6:.0f} MB")
+        pending.set_result(serving)
+        return serving
+
+    def get(self, spec):
+        """ServingModel для спецификации; холодная модель загружается в текущем потоке (или ожидается)."""
+        key, source = self.resolve(spec)
+        state, value = self._claim(key, source)
+        if state == "hit":
+            return value
+        if state == "wait":
+            return value.result()
+        return self._load(key, source, value)
+
+    async def get_async(self, spec):
+        """Как get, но загрузка идёт в пуле потоков, а ожидание не блокирует цикл событий."""
+        key, source = self.resolve(spec)
+        state, value = self._claim(key, source)
+        if state == "hit":
+            return value
+        if state == "wait":
+            return await asyncio.wrap_future(value)
+        return await asyncio.to_thread(self._load, key, source, value)
+
+    def close(self):
+        with self._lock:
+            entries = [serving for serving, _ in self._entries.values()]
+            self._entries.clear()
+            self.used_bytes = 0
+        for serving in entries:
+            if self.on_evict is not None:
+                self.on_evict(serving)
+            if hasattr(serving.model, "close"):
+                serving.model.close()
+
+    def stats(self):
+        with self._lock:
+            cached = {key: (serving.version, nbytes) for key, (serving, nbytes) in self._entries.items()}
+            return {
+                "families": self.families,
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self.used_bytes,
+                "loading": sorted(self._in_flight),
+                "failed": sorted(key for key, (until, _) in self._failures.items() if until > self.clock()),
+                # Порядок cached — от давно использованной к недавней (следующая на вытеснение — первая)
+                "cached": [{"model": key, "version": version, "bytes": nbytes}
+                           for key, (version, nbytes) in cached.items()],
+                "models": {key: dict(stats) for key, stats in self.counters.items()},
+            }
@@ -0,0 +1,393 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from serving.settings import (INFERENCE_BACKEND, MODEL_WARMUP_ROWS, INFERENCE_DTYPE, INFERENCE_EXECUTOR, INFERENCE_POOL_SIZE,
+                              INFERENCE_QUEUE_LIMIT, INFERENCE_QUEUE_TIMEOUT, INFERENCE_SLOT_ROWS,
+                              INFERENCE_POOL_START_METHOD, BACKEND_TOLERANCE, EXPLAIN_ENABLED)
+from serving.schema import FEATURES
+from serving.tree_engine import CompiledForest
+from serving.backends import build_backend, check_equivalence, is_serving_artifact
+from serving.explain import build_explainer
+from serving.introspection import model_memory, process_rss
+
+# === Хранилище обслуживаемой модели с горячей перезагрузкой ===
+#
+# Запрос берёт снимок store.active один раз и работает только с ним, поэтому
+# перезагрузка подменяет одну ссылку: запросы, начатые до подмены, доходят
+# до конца на старой модели, новые сразу идут в новую.
+
+# Через сколько секунд после подмены закрывать ресурсы старой модели (пул процессов):
+# запросы, успевшие взять старый снимок, должны закончиться
+RETIRE_GRACE_SECONDS = 30.0
+
+
+def file_version(path):
+    """Версия модели по содержимому файла: имя файла + префикс sha256."""
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return f"{os.path.splitext(os.path.basename(path))[0]}@{digest[:12]}"
+
+
+def fitted_features(model):
+    """Имена признаков, на которых обучен sklearn-estimator (feature_names_in_), или None."""
+    names = getattr(model, "feature_names_in_", None)
+    return [str(name) for name in names] if names is not None else None
+
+
+def load_from_file(path):
+    """
+    Модель из локального .pkl, её версия и порядок признаков (None — не известен).
+
+    Каталог считается скомпилированным артефактом (python -m serving.tree_engine) или экспортом
+    линейной модели, наивного Байеса или KNN (python -m serving.numpy_models):
+    он открывается через mmap без импорта joblib и sklearn. Файл .onnx открывается
+    в onnxruntime (python -m serving.onnx_backend).
+    """
+    if os.path.isdir(path):
+        from serving.numpy_models import NumpyModel, is_numpy_artifact
+
+        if is_numpy_artifact(path):
+            exported = NumpyModel.load(path)
+            return exported, exported.model_version or file_version(os.path.join(path, "meta.json")), \
+                exported.features
+        forest = CompiledForest.load(path)
+        return forest, forest.model_version or file_version(os.path.join(path, "meta.json")), None
+    if path.endswith(".onnx"):
+        from serving.onnx_backend import OnnxModel
+
+        onnx_model = OnnxModel.load(path)
+        return onnx_model, onnx_model.model_version or file_version(path), None
+
+    import joblib
+
+    model = joblib.load(path)
+    return model, file_version(path), fitted_features(model)
+
+
+def load_from_registry(model_name, version=None, alias=None, stage=None):
+    """
+    Модель из MLflow Model Registry, её версия вида "<имя>@v<номер>" и порядок признаков
+    из залогированной сигнатуры (None, если сигнатура — тензор без имён столбцов).
+
+    Сначала алиас/стадия разрешаются в номер версии, затем грузится именно этот номер.
+    Нужны mlflow и пакет ml_experiments в PYTHONPATH (запуск из корня репозитория).
+    """
+    try:
+        from ml_experiments.report_manager.model_registry import (load_model_version, resolve_model_version,
+                                                                  get_model_input_names)
+    except ImportError as e:
+        raise RuntimeError(f"Реестр MLflow недоступен в этом окружении: {e}") from e
+
+    resolved = resolve_model_version(model_name, version=version, stage=stage, alias=alias)
+    model = load_model_version(model_name, version=resolved)
+    if model is None:
+        raise RuntimeError(f"Не удалось загрузить {model_name} версии {resolved} из реестра")
+    return model, f"{model_name}@v{resolved}", get_model_input_names(model_name, resolved)
+
+
+def load_source(source):
+    """
+    Загружает модель по описанию источника: (модель, версия, порядок признаков или None).
+
+    Args:
+        source (dict): {"kind": "file", "path": ...} или
+            {"kind": "registry", "model_name": ..., "version"/"alias"/"stage": ...}
+    """
+    if source["kind"] == "file":
+        return load_from_file(source["path"])
+    if source["kind"] == "registry":
+        return load_from_registry(source["model_name"], version=source.get("version"),
+                                  alias=source.get("alias"), stage=source.get("stage"))
+    raise ValueError(f"Неизвестный источник модели: {source['kind']}")
+
+
+def warmup_batch(n_rows=MODEL_WARMUP_ROWS, random_state=0, dtype=np.float64):
+    """Синтетические строки в диапазонах ответов бота для прогрева модели."""
+    rng = np.random.default_rng(random_state)
+    ranges = {
+        "Age": (18, 65), "Gender": (0, 1), "Sleep_duration": (4, 10), "Awakenings": (0, 4),
+        "Caffeine_consumption": (0, 125), "Alcohol_consumption": (0, 5), "Smoking_status": (0, 1),
+        "Exercise_frequency": (0, 5), "bed_hour": (1, 12), "wake_hour": (1, 12),
+    }
+    return np.column_stack([rng.integers(*ranges[feature], endpoint=True, size=n_rows) for feature in FEATURES]
+                           ).astype(dtype)
+
+
+class ServingModel:
+    """
+    Снимок обслуживаемой модели: всё, что запрос должен брать из одной версии.
+
+    Args:
+        model: Модель (sklearn/XGBoost или скомпилированный ансамбль).
+        version (str): Версия модели (ключ кэша и таблицы ответов).
+        source (dict): Откуда модель загружена.
+        answer_table (AnswerTable, optional): Таблица ответов для этой версии.
+        features (list, optional): Порядок признаков на входе модели; по умолчанию — порядок SleepData.
+        explainer (CompiledForest, optional): Ансамбль для объяснений (?explain=true) этой же версии.
+    """
+
+    def __init__(self, model, version, source, answer_table=None, features=None, explainer=None):
+        self.model = model
+        self.version = version
+        self.source = source
+        self.answer_table = answer_table
+        self.features = list(features or FEATURES)
+        self.explainer = explainer
+        self.loaded_at = time.time()
+        # RSS процесса до загрузки, после загрузки и после подготовки (бэкенд, объяснения, прогрев);
+        # заполняет ModelStore.prepare (см. serving/introspection.py)
+        self.load_rss = None
+        self._memory = None
+
+    def memory(self, estimators=False):
+        """Отчёт о памяти модели и ансамбля объяснений (serving/introspection.py); без деревьев кэшируется."""
+        if estimators:
+            return self._memory_report(estimators=True)
+        if self._memory is None:
+            self._memory = self._memory_report()
+        return self._memory
+
+    def _memory_report(self, estimators=False):
+        return {
+            "model_version": self.version,
+            "load_rss": self.load_rss,
+            "model": model_memory(self.model, estimators=estimators),
+            "explainer": model_memory(self.explainer, estimators=estimators)
+            if self.explainer is not None and self.explainer is not self.model else None,
+        }
+
+    def describe(self):
+        return {
+            "model_version": self.version,
+            "source": self.source,
+            "model_type": type(self.model).__name__,
+            "answer_table": self.answer_table is not None,
+            "features": self.features,
+            "explain": self.explainer is not None,
+            "executor": self.model.stats() if hasattr(self.model, "stats") else {"executor": "thread"},
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ReloadInProgress(RuntimeError):
+    """Перезагрузка уже идёт — вторую параллельно не запускаем."""
+
+
+class ModelStore:
+    """
+    Держит активную модель и подменяет её без остановки сервиса.
+
+    Новая модель загружается, переводится на бэкенд инференса (serving/backends.py)
+    и прогревается в фоне; пока это не закончилось успешно, запросы обслуживает старая модель.
+    При ошибке на любом шаге активная модель не меняется.
+
+    Args:
+        backend (str): native, compiled или onnx.
+        executor (str): thread — модель вызывается в потоке запроса, process — в пуле процессов.
+        prepare_answer_table (callable, optional): version -> AnswerTable или None.
+        on_swap (callable, optional): Вызывается с новым снимком сразу после подмены.
+    """
+
+    def __init__(self, backend=INFERENCE_BACKEND, executor=INFERENCE_EXECUTOR, prepare_answer_table=None,
+                 on_swap=None):
+        self.backend = backend
+        self.executor = executor
+        self.prepare_answer_table = prepare_answer_table
+        self.on_swap = on_swap
+        self.active = None
+
+        self._reload_lock = threading.Lock()
+        self.reloading = False
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+
+    def prepare(self, model, version, source, features=None, rss_before_load=None):
+        """
+        Бэкенд, сверка с нативной моделью и прогрев — всё, что должно случиться до того, как модель увидят запросы.
+
+        rss_before_load — RSS процесса перед загрузкой model: вместе с RSS сейчас и после подготовки
+        попадает в ServingModel.load_rss. RSS общий на процесс: параллельные запросы и загрузки
+        попадают в разницу, так что это оценка; точный размер самой модели — ServingModel.memory().
+        """
+        rss_after_load = process_rss()
+        # JSON-эндпоинты собирают строку в порядке SleepData: модель с другим порядком
+        # признаков в сигнатуре молча давала бы неверные ответы
+        if features is not None and list(features) != FEATURES:
+            raise ValueError(f"Признаки модели {list(features)} не совпадают с порядком API {FEATURES}")
+
+        # Прогрев тем же типом матрицы, что и запросы
+        X = warmup_batch(dtype=INFERENCE_DTYPE)
+        native = model
+        if self.backend != "native" and not is_serving_artifact(model):
+            try:
+                candidate = build_backend(self.backend, model)
+                diff = check_equivalence(model, candidate, X, BACKEND_TOLERANCE)
+                model = candidate
+                print(f"⚡ Бэкенд {self.backend}: {type(model).__name__}, расхождение с нативной моделью {diff:.1e}")
+            except (ValueError, ImportError) as e:
+                print(f"⚠️ Бэкенд {self.backend} недоступен, используется нативная модель: {e}")
+
+        # Объяснения: скомпилированный бэкенд объясняет сам себя, для остальных (нативная модель,
+        # onnx) строится скомпилированная копия нативной модели
+        explainer = None
+        if EXPLAIN_ENABLED:
+            explainer = build_explainer(model if isinstance(model, CompiledForest) else native)
+            if explainer is not None:
+                explainer.explain(X[:1])
+
+        # Прогрев: одна строка и пакет, как в /predict и /predict_batch.
+        # Заодно проверяем, что модель вообще отвечает на наши признаки
+        model.predict(X[:1])
+        if hasattr(model, "predict_proba"):
+            probs = model.predict_proba(X)
+            if probs.shape != (len(X), len(model.classes_)):
+                raise ValueError(f"Неожиданная форма predict_proba: {probs.shape}")
+
+            if self.executor == "process":
+                from serving.executor import ProcessPoolModel
+                model = ProcessPoolModel(model, n_features=len(FEATURES), workers=INFERENCE_POOL_SIZE,
+                                         queue_limit=INFERENCE_QUEUE_LIMIT, queue_timeout=INFERENCE_QUEUE_TIMEOUT,
+                                         slot_rows=INFERENCE_SLOT_ROWS, start_method=INFERENCE_POOL_START_METHOD,
+                                         warmup=X)
+                print(f"🧵 Пул инференса: {INFERENCE_POOL_SIZE} процессов, до {INFERENCE_QUEUE_LIMIT} пакетов")
+
+        answer_table = self.prepare_answer_table(version) if self.prepare_answer_table else None
+        serving = ServingModel(model, version, source, answer_table, features, explainer)
+        serving.load_rss = {"before_load": rss_before_load, "after_load": rss_after_load,
+                            "after_prepare": process_rss()}
+        return serving
+
+    def reload(self, source):
+        """Синхронно загружает модель из source и делает её активной. Возвращает новый снимок."""
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress("Перезагрузка модели уже выполняется")
+        self.reloading = True
+        started = time.perf_counter()
+        try:
+            rss = process_rss()
+            model, version, features = load_source(source)
+            print(f"✅ Модель загружена: {version}")
+            serving = self.prepare(model, version, source, features, rss_before_load=rss)
+
+            # Подмена одной ссылки атомарна: запрос видит либо старый, либо новый снимок целиком
+            previous, self.active = self.active, serving
+            self._retire(previous)
+            if self.on_swap is not None:
+                self.on_swap(serving)
+
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = round(time.perf_counter() - started, 3)
+            print(f"🔄 Активная модель: {version} (перезагрузка {self.last_reload_seconds} с)")
+            return serving
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"❌ Перезагрузка модели не удалась, остаётся прежняя: {self.last_error}")
+            raise
+        finally:
+            self.reloading = False
+            self._reload_lock.release()
+
+    @staticmethod
+    def _retire(serving, delay=RETIRE_GRACE_SECONDS):
+        """Закрывает ресурсы снятой модели (если они есть) после того, как допишутся её запросы."""
+        if serving is None or not hasattr(serving.model, "close"):
+            return
+        timer = threading.Timer(delay, serving.model.close)
+        timer.daemon = True
+        timer.start()
+
+    def close(self):
+        """Освобождает ресурсы активной модели при остановке сервиса."""
+        if self.active is not None and hasattr(self.active.model, "close"):
+            self.active.model.close()
+
+    def reload_in_background(self, source):
+        """Запускает reload в фоновом потоке. False — перезагрузка уже идёт."""
+        if self.reloading:
+            return False
+
+        def run():
+            try:
+                self.reload(source)
+            except Exception:
+                pass  # ошибка уже записана в last_error
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    def status(self):
+        return {
+            "active": self.active.describe() if self.active is not None else None,
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_reload_seconds": self.last_reload_seconds,
+        }
+
+
+class ModelWatcher:
+    """
+    Фоновый опрос источника модели: при изменении файла или переезде алиаса в реестре
+    вызывает store.reload. Неудачная загрузка повторяется на следующем опросе.
+
+    Args:
+        store (ModelStore): Хранилище, которое нужно перезагружать.
+        source (dict): Источник модели (см. load_source).
+        interval (float): Период опроса в секундах.
+    """
+
+    def __init__(self, store, source, interval=30.0):
+        self.store = store
+        self.source = source
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._seen = None
+
+    def fingerprint(self):
+        """Дешёвый признак изменения источника."""
+        if self.source["kind"] == "file":
+            path = self.source["path"]
+            stat = os.stat(os.path.join(path, "meta.json") if os.path.isdir(path) else path)
+            return stat.st_mtime_ns, stat.st_size
+        from ml_experiments.report_manager.model_registry import resolve_model_version
+        return resolve_model_version(self.source["model_name"], version=self.source.get("version"),
+                                     alias=self.source.get("alias"), stage=self.source.get("stage"))
+
+    def check(self):
+        """Один опрос: перезагружает модель, если источник изменился. True — была перезагрузка."""
+        current = self.fingerprint()
+        if current == self._seen:
+            return False
+        if self._seen is None and self.store.active is not None and self.source["kind"] == "file":
+            # Первый опрос после старта: файл уже загружен в load_model
+            self._seen = current
+            return False
+
+        self.store.reload(self.source)
+        self._seen = current
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except ReloadInProgress:
+                pass
+            except Exception as e:
+                print(f"⚠️ Наблюдатель модели: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        print(f"👀 Наблюдение за моделью: {self.source} каждые {self.interval} с")
+
+    def stop(self):
+        self._stop.set()
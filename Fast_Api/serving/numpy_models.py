@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import numpy as np
+
+# === Линейные модели, наивный Байес и KNN без sklearn ===
+#
+# Предсказание LogisticRegression, GaussianNB и KNeighborsClassifier — несколько матричных операций,
+# а загрузка такого Pipeline через joblib тянет за собой весь sklearn (сотни миллисекунд импорта
+# и десятки мегабайт памяти на процесс). Экспорт (export_model) переносит параметры обученного
+# Pipeline в массивы NumPy:
+#   - StandardScaler — mean_ и scale_;
+#   - LogisticRegression — coef_ и intercept_ (softmax для multinomial, нормированные сигмоиды для OvR);
+#   - GaussianNB — средние, дисперсии и априорные вероятности классов;
+#   - KNeighborsClassifier — обучающие точки и их классы, число соседей, веса и метрика.
+# Артефакт сохраняется так же, как скомпилированный ансамбль деревьев: каталог .npy + meta.json,
+# открывается через mmap без импорта joblib и sklearn.
+
+KINDS = ("linear", "gaussian_nb", "knn")
+ARTIFACT_ARRAYS = ("mean", "scale", "coef", "intercept", "theta", "var", "log_prior", "points", "point_class")
+# Сколько строк запроса сравнивается с обучающими точками KNN за раз: матрица расстояний chunk × points
+KNN_CHUNK_ROWS = 1024
+# Сколько лишних кандидатов в соседи отбирается по быстрому разложению евклидова расстояния
+KNN_CANDIDATE_MARGIN = 8
+
+
+class NumpyModel:
+    """
+    Экспортированная модель: тот же интерфейс, что у sklearn-классификатора (predict, predict_proba, classes_).
+
+    Args:
+        kind (str): linear, gaussian_nb или knn.
+        classes (array): Метки классов в порядке столбцов predict_proba.
+        mean, scale (np.array, optional): Параметры StandardScaler перед моделью.
+        coef, intercept (np.array): Линейная модель; coef формы (1, n) — бинарная задача.
+        multinomial (bool): softmax (multinomial) или нормированные сигмоиды (OvR).
+        theta, var, log_prior (np.array): GaussianNB.
+        points, point_class (np.array): Обучающие точки KNN и индексы их классов.
+        n_neighbors (int), weights (str), p (float): Параметры KNN; p — степень метрики Минковского.
+        features (list, optional): Порядок признаков, на которых обучена модель.
+    """
+
+    def __init__(self, kind, classes, mean=None, scale=None, coef=None, intercept=None, multinomial=True,
+                 theta=None, var=None, log_prior=None, points=None, point_class=None, n_neighbors=5,
+                 weights="uniform", p=2.0, features=None):
+        if kind not in KINDS:
+            raise ValueError(f"Неизвестный вид модели: {kind} (доступны: {', '.join(KINDS)})")
+        self.kind = kind
+        self.classes_ = np.asarray(classes)
+        self.mean = mean
+        self.scale = scale
+        self.coef = coef
+        self.intercept = intercept
+        self.multinomial = multinomial
+        self.theta = theta
+        self.var = var
+        self.log_prior = log_prior
+        self.points = points
+        self.point_class = point_class
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.p = p
+        self.features = features
+        self.model_version = None
+
+    def _scaled(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2:
+            raise ValueError(f"Ожидается 2D массив признаков, получено: {X.ndim}D")
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        return X
+
+    def predict_proba(self, X):
+        X = self._scaled(X)
+        if self.kind == "linear":
+            return self._linear_proba(X)
+        if self.kind == "gaussian_nb":
+            return self._gaussian_nb_proba(X)
+        return np.vstack([self._knn_proba(X[start:start + KNN_CHUNK_ROWS])
+                          for start in range(0, len(X), KNN_CHUNK_ROWS)]) if len(X) else \
+            np.empty((0, len(self.classes_)))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _linear_proba(self, X):
+        scores = X @ self.coef.T + self.intercept
+        if scores.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        if self.multinomial:
+            return _softmax(scores)
+        probs = 1.0 / (1.0 + np.exp(-scores))
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def _gaussian_nb_proba(self, X):
+        # Совместное логарифмическое правдоподобие, как в GaussianNB._joint_log_likelihood
+        log_norm = -0.5 * np.sum(np.log(2.0 * np.pi * self.var), axis=1)
+        squared = ((X[:, np.newaxis, :] - self.theta) ** 2 / self.var).sum(axis=2)
+        return _softmax(self.log_prior + log_norm - 0.5 * squared)
+
+    def _knn_proba(self, X):
+        k = self.n_neighbors
+        if self.p == 2 and k + KNN_CANDIDATE_MARGIN < len(self.points):
+            # Кандидаты — по |p|² - 2·x·p (квадрат расстояния без постоянного для строки |x|²: одно матричное
+            # умножение, как brute-поиск sklearn), точные расстояния — только для них: ошибка округления
+            # разложения не меняет соседей
+            approx = X @ (-2.0 * self.points.T)
+            approx += (self.points ** 2).sum(axis=1)
+            candidates = np.argpartition(approx, k + KNN_CANDIDATE_MARGIN - 1, axis=1)[:, :k + KNN_CANDIDATE_MARGIN]
+            exact = np.sqrt(((X[:, np.newaxis, :] - self.points[candidates]) ** 2).sum(axis=2))
+            order = np.argpartition(exact, k - 1, axis=1)[:, :k]
+            neighbors = np.take_along_axis(candidates, order, axis=1)
+            nearest = np.take_along_axis(exact, order, axis=1)
+        else:
+            # Расстояния накапливаются по признаку: матрица строк × точек вместо трёхмерной разности
+            distances = np.zeros((len(X), len(self.points)))
+            for f in range(X.shape[1]):
+                diff = np.abs(X[:, f, np.newaxis] - self.points[:, f])
+                distances += diff * diff if self.p == 2 else diff if self.p == 1 else diff ** self.p
+            if self.p == 2:
+                np.sqrt(distances, out=distances)
+            elif self.p != 1:
+                distances **= 1.0 / self.p
+            neighbors = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < len(self.points) else \
+                np.argsort(distances, axis=1)
+            nearest = np.take_along_axis(distances, neighbors, axis=1)
+        # При равных расстояниях на k-м месте выбор соседа не определён и в sklearn:
+        # kd_tree, ball_tree и brute там расходятся между собой
+        if self.weights == "distance":
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / nearest
+            # Строка, совпавшая с обучающими точками, голосует только ими (как в sklearn)
+            exact = np.isinf(weights).any(axis=1)
+            weights[exact] = np.isinf(weights[exact])
+        else:
+            weights = np.ones(neighbors.shape)
+
+        votes = self.point_class[neighbors][:, :, np.newaxis] == np.arange(len(self.classes_))
+        probs = (weights[:, :, np.newaxis] * votes).sum(axis=1)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def save(self, path, model_version=None):
+        """Сохраняет модель каталогом: по .npy на массив + meta.json (как CompiledForest.save)."""
+        os.makedirs(path, exist_ok=True)
+        arrays = []
+        for name in ARTIFACT_ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(array))
+                arrays.append(name)
+
+        meta = {
+            "kind": self.kind,
+            "classes": self.classes_.tolist(),
+            "multinomial": self.multinomial,
+            "n_neighbors": self.n_neighbors,
+            "weights": self.weights,
+            "p": self.p,
+            "features": self.features,
+            "model_version": model_version,
+            "arrays": arrays,
+        }
+        # meta.json пишется последним: по нему наблюдатель модели видит, что артефакт готов
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Открывает артефакт из save(); массивы отображаются в память без копирования."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode).view(np.ndarray)
+                  for name in meta["arrays"]}
+        model = cls(meta["kind"], meta["classes"], multinomial=meta["multinomial"],
+                    n_neighbors=meta["n_neighbors"], weights=meta["weights"], p=meta["p"],
+                    features=meta["features"], **arrays)
+        model.model_version = meta["model_version"]
+        return model
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def is_numpy_artifact(path):
+    """Каталог — артефакт export_model (а не скомпилированный ансамбль деревьев)."""
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f).get("kind") in KINDS
+    except (OSError, ValueError):
+        return False
+
+
+def export_model(model):
+    """
+    Переносит параметры обученной модели (Pipeline [StandardScaler] + классификатор или голый классификатор)
+    в NumpyModel.
+
+    Поддерживаются LogisticRegression, GaussianNB и KNeighborsClassifier с метрикой Минковского
+    (euclidean, manhattan, minkowski). Для остальных моделей и шагов предобработки выбрасывается ValueError.
+    """
+    if isinstance(model, NumpyModel):
+        return model
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    steps = [step for _, step in model.steps if step is not None and step != "passthrough"] \
+        if isinstance(model, Pipeline) else [model]
+    *preprocessing, estimator = steps
+    mean = scale = None
+    if len(preprocessing) > 1 or (preprocessing and not isinstance(preprocessing[0], StandardScaler)):
+        raise ValueError(f"Экспорт поддерживает только StandardScaler перед моделью, получено "
+                         f"{[type(step).__name__ for step in preprocessing]}")
+    if preprocessing:
+        mean, scale = preprocessing[0].mean_, preprocessing[0].scale_
+
+    names = getattr(model, "feature_names_in_", None)
+    common = {"classes": estimator.classes_, "mean": mean, "scale": scale,
+              "features": [str(name) for name in names] if names is not None else None}
+
+    if isinstance(estimator, LogisticRegression):
+        # В sklearn OvR остаётся только у liblinear и явного multi_class="ovr"
+        ovr = estimator.solver == "liblinear" or getattr(estimator, "multi_class", "auto") == "ovr"
+        return NumpyModel("linear", coef=estimator.coef_.astype(np.float64),
+                          intercept=estimator.intercept_.astype(np.float64), multinomial=not ovr, **common)
+    if isinstance(estimator, GaussianNB):
+        return NumpyModel("gaussian_nb", theta=estimator.theta_, var=estimator.var_,
+                          log_prior=np.log(estimator.class_prior_), **common)
+    if isinstance(estimator, KNeighborsClassifier):
+        metric, p = estimator.effective_metric_, estimator.effective_metric_params_.get("p", 2)
+        if metric == "euclidean":
+            p = 2
+        elif metric == "manhattan":
+            p = 1
+        elif metric != "minkowski":
+            raise ValueError(f"Экспорт KNN поддерживает метрику Минковского, получено {metric}")
+        if callable(estimator.weights) or estimator.weights not in ("uniform", "distance", None):
+            raise ValueError(f"Экспорт KNN поддерживает веса uniform и distance, получено {estimator.weights}")
+        if estimator.outputs_2d_:
+            raise ValueError("Экспорт KNN не поддерживает несколько целевых столбцов")
+        return NumpyModel("knn", points=np.asarray(estimator._fit_X, dtype=np.float64), point_class=estimator._y,
+                          n_neighbors=estimator.n_neighbors, weights=estimator.weights or "uniform", p=float(p),
+                          **common)
+    raise ValueError(f"Экспорт в NumPy не поддерживается для модели типа {type(estimator).__name__}")
+
+
+def main():
+    import joblib
+    from serving.model_store import file_version, load_from_registry
+
+    parser = argparse.ArgumentParser(description="Экспорт LogisticRegression, GaussianNB или KNN в артефакт NumPy")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model", help="Путь к .pkl модели")
+    source.add_argument("--registry", help="Имя модели в реестре MLflow, например LogisticRegression_Sleep")
+    parser.add_argument("--version", help="Версия в реестре (по умолчанию — алиас --alias)")
+    parser.add_argument("--alias", default="staging", help="Алиас в реестре")
+    parser.add_argument("--out", help="Каталог артефакта (по умолчанию рядом с моделью или models/<имя>.numpy)")
+    args = parser.parse_args()
+
+    if args.model:
+        model, version = joblib.load(args.model), file_version(args.model)
+        out = args.out or os.path.splitext(args.model)[0] + ".numpy"
+    else:
+        from serving.settings import MODELS_DIR
+
+        model, version, _ = load_from_registry(args.registry, version=args.version,
+                                               alias=None if args.version else args.alias)
+        out = args.out or os.path.join(MODELS_DIR, f"{args.registry}.numpy")
+    exported = export_model(model)
+    exported.save(out, model_version=version)
+    print(f"💾 Артефакт сохранён: {out} ({exported.kind}, версия {version})")
+
+
+if __name__ == "__main__":
+    main()
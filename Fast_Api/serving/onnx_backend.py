@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import numpy as np
+from serving.settings import ONNX_INTRA_OP_THREADS
+
+# === Бэкенд ONNX Runtime ===
+#
+# Pipeline с RandomForestClassifier (skl2onnx) или XGBClassifier (onnxmltools) экспортируется
+# в ONNX и исполняется onnxruntime на CPU. Все пакеты ONNX необязательны: импортируются
+# только при выборе бэкенда, без них API остаётся на нативной модели.
+
+
+def _register_xgboost_converter():
+    """Учит skl2onnx конвертировать XGBClassifier внутри Pipeline (через onnxmltools)."""
+    from xgboost import XGBClassifier
+    from skl2onnx import update_registered_converter
+    from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+
+    update_registered_converter(
+        XGBClassifier, "XGBoostXGBClassifier", calculate_linear_classifier_output_shapes, convert_xgboost,
+        options={"nocl": [True, False], "zipmap": [True, False, "columns"]},
+    )
+
+
+def export_onnx(model, n_features, model_version=None):
+    """
+    Экспортирует Pipeline или голый классификатор в ONNX и возвращает сериализованную модель (bytes).
+
+    Выход вероятностей — плотный тензор (zipmap выключен), классы и версия исходной модели
+    записываются в metadata_props.
+    """
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(estimator, "get_booster"):
+        _register_xgboost_converter()
+
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[("input", FloatTensorType([None, n_features]))],
+        options={id(estimator): {"zipmap": False}},
+        target_opset={"": 17, "ai.onnx.ml": 3},
+    )
+    metadata = {"classes": json.dumps(np.asarray(estimator.classes_).tolist()), "model_version": model_version or ""}
+    for key, value in metadata.items():
+        prop = onnx_model.metadata_props.add()
+        prop.key, prop.value = key, value
+    return onnx_model.SerializeToString()
+
+
+class OnnxModel:
+    """
+    Модель, исполняемая onnxruntime, с интерфейсом классификатора sklearn (predict, predict_proba, classes_).
+
+    Args:
+        model_bytes (bytes): Сериализованная ONNX-модель (см. export_onnx).
+        classes (array-like, optional): Метки классов; по умолчанию берутся из metadata_props.
+    """
+
+    def __init__(self, model_bytes, classes=None):
+        import onnxruntime as ort
+
+        self.model_bytes = model_bytes
+        options = ort.SessionOptions()
+        if ONNX_INTRA_OP_THREADS:
+            options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(model_bytes, options, providers=["CPUExecutionProvider"])
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.classes_ = np.asarray(classes if classes is not None else json.loads(metadata["classes"]))
+        self.model_version = metadata.get("model_version") or None
+        self.input_name = self.session.get_inputs()[0].name
+        # Выходы: метка и вероятности; берём только вероятности
+        self.proba_name = self.session.get_outputs()[1].name
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.model_bytes)
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.session.run([self.proba_name], {self.input_name: X})[0]
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    # Сессия onnxruntime не сериализуется: для пула процессов передаём байты модели
+    def __getstate__(self):
+        return {"model_bytes": self.model_bytes, "classes": self.classes_}
+
+    def __setstate__(self, state):
+        self.__init__(state["model_bytes"], state["classes"])
+
+
+def to_onnx_model(model, n_features):
+    """Бэкенд onnx: конвертирует загруженную модель и открывает её в onnxruntime."""
+    if isinstance(model, OnnxModel):
+        return model
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if not (hasattr(estimator, "estimators_") or hasattr(estimator, "get_booster")):
+        raise ValueError(f"Экспорт в ONNX поддерживается для RandomForest и XGBoost, получено: "
+                         f"{type(estimator).__name__}")
+    return OnnxModel(export_onnx(model, n_features))
+
+
+def main():
+    import joblib
+    from serving.model_store import file_version
+    from serving.schema import FEATURES
+
+    parser = argparse.ArgumentParser(description="Экспорт модели в ONNX для INFERENCE_BACKEND=onnx")
+    parser.add_argument("--model", required=True, help="Путь к .pkl модели")
+    parser.add_argument("--out", help="Путь к .onnx (по умолчанию рядом с моделью)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.splitext(args.model)[0] + ".onnx"
+    model_bytes = export_onnx(joblib.load(args.model), len(FEATURES), model_version=file_version(args.model))
+    with open(out, "wb") as f:
+        f.write(model_bytes)
+    print(f"💾 ONNX-модель сохранена: {out} ({len(model_bytes) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import gc
+import os
+import signal
+import socket
+import time
+
+# === Pre-fork запуск нескольких воркеров uvicorn ===
+#
+# Мастер-процесс один раз загружает и прогревает модель, открывает слушающий сокет
+# и делает fork N воркеров. Воркеры наследуют сокет (ядро раздаёт им соединения)
+# и страницы памяти с моделью: до первой записи они общие (copy-on-write), поэтому
+# память леса не умножается на число воркеров.
+#
+# Упавший воркер заменяется новым форком. Если воркеры падают сразу после старта (ошибка
+# окружения или конфигурации uvicorn), замена откладывается с экспоненциальной паузой,
+# а после нескольких таких падений подряд мастер останавливается, а не форкает в цикле.
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """Сводка памяти процесса из /proc/<pid>/smaps_rollup в килобайтах (только Linux)."""
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in SMAPS_FIELDS:
+                usage[name] = int(rest.split()[0])
+    return usage
+
+
+def memory_report(pids):
+    """
+    Печатает RSS и PSS по процессам и возвращает строки отчёта.
+
+    RSS считает общие страницы в каждом процессе, PSS делит их между процессами —
+    сумма PSS показывает реальное потребление памяти всеми воркерами.
+    """
+    rows = []
+    for role, pid in pids:
+        try:
+            usage = smaps_rollup(pid)
+        except OSError:
+            continue
+        rows.append({
+            "role": role,
+            "pid": pid,
+            "rss_mb": round(usage["Rss"] / 1024, 1),
+            "pss_mb": round(usage["Pss"] / 1024, 1),
+            "shared_mb": round((usage["Shared_Clean"] + usage["Shared_Dirty"]) / 1024, 1),
+            "private_mb": round((usage["Private_Clean"] + usage["Private_Dirty"]) / 1024, 1),
+        })
+
+    print("📊 Память процессов (MB):")
+    print(f"{'role':>8} | {'pid':>7} | {'RSS':>7} | {'PSS':>7} | {'shared':>7} | {'private':>7}")
+    for row in rows:
+        print(f"{row['role']:>8} | {row['pid']:>7} | {row['rss_mb']:>7} | {row['pss_mb']:>7} | "
+              f"{row['shared_mb']:>7} | {row['private_mb']:>7}")
+    if rows:
+        print(f"{'total':>8} | {'':>7} | {sum(r['rss_mb'] for r in rows):>7.1f} | "
+              f"{sum(r['pss_mb'] for r in rows):>7.1f} |")
+    return rows
+
+
+class RestartPolicy:
+    """
+    Пауза перед заменой упавшего воркера.
+
+    Падение раньше min_uptime секунд после запуска считается неудачным стартом: пауза
+    растёт от base_delay вдвое за каждое такое падение подряд (не больше max_delay), после
+    max_failures подряд мастер останавливается. Воркер, проживший дольше min_uptime,
+    сбрасывает счётчик.
+    """
+
+    def __init__(self, min_uptime=10.0, base_delay=0.5, max_delay=30.0, max_failures=5):
+        self.min_uptime = min_uptime
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_failures = max_failures
+        self.failures = 0
+
+    def delay(self, uptime):
+        """Через сколько секунд запустить замену; None — замену не запускать, мастер останавливается."""
+        if uptime >= self.min_uptime:
+            self.failures = 0
+            return 0.0
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            return None
+        return min(self.base_delay * 2 ** (self.failures - 1), self.max_delay)
+
+
+def _bind(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock):
+    import uvicorn
+
+    # Обработчики сигналов мастера воркеру не нужны — uvicorn ставит свои
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def serve(app, preload, host="0.0.0.0", port=8080, workers=2, report_delay=5.0, restart_policy=None):
+    """
+    Запускает мастер и N воркеров, разделяющих сокет и загруженную модель.
+
+    Args:
+        app: ASGI-приложение.
+        preload (callable): Загрузка модели в мастере; startup-хук воркера должен
+            увидеть уже загруженную модель и не грузить её повторно.
+        host (str): Адрес для прослушивания.
+        port (int): Порт.
+        workers (int): Число воркеров.
+        report_delay (float): Через сколько секунд после старта напечатать отчёт по памяти
+            (повторно — по сигналу SIGUSR1 мастеру).
+        restart_policy (RestartPolicy, optional): Паузы перед заменой упавших воркеров.
+
+    Returns:
+        bool: False, если мастер остановился из-за воркеров, падающих при старте.
+    """
+    preload()
+    # Всё, что создано до fork, убираем из поля зрения сборщика мусора: иначе его проходы
+    # в воркерах пишут в заголовки объектов и копируют общие страницы
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(host, port)
+    restart_policy = restart_policy or RestartPolicy()
+    children = {}
+    respawns = []  # время запуска отложенных замен
+    stopping = False
+    failed = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+        return pid
+
+    def report():
+        memory_report([("master", os.getpid())] + [("worker", pid) for pid in children])
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        respawns.clear()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: report())
+
+    for _ in range(workers):
+        spawn()
+    print(f"🧩 Мастер {os.getpid()}: {workers} воркеров на {host}:{port}")
+
+    report_at = time.time() + report_delay
+    while children or respawns:
+        if report_at is not None and time.time() >= report_at:
+            report()
+            report_at = None
+
+        now = time.monotonic()
+        for at in [at for at in respawns if at <= now]:
+            respawns.remove(at)
+            spawn()
+
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+
+        started = children.pop(pid, None)
+        if not stopping and started is not None:
+            # Упавший воркер заменяется новым форком от того же мастера с уже загруженной моделью
+            delay = restart_policy.delay(time.monotonic() - started)
+            if delay is None:
+                print(f"❌ Воркер {pid} завершился (статус {status}): {restart_policy.failures} падений подряд "
+                      f"при старте — мастер останавливается")
+                failed = True
+                shutdown(None, None)
+            else:
+                print(f"⚠️ Воркер {pid} завершился (статус {status}), запускаем новый"
+                      + (f" через {delay:.1f} с" if delay else ""))
+                respawns.append(time.monotonic() + delay)
+
+    sock.close()
+    print("🛑 Мастер остановлен")
+    return not failed
@@ -0,0 +1,260 @@
+import glob
+import os
+import threading
+import time
+import numpy as np
+
+# === Журнал запросов и признаков ===
+#
+# Каждая оценённая строка (признаки, метка, уверенность, вероятности, версия модели, задержка)
+# копируется в кольцевой буфер из заранее выделенных массивов NumPy — обработчик запроса
+# только копирует строку под коротким lock и ничего не пишет на диск. Фоновый поток раз в
+# flush_interval секунд (или раньше, когда буфер заполнен на flush_rows) забирает всё
+# накопленное одним куском и дописывает его группой строк в текущий файл Parquet или Arrow.
+# Файл сменяется по числу строк или по возрасту; пока он пишется, у него суффикс .part,
+# так что читатели видят только закрытые файлы. Если буфер заполнен, новые строки
+# отбрасываются и считаются в dropped — запрос журнал не ждёт никогда.
+#
+# Файлы нужны для переобучения, анализа дрейфа и повторного проигрывания нагрузки;
+# прочитать их можно через pandas.read_parquet(каталог) или pyarrow.dataset.
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+class RequestLog:
+    """
+    Неблокирующий журнал оценённых строк с записью в ротируемые файлы Parquet или Arrow IPC.
+
+    Args:
+        directory (str): Каталог для файлов журнала.
+        features (list): Имена признаков — столбцы входа.
+        labels (list): Имена классов по значению метки (LABELS) — столбцы proba_<класс>.
+        capacity (int): Сколько строк вмещает буфер; при переполнении новые строки отбрасываются.
+        flush_interval (float): Как часто фоновый поток сбрасывает буфер, с.
+        flush_rows (int): Сбросить раньше, когда в буфере накопилось столько строк (по умолчанию — половина буфера).
+        rotate_rows (int): Строк в одном файле до ротации.
+        rotate_seconds (float): Наибольший возраст файла до ротации, с.
+        file_format (str): parquet или arrow (Arrow IPC file).
+        max_files (int): Сколько закрытых файлов хранить в каталоге; 0 — без ограничения.
+    """
+
+    def __init__(self, directory, features, labels, capacity=65536, flush_interval=5.0, flush_rows=None,
+                 rotate_rows=1_000_000, rotate_seconds=3600, file_format="parquet", max_files=0):
+        if file_format not in FORMATS:
+            raise ValueError(f"Неизвестный формат журнала {file_format!r}: ожидается parquet или arrow")
+        import pyarrow as pa
+
+        self.directory = directory
+        self.features = list(features)
+        self.labels = list(labels)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows or max(1, capacity // 2)
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+        self.file_format = file_format
+        self.max_files = max_files
+        self.schema = pa.schema(
+            [("ts", pa.timestamp("us", tz="UTC")), ("endpoint", pa.string()), ("model_version", pa.string()),
+             ("latency_ms", pa.float32())]
+            + [(feature, pa.float64()) for feature in self.features]
+            + [("label", pa.int16()), ("confidence", pa.float32())]
+            + [(f"proba_{label}", pa.float32()) for label in self.labels])
+
+        # Кольцевой буфер: занятые строки — count штук начиная с head (по модулю capacity)
+        self._time = np.empty(capacity, dtype=np.float64)
+        self._endpoint = np.empty(capacity, dtype=object)
+        self._version = np.empty(capacity, dtype=object)
+        self._latency = np.empty(capacity, dtype=np.float32)
+        self._features = np.empty((capacity, len(self.features)), dtype=np.float64)
+        self._label = np.empty(capacity, dtype=np.int16)
+        self._confidence = np.empty(capacity, dtype=np.float32)
+        self._probs = np.empty((capacity, len(self.labels)), dtype=np.float32)
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        # Сброс буфера и работа с файлом — только из одного потока за раз
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._writer = None
+        self._path = None
+        self._file_rows = 0
+        self._file_opened = 0.0
+        self._sequence = 0
+
+        self.appended = 0
+        self.dropped = 0
+        self.written = 0
+        self.lost = 0
+        self.files = 0
+
+    def append(self, endpoint, model_version, X, labels, confidences, latency_ms, probs=None, classes=None):
+        """
+        Копирует строки в буфер; то, что не поместилось, отбрасывается. Не обращается к диску.
+
+        Args:
+            endpoint (str): Эндпоинт запроса.
+            model_version (str): Версия модели, которая оценила строки.
+            X (array-like): Признаки (n_rows, n_features).
+            labels (array-like): Предсказанные метки.
+            confidences (array-like): Вероятность предсказанной метки.
+            latency_ms (float): Время обработки запроса к моменту записи, мс.
+            probs (np.ndarray): Вероятности классов (n_rows, n_classes) или None, если известна только уверенность
+                (модель без predict_proba) — тогда proba_* пишутся как NaN.
+            classes (array-like): Метки столбцов probs (classes_ модели).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        labels = np.asarray(labels)
+        confidences = np.asarray(confidences)
+        if probs is not None:
+            probs = np.asarray(probs)
+            classes = [int(c) for c in classes]
+        n = len(X)
+        now = time.time()
+        with self._lock:
+            self.appended += n
+            take = min(n, self.capacity - self._count)
+            self.dropped += n - take
+            start = (self._head + self._count) % self.capacity
+            # Свободное место — не больше двух непрерывных отрезков: до конца массивов и с начала
+            first = min(take, self.capacity - start)
+            for rows, offset in ((slice(start, start + first), 0), (slice(0, take - first), first)):
+                if rows.stop <= rows.start:
+                    continue
+                part = slice(offset, offset + rows.stop - rows.start)
+                self._time[rows] = now
+                self._endpoint[rows] = endpoint
+                self._version[rows] = model_version
+                self._latency[rows] = latency_ms
+                self._features[rows] = X[part]
+                self._label[rows] = labels[part]
+                self._confidence[rows] = confidences[part]
+                if probs is None:
+                    self._probs[rows] = np.nan
+                else:
+                    self._probs[rows, classes] = probs[part]
+            self._count += take
+            pending = self._count
+        if pending >= self.flush_rows:
+            self._wake.set()
+
+    def flush(self):
+        """Забирает всё накопленное одним куском и дописывает в текущий файл; ротирует файл при необходимости."""
+        with self._flush_lock:
+            with self._lock:
+                head, n = self._head, self._count
+            if n:
+                # Строки [head, head + n) писатели не трогают, пока count не уменьшен, — копируем без lock
+                index = (head + np.arange(n)) % self.capacity
+                batch = self._table(index)
+                with self._lock:
+                    self._head = (head + n) % self.capacity
+                    self._count -= n
+                try:
+                    self._write(batch)
+                    self.written += n
+                except Exception as e:
+                    self.lost += n
+                    print(f"⚠️ Журнал запросов: не удалось записать {n} строк: {type(e).__name__}: {e}")
+            if self._writer is not None and time.time() - self._file_opened >= self.rotate_seconds:
+                self._close_file()
+
+    def _table(self, index):
+        import pyarrow as pa
+
+        columns = [
+            pa.array((self._time[index] * 1e6).astype(np.int64), type=pa.timestamp("us", tz="UTC")),
+            pa.array(self._endpoint[index], type=pa.string()),
+            pa.array(self._version[index], type=pa.string()),
+            pa.array(self._latency[index]),
+        ]
+        features = self._features[index]
+        columns += [pa.array(features[:, i]) for i in range(len(self.features))]
+        columns += [pa.array(self._label[index]), pa.array(self._confidence[index])]
+        probs = self._probs[index]
+        columns += [pa.array(probs[:, k]) for k in range(len(self.labels))]
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def _write(self, table):
+        if self._writer is None:
+            self._open_file()
+        if self.file_format == "parquet":
+            self._writer.write_table(table)
+        else:
+            self._writer.write(table)
+        self._file_rows += table.num_rows
+        if self._file_rows >= self.rotate_rows:
+            self._close_file()
+
+    def _open_file(self):
+        import pyarrow as pa
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        # pid в имени: при API_WORKERS > 1 каждый воркер ведёт свой журнал в том же каталоге
+        name = f"requests-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._sequence:04d}"
+        self._path = os.path.join(self.directory, name + FORMATS[self.file_format])
+        if self.file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self._path + ".part", self.schema)
+        else:
+            self._writer = pa.ipc.new_file(self._path + ".part", self.schema)
+        self._file_rows = 0
+        self._file_opened = time.time()
+
+    def _close_file(self):
+        writer, path = self._writer, self._path
+        self._writer = None
+        try:
+            writer.close()
+            os.replace(path + ".part", path)
+            self.files += 1
+        except Exception as e:
+            print(f"⚠️ Журнал запросов: не удалось закрыть {path}: {type(e).__name__}: {e}")
+            return
+        if self.max_files:
+            closed = sorted(glob.glob(os.path.join(self.directory, "requests-*" + FORMATS[self.file_format])))
+            for old in closed[:-self.max_files]:
+                os.remove(old)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+        self._thread.start()
+        print(f"🗒️ Журнал запросов: {self.directory} ({self.file_format}), буфер {self.capacity} строк, "
+              f"сброс каждые {self.flush_interval} с")
+
+    def stop(self):
+        """Останавливает фоновый поток, сбрасывает остаток буфера и закрывает текущий файл."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._flush_lock:
+            if self._writer is not None:
+                self._close_file()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "format": self.file_format,
+                "capacity": self.capacity,
+                "buffered": self._count,
+                "appended": self.appended,
+                "dropped": self.dropped,
+                "written": self.written,
+                "lost": self.lost,
+                "files": self.files,
+                "current_file": self._path if self._writer is not None else None,
+            }
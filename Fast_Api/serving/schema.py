@@ -0,0 +1,33 @@
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+
+# === Схема входных данных ===
+class SleepData(BaseModel):
+    Age: float
+    Gender: int
+    Sleep_duration: float
+    Awakenings: float
+    Caffeine_consumption: float
+    Alcohol_consumption: float
+    Smoking_status: int
+    Exercise_frequency: float
+    bed_hour: float
+    wake_hour: float
+
+
+# === Запрос на горячую перезагрузку модели ===
+class ReloadRequest(BaseModel):
+    kind: Literal["file", "registry"] = "file"
+    # kind=file: путь к .pkl (по умолчанию MODEL_PATH)
+    path: Optional[str] = None
+    # kind=registry: имя в MLflow Model Registry и одно из version / alias / stage
+    model_name: Optional[str] = None
+    version: Optional[str] = None
+    alias: Optional[str] = None
+    stage: Optional[str] = None
+
+
+# Порядок признаков совпадает с порядком полей SleepData (и с порядком столбцов при обучении)
+FEATURES = list(SleepData.model_fields)
+LABELS = ["bad", "good", "medium"]
@@ -0,0 +1,133 @@
+import os
+
+# Базовые пути сервиса
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(MODELS_DIR, "RandomForest_Sleep.pkl"))
+
+# Движок инференса: native — модель sklearn/XGBoost как есть,
+# compiled — ансамбль деревьев, скомпилированный в массивы NumPy (serving/tree_engine.py),
+# numpy — LogisticRegression, GaussianNB и KNN на NumPy без sklearn (serving/numpy_models.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "native")
+
+# Кэш предсказаний: максимальное число записей (0 — кэш выключен) и время жизни записи в секундах
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 3600))
+
+# Таблица ответов для дискретного домена бота (serving/answer_table.py): путь без расширения
+# и корзины непрерывных признаков в формате start:stop:step
+ANSWER_TABLE_PATH = os.getenv("ANSWER_TABLE_PATH", os.path.join(MODELS_DIR, "answer_table"))
+ANSWER_TABLE_AGE = os.getenv("ANSWER_TABLE_AGE", "15:75:10")
+ANSWER_TABLE_SLEEP_DURATION = os.getenv("ANSWER_TABLE_SLEEP_DURATION", "3.5:10.5:1")
+
+# Микробатчинг /predict: конкурентные запросы собираются в пакет не больше MICROBATCH_MAX_SIZE строк
+# в окне MICROBATCH_WINDOW_MS миллисекунд после первой строки пакета
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "false").lower() == "true"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", 32))
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", 2))
+
+# Горячая перезагрузка модели (serving/model_store.py)
+# MODEL_WATCH: off — только через POST /admin/reload, file — следить за MODEL_PATH,
+# registry — следить за алиасом MODEL_REGISTRY_ALIAS модели MODEL_REGISTRY_NAME в MLflow
+MODEL_WATCH = os.getenv("MODEL_WATCH", "off")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 30))
+MODEL_REGISTRY_NAME = os.getenv("MODEL_REGISTRY_NAME", "RandomForest_Sleep")
+MODEL_REGISTRY_ALIAS = os.getenv("MODEL_REGISTRY_ALIAS", "staging")
+MODEL_WARMUP_ROWS = int(os.getenv("MODEL_WARMUP_ROWS", 64))
+
+# Тип матрицы признаков, которую API собирает из JSON: float64 или float32.
+# Деревья sklearn и XGBoost сравнивают признаки во float32 и приводят к нему float64-вход копией;
+# с float32 матрица идёт в модель без преобразования, а предсказания деревьев те же бит в бит
+INFERENCE_DTYPE = os.getenv("INFERENCE_DTYPE", "float64")
+if INFERENCE_DTYPE not in ("float32", "float64"):
+    raise ValueError(f"INFERENCE_DTYPE должен быть float32 или float64, получено: {INFERENCE_DTYPE}")
+# Число воркеров uvicorn: больше 1 — pre-fork мастер (serving/prefork.py)
+API_WORKERS = int(os.getenv("API_WORKERS", 1))
+# Токен для /admin/* и /debug/* (заголовок X-Admin-Token); пустой — эти эндпоинты отвечают 403
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Исполнитель инференса: thread — модель вызывается в потоках FastAPI,
+# process — в пуле процессов со своей копией модели (serving/executor.py)
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", os.cpu_count() or 1))
+# Сколько пакетов может быть в работе одновременно и сколько секунд ждать свободного места
+INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", 2 * (os.cpu_count() or 1)))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", 1.0))
+INFERENCE_SLOT_ROWS = int(os.getenv("INFERENCE_SLOT_ROWS", 1024))
+INFERENCE_POOL_START_METHOD = os.getenv("INFERENCE_POOL_START_METHOD", "spawn")
+
+# Метрики Prometheus (/metrics) и поэтапные замеры запросов
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Бэкенд onnx: число потоков onnxruntime на один вызов (0 — решает onnxruntime)
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))
+# Допустимое расхождение вероятностей бэкенда с нативной моделью при загрузке
+BACKEND_TOLERANCE = float(os.getenv("BACKEND_TOLERANCE", 1e-5))
+
+# Потоковая оценка /predict_stream (serving/streaming.py): строк в одном вызове модели
+# и предельная длина одной строки входа в байтах
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 1024))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", 64 * 1024))
+
+# Теневая оценка модели-претендента (serving/shadow.py): путь к модели (пусто — выключена),
+# доля строк на теневую оценку и размер очереди заданий (при переполнении задания отбрасываются)
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", 0.1))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", 1000))
+
+# Объяснения предсказаний (?explain=true): при загрузке модели рядом строится скомпилированный
+# ансамбль со значениями всех узлов (serving/explain.py)
+EXPLAIN_ENABLED = os.getenv("EXPLAIN_ENABLED", "true").lower() == "true"
+
+# Журнал запросов и признаков (serving/request_log.py): каталог для файлов (пусто — выключен),
+# формат parquet или arrow, размер буфера в строках, период сброса и ротация файлов
+REQUEST_LOG_DIR = os.getenv("REQUEST_LOG_DIR", "")
+REQUEST_LOG_FORMAT = os.getenv("REQUEST_LOG_FORMAT", "parquet")
+REQUEST_LOG_BUFFER_ROWS = int(os.getenv("REQUEST_LOG_BUFFER_ROWS", 65536))
+REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", 5))
+REQUEST_LOG_ROTATE_ROWS = int(os.getenv("REQUEST_LOG_ROTATE_ROWS", 1_000_000))
+REQUEST_LOG_ROTATE_SECONDS = float(os.getenv("REQUEST_LOG_ROTATE_SECONDS", 3600))
+REQUEST_LOG_MAX_FILES = int(os.getenv("REQUEST_LOG_MAX_FILES", 0))
+
+# Мониторинг дрейфа признаков (serving/drift.py): эталонные гистограммы обучающих данных
+# (python -m serving.drift), размер окна живых данных в строках и минимум строк для оценки
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "true").lower() == "true"
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", os.path.join(MODELS_DIR, "drift_reference.json"))
+DRIFT_WINDOW_ROWS = int(os.getenv("DRIFT_WINDOW_ROWS", 10000))
+DRIFT_MIN_ROWS = int(os.getenv("DRIFT_MIN_ROWS", 100))
+
+# Выбор модели на запрос (serving/model_cache.py): заголовок X-Model или путь /models/{model}/...
+# Имя в реестре — f"{семейство}_{MLFLOW_MODEL_NAME}", как в ml_experiments; бюджет памяти кэша моделей в МБ
+MLFLOW_MODEL_NAME = os.getenv("MLFLOW_MODEL_NAME", "Sleep")
+MODEL_FAMILIES = [family.strip() for family in
+                  os.getenv("MODEL_FAMILIES", "RandomForest,XGBoost,LogisticRegression,KNeighborsClassifier,GaussianNB").split(",")
+                  if family.strip()]
+MODEL_CACHE_BUDGET_MB = float(os.getenv("MODEL_CACHE_BUDGET_MB", 512))
+# Неудачная загрузка запоминается на MODEL_CACHE_FAILURE_TTL секунд (повторные запросы сразу получают 503,
+# без похода в реестр); не больше MODEL_CACHE_LOADS_PER_MINUTE загрузок в минуту (0 — без ограничения)
+MODEL_CACHE_FAILURE_TTL = float(os.getenv("MODEL_CACHE_FAILURE_TTL", 30))
+MODEL_CACHE_LOADS_PER_MINUTE = int(os.getenv("MODEL_CACHE_LOADS_PER_MINUTE", 30))
+
+# Допуск запросов и сброс нагрузки (serving/admission.py): сколько запросов инференса обрабатывается
+# одновременно, сколько может ждать в очереди (больше — 429) и сколько миллисекунд (дольше — 503).
+# Пакетные эндпоинты (/predict_batch, /predict_stream) занимают не больше ADMISSION_BULK_MAX_IN_FLIGHT мест,
+# а освободившееся место первым получает /predict; 0 — классы приоритета не различаются.
+# ADMISSION_MAX_LOOP_LAG_MS — задержка цикла событий, выше которой запросы отклоняются (0 — не отслеживается)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 32))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 128))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", 2000))
+ADMISSION_BULK_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_BULK_MAX_IN_FLIGHT", 8))
+ADMISSION_MAX_LOOP_LAG_MS = float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", 0))
+
+# Трассировка запросов (serving/tracing.py): контекст из заголовка traceparent (его передаёт бот).
+# TRACE_SAMPLE_RATE — доля трасс, которые API начинает сам (запрос без traceparent); для запросов
+# с traceparent выборку решает отправитель. Спаны пишутся пачками в TRACE_FILE (JSON Lines) и/или
+# отправляются в TRACE_COLLECTOR_URL; при переполнении очереди TRACE_QUEUE_SIZE спаны отбрасываются
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL", "")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", 512))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", 1))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 8192))
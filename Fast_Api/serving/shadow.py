@@ -0,0 +1,163 @@
+import queue
+import random
+import threading
+import time
+import numpy as np
+from serving.metrics import Histogram
+
+# === Теневая оценка модели-претендента ===
+#
+# Доля живых запросов дополнительно оценивается второй моделью (например, XGBoost рядом
+# с основным RandomForest), чтобы сравнивать их на реальном трафике без офлайн-работы.
+# Задание ставится в очередь уже после отправки ответа (фоновая задача Starlette),
+# очередь ограничена и при переполнении отбрасывает задания, а сама оценка идёт
+# в отдельном потоке пакетами — ответ основной модели теневой путь не задерживает.
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+DELTA_BUCKETS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0]
+
+
+class ShadowScorer:
+    """
+    Фоновая оценка выборки запросов моделью-претендентом и сводка сравнения с основной моделью.
+
+    Сравнивается решение основной модели: совпала ли метка и насколько вероятность этой метки
+    у претендента отличается от уверенности основной модели.
+
+    Args:
+        model: Модель-претендент с predict_proba и classes_.
+        version (str): Версия претендента.
+        sample_rate (float): Доля строк, которые отправляются на теневую оценку.
+        queue_size (int): Сколько заданий может ждать оценки; лишние отбрасываются.
+        max_batch_rows (int): Сколько строк из очереди оценивать одним вызовом модели.
+    """
+
+    def __init__(self, model, version, sample_rate=0.1, queue_size=1000, max_batch_rows=256):
+        self.model = model
+        self.version = version
+        self.sample_rate = sample_rate
+        self.max_batch_rows = max_batch_rows
+        self._class_index = {int(c): i for i, c in enumerate(model.classes_)}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.sampled = 0
+        self.dropped = 0
+        self.scored = 0
+        self.agreed = 0
+        self.errors = 0
+        self.delta_sum = 0.0
+        self.delta_max = 0.0
+        # Пары (метка основной модели, метка претендента) -> число строк
+        self.confusion = {}
+        self.delta = Histogram(DELTA_BUCKETS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    def sample(self):
+        """Решение для одиночного запроса: отправлять ли его на теневую оценку."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def submit(self, rows, labels, confidences):
+        """
+        Ставит строки в очередь без ожидания; при переполнении задание отбрасывается.
+
+        Args:
+            rows (array-like): Признаки (n_rows, n_features).
+            labels (array-like): Метки основной модели.
+            confidences (array-like): Вероятность этих меток у основной модели.
+        """
+        job = (np.asarray(rows, dtype=np.float64), np.asarray(labels), np.asarray(confidences, dtype=np.float64))
+        self.sampled += len(job[0])
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.dropped += len(job[0])
+
+    async def submit_sampled(self, rows, labels, confidences):
+        """Пакетный запрос: на теневую оценку уходит случайная доля sample_rate его строк."""
+        mask = np.random.random(len(labels)) < self.sample_rate
+        if mask.any():
+            await self.submit(np.asarray(rows)[mask], np.asarray(labels)[mask], np.asarray(confidences)[mask])
+
+    def _score(self, jobs):
+        X = np.concatenate([job[0] for job in jobs])
+        labels = np.concatenate([job[1] for job in jobs])
+        confidences = np.concatenate([job[2] for job in jobs])
+
+        started = time.perf_counter()
+        probs = self.model.predict_proba(X)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        challenger = np.asarray(self.model.classes_)[probs.argmax(axis=1)]
+        own = probs[np.arange(len(X)), [self._class_index[int(label)] for label in labels]]
+        deltas = np.abs(own - confidences)
+
+        with self._lock:
+            self.latency_ms.observe(elapsed_ms)
+            self.scored += len(X)
+            self.agreed += int((challenger == labels).sum())
+            self.delta_sum += float(deltas.sum())
+            self.delta_max = max(self.delta_max, float(deltas.max()))
+            for delta in deltas:
+                self.delta.observe(float(delta))
+            for pair in zip(labels.tolist(), challenger.tolist()):
+                self.confusion[pair] = self.confusion.get(pair, 0) + 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                jobs = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Всё, что успело накопиться, — одним вызовом модели
+            rows = len(jobs[0][0])
+            while rows < self.max_batch_rows:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                rows += len(jobs[-1][0])
+            try:
+                self._score(jobs)
+            except Exception as e:
+                self.errors += rows
+                print(f"⚠️ Теневая оценка не удалась: {type(e).__name__}: {e}")
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+        print(f"👥 Теневая оценка: {self.version}, доля {self.sample_rate}, очередь {self._queue.maxsize}")
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        """Ждёт, пока будут оценены все задания в очереди (для тестов и бенчмарков)."""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            scored = self.scored
+            return {
+                "challenger_version": self.version,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+                "scored": scored,
+                "agreement": round(self.agreed / scored, 4) if scored else None,
+                "confusion": {f"{primary}->{challenger}": n
+                              for (primary, challenger), n in sorted(self.confusion.items())},
+                "probability_delta": {
+                    "mean": round(self.delta_sum / scored, 4) if scored else None,
+                    "max": round(self.delta_max, 4),
+                    **self.delta.snapshot(),
+                },
+                "challenger_latency_ms": self.latency_ms.snapshot(),
+            }
@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+import numpy as np
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from serving.schema import SleepData, FEATURES, LABELS
+
+# === Потоковая оценка больших выгрузок ===
+#
+# Тело запроса (NDJSON или CSV) читается по мере поступления, строки копятся в пакеты
+# фиксированного размера, каждый пакет оценивается одним вызовом predict_proba, и его
+# предсказания сразу уходят клиенту. Следующий кусок тела читается только после того,
+# как ответ по предыдущему пакету отправлен: медленный клиент притормаживает чтение входа,
+# и в памяти одновременно живёт не больше одного пакета — независимо от размера выгрузки.
+# Ошибка в строке не прерывает поток: вместо предсказания для неё возвращается {"row": n, "error": ...}.
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl")
+CSV_CONTENT_TYPE = "text/csv"
+
+# Отметка строки, превысившей STREAM_MAX_LINE_BYTES (её остаток до перевода строки пропускается)
+LINE_TOO_LONG = object()
+
+
+async def split_lines(chunks, max_line_bytes):
+    """Асинхронные куски байтов -> строки без перевода строки; держит в памяти не больше одной строки."""
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            else:
+                buffer += chunk[start:end]
+                yield LINE_TOO_LONG if len(buffer) > max_line_bytes else bytes(buffer)
+            buffer.clear()
+            start = end + 1
+
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                yield LINE_TOO_LONG
+                buffer.clear()
+                skipping = True
+    if buffer and not skipping:
+        yield bytes(buffer)
+
+
+def error_message(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def _prediction(label, confidence):
+    return {"sleep_efficiency_label": label, "sleep_quality": LABELS[label], "confidence": confidence}
+
+
+class NdjsonFormat:
+    """Строка входа — JSON-объект SleepData, строка выхода — JSON-объект с предсказанием или ошибкой."""
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, line):
+        data = SleepData.model_validate_json(line)
+        return [getattr(data, field) for field in FEATURES]
+
+    def header(self):
+        return b""
+
+    def render(self, results):
+        return "".join(json.dumps({"row": row, **(_prediction(*value) if isinstance(value, tuple)
+                                                  else {"error": value})}, ensure_ascii=False) + "\n"
+                       for row, value in results).encode()
+
+
+class CsvFormat:
+    """Первая строка входа — заголовок с именами признаков; выход — CSV с номером строки и предсказанием."""
+
+    media_type = "text/csv"
+    columns = ["row", "sleep_efficiency_label", "sleep_quality", "confidence", "error"]
+
+    def __init__(self):
+        self.fields = None
+
+    def parse(self, line):
+        values = next(csv.reader([line.decode()]))
+        if self.fields is None:
+            self.fields = [value.strip() for value in values]
+            return None
+        if len(values) != len(self.fields):
+            raise ValueError(f"ожидалось {len(self.fields)} столбцов, получено {len(values)}")
+        data = SleepData.model_validate(dict(zip(self.fields, values)))
+        return [getattr(data, field) for field in FEATURES]
+
+    def header(self):
+        return self.render_rows([self.columns])
+
+    def render(self, results):
+        return self.render_rows([
+            [row, value[0], LABELS[value[0]], value[1], ""] if isinstance(value, tuple) else [row, "", "", "", value]
+            for row, value in results
+        ])
+
+    @staticmethod
+    def render_rows(rows):
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        return out.getvalue().encode()
+
+
+def stream_format(media_type):
+    if media_type in NDJSON_CONTENT_TYPES:
+        return NdjsonFormat()
+    if media_type == CSV_CONTENT_TYPE:
+        return CsvFormat()
+    return None
+
+
+async def score_stream(chunks, fmt, score, chunk_rows=1024, max_line_bytes=64 * 1024, dtype=np.float64):
+    """
+    Генератор ответа: кусок выхода на каждый пакет из chunk_rows строк входа.
+
+    Args:
+        chunks: Асинхронный итератор кусков тела запроса (request.stream()).
+        fmt (NdjsonFormat | CsvFormat): Формат входа и выхода.
+        score (callable): async X -> (метки, уверенности, вероятности) — вызов модели вне event loop.
+        chunk_rows (int): Строк в одном вызове модели.
+        max_line_bytes (int): Предельная длина строки входа.
+        dtype: Тип матрицы признаков (см. INFERENCE_DTYPE).
+    """
+    pending = []  # (номер строки, признаки или текст ошибки) в порядке входа
+
+    async def flush():
+        valid = [i for i, (_, value) in enumerate(pending) if not isinstance(value, str)]
+        results = list(pending)
+        if valid:
+            try:
+                labels, confidences, _ = await score(np.array([pending[i][1] for i in valid], dtype=dtype))
+                for i, label, confidence in zip(valid, labels, confidences):
+                    results[i] = (pending[i][0], (int(label), round(float(confidence), 3)))
+            except Exception as e:
+                for i in valid:
+                    results[i] = (pending[i][0], f"инференс: {type(e).__name__}: {e}")
+        pending.clear()
+        return fmt.render(results)
+
+    header = fmt.header()
+    if header:
+        yield header
+
+    row = 0
+    try:
+        async for line in split_lines(chunks, max_line_bytes):
+            if line is LINE_TOO_LONG:
+                pending.append((row, f"строка длиннее {max_line_bytes} байт"))
+            else:
+                line = line.rstrip(b"\r")
+                if not line.strip():
+                    continue
+                try:
+                    values = fmt.parse(line)
+                    if values is None:  # заголовок CSV
+                        continue
+                    pending.append((row, values))
+                except (ValidationError, ValueError, UnicodeDecodeError) as e:
+                    pending.append((row, error_message(e)))
+            row += 1
+
+            if len(pending) >= chunk_rows:
+                yield await flush()
+    except ClientDisconnect:
+        return
+
+    if pending:
+        yield await flush()
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse, генератор которого сам читает тело запроса.
+
+    Обычный StreamingResponse (ASGI < 2.4) параллельно слушает receive() ради http.disconnect
+    и забирал бы себе куски тела; здесь разрыв соединения виден генератору из request.stream()
+    как ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
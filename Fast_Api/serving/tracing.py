@@ -0,0 +1,415 @@
+import argparse
+import collections
+import glob
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from serving.metrics import RequestTimer, _current_timer
+
+# === Трассировка запроса: бот → API → модель ===
+#
+# Контекст трассы передаётся заголовком W3C traceparent (00-<trace_id>-<span_id>-<flags>):
+# бот открывает трассу на каждый пройденный опрос и передаёт её в запросе к API, API пишет
+# спан запроса и дочерние спаны этапов — validation, features, inference (или answer_table),
+# explain, serialization. Этапы берутся из того же RequestTimer, что и метрики: отдельных
+# замеров в обработчиках нет.
+#
+# Решение о выборке принимает начало трассы: если в traceparent флаг sampled снят, API спанов
+# не пишет; без заголовка API сам начинает трассу с вероятностью TRACE_SAMPLE_RATE. Невыбранный
+# запрос стоит разбора заголовка, выбранный — сборки словарей спанов. Запись — в фоновом
+# потоке пачками: запрос только кладёт спаны в ограниченную очередь и при переполнении
+# отбрасывает их (dropped), ничего не ждёт.
+#
+# Спаны пишутся строками JSON в TRACE_FILE или отправляются POST-запросом (JSON-массив) в
+# TRACE_COLLECTOR_URL. Формат полей близок к OTLP, так что на месте локального сборщика может
+# стоять настоящий коллектор с небольшим преобразованием.
+#
+# Запуск из папки Fast_Api:
+#   python -m serving.tracing collect --port 4318 --out traces.jsonl   # локальный сборщик
+#   python -m serving.tracing report traces.jsonl                      # трассы по этапам
+
+TRACEPARENT = "traceparent"
+SAMPLED = 0x01
+
+
+class SpanContext:
+    """Трасса и спан, на который ссылаются дочерние спаны, плюс решение о выборке."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{SAMPLED if self.sampled else 0:02x}"
+
+
+def new_trace_id():
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id():
+    return f"{random.getrandbits(64):016x}"
+
+
+def _is_hex(value, length):
+    if len(value) != length:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return value == value.lower()
+
+
+def parse_traceparent(header):
+    """
+    Разбор заголовка traceparent.
+
+    Returns:
+        SpanContext или None, если заголовка нет или он некорректен (тогда трасса начинается заново).
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or parts[0] == "ff" or not _is_hex(parts[0], 2):
+        return None
+    # Версия 00 — ровно четыре поля; у будущих версий могут быть поля после флагов
+    if parts[0] == "00" and len(parts) != 4:
+        return None
+    _, trace_id, span_id, flags = parts[:4]
+    # Идентификаторы из одних нулей недействительны
+    if not (_is_hex(trace_id, 32) and _is_hex(span_id, 16) and _is_hex(flags, 2)) \
+            or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & SAMPLED))
+
+
+def make_span(context, name, service, start, duration_s, parent_id=None, span_id=None, attributes=None):
+    """Спан — словарь, который без изменений уходит в экспортёр (start — Unix-время в секундах)."""
+    return {
+        "trace_id": context.trace_id,
+        "span_id": span_id or new_span_id(),
+        "parent_id": parent_id,
+        "name": name,
+        "service": service,
+        "start": round(start, 6),
+        "duration_ms": round(duration_s * 1000, 3),
+        "attributes": attributes or {},
+    }
+
+
+# === Экспорт спанов ===
+
+class SpanExporter:
+    """
+    Неблокирующий экспорт спанов пачками в файл JSON Lines и/или в HTTP-сборщик.
+
+    Args:
+        path (str): Файл, в который дописываются спаны (пусто — не писать).
+        url (str): Адрес сборщика: POST с JSON-массивом спанов (пусто — не отправлять).
+        batch_size (int): Сбросить очередь раньше, когда в ней накопилось столько спанов.
+        flush_interval (float): Как часто фоновый поток сбрасывает очередь, с.
+        queue_size (int): Сколько спанов вмещает очередь; при переполнении новые отбрасываются.
+        timeout (float): Таймаут отправки в сборщик, с.
+    """
+
+    def __init__(self, path="", url="", batch_size=512, flush_interval=1.0, queue_size=8192, timeout=2.0):
+        self.path = path
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        # Сброс и запись — только из одного потока за раз
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.exported = 0
+        self.dropped = 0
+        self.lost = 0
+        self.batches = 0
+
+    @property
+    def enabled(self):
+        """Есть ли куда писать спаны."""
+        return bool(self.path or self.url)
+
+    def export(self, spans):
+        """Кладёт спаны в очередь; спаны, которым не хватило места, отбрасываются. Не блокирует."""
+        with self._lock:
+            room = self.queue_size - len(self._queue)
+            accepted = spans[:max(room, 0)]
+            self._queue.extend(accepted)
+            self.dropped += len(spans) - len(accepted)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Забирает всё из очереди и записывает пачками по batch_size."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch):
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(span, ensure_ascii=False) + "\n" for span in batch))
+            if self.url:
+                request = urllib.request.Request(self.url, data=json.dumps(batch).encode(), method="POST",
+                                                 headers={"Content-Type": "application/json"})
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+        except Exception as e:
+            # Трассировка не должна мешать сервису: потерянная пачка только считается
+            self.lost += len(batch)
+            print(f"⚠️ Экспорт спанов: {type(e).__name__}: {e}")
+            return
+        self.exported += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает фоновый поток и сбрасывает остаток очереди."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._queue)
+        return {"file": self.path or None, "collector_url": self.url or None, "queued": queued,
+                "queue_size": self.queue_size, "exported": self.exported, "dropped": self.dropped,
+                "lost": self.lost, "batches": self.batches}
+
+
+# === Спаны запросов API ===
+
+class Tracer:
+    """
+    Решение о выборке и сборка спанов запроса API.
+
+    Args:
+        exporter (SpanExporter): Куда отдавать спаны.
+        sample_rate (float): Доля трасс, которые API начинает сам (запрос без traceparent).
+        service (str): Имя сервиса в спанах.
+    """
+
+    def __init__(self, exporter, sample_rate=1.0, service="sleep-api"):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.service = service
+        self.sampled = 0
+        self.unsampled = 0
+
+    def start(self, header):
+        """Контекст родителя для запроса: из traceparent или новая трасса; None — запрос не пишется."""
+        if not self.exporter.enabled:
+            return None
+        parent = parse_traceparent(header)
+        if parent is None:
+            # Начало трассы здесь: родительского спана нет, span_id=None
+            parent = SpanContext(new_trace_id(), None, random.random() < self.sample_rate)
+        if parent.sampled:
+            self.sampled += 1
+            return parent
+        self.unsampled += 1
+        return None
+
+    def record_request(self, parent, timer, method, route, status, attributes=None):
+        """
+        Спан запроса и дочерние спаны этапов по отметкам RequestTimer.
+
+        Этапы идут подряд: каждый начинается там, где закончился предыдущий, первый — от начала запроса.
+        """
+        ended = time.perf_counter()
+        # perf_counter → Unix-время одним сдвигом на запрос
+        offset = time.time() - ended
+        request_id = new_span_id()
+        spans = [make_span(parent, f"{method} {route}", self.service, timer.started + offset, ended - timer.started,
+                           parent_id=parent.span_id, span_id=request_id,
+                           attributes={"http.method": method, "http.route": route, "http.status_code": status,
+                                       "model_version": timer.model_version, **(attributes or {})})]
+        start = timer.started
+        for name, seconds in timer.stages:
+            spans.append(make_span(parent, name, self.service, start + offset, seconds, parent_id=request_id))
+            start += seconds
+        self.exporter.export(spans)
+        return spans
+
+    def stats(self):
+        return {"sample_rate": self.sample_rate, "sampled": self.sampled, "unsampled": self.unsampled,
+                **self.exporter.stats()}
+
+
+class TracingMiddleware:
+    """
+    ASGI-middleware: контекст трассы из traceparent и спаны запроса по этапам RequestTimer.
+
+    Ставится внутри MetricsMiddleware и использует его RequestTimer; без метрик заводит свой
+    (тогда этап serialization отмечает сам).
+
+    Args:
+        app: ASGI-приложение.
+        tracer (Tracer): Выборка и экспорт спанов.
+    """
+
+    def __init__(self, app, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                header = value.decode("latin-1")
+                break
+        parent = self.tracer.start(header)
+        if parent is None:
+            await self.app(scope, receive, send)
+            return
+
+        timer = _current_timer.get()
+        token = None
+        if timer is None:
+            timer = RequestTimer()
+            token = _current_timer.set(timer)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if token is not None:
+                    timer.stage("serialization")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                _current_timer.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            self.tracer.record_request(parent, timer, scope["method"], route, status)
+
+
+# === Локальный сборщик и отчёт ===
+
+def collect(port, out):
+    """HTTP-сборщик вместо коллектора: принимает POST с JSON-массивом спанов и дописывает их в out."""
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                spans = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with lock, open(out, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(span, ensure_ascii=False) + "\n" for span in spans))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"📡 Сборщик спанов: http://127.0.0.1:{port} → {out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def load_spans(paths):
+    """Спаны из файлов JSON Lines (API, бот, сборщик) одним списком."""
+    spans = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8") as f:
+                spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+
+def group_traces(spans):
+    """{trace_id: спаны трассы по времени начала}."""
+    traces = collections.defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return {trace_id: sorted(items, key=lambda span: span["start"]) for trace_id, items in traces.items()}
+
+
+def report(paths, limit=20):
+    traces = group_traces(load_spans(paths))
+    print(f"🧵 Трасс: {len(traces)}")
+    stages = collections.defaultdict(list)
+    for trace_id, spans in list(traces.items())[-limit:]:
+        by_id = {span["span_id"]: span for span in spans}
+        print(f"\n{trace_id}")
+        for span in spans:
+            depth, parent = 0, by_id.get(span["parent_id"])
+            while parent is not None:
+                depth, parent = depth + 1, by_id.get(parent["parent_id"])
+            print(f"  {'  ' * depth}{span['service']:10} {span['name']:28} {span['duration_ms']:9.2f} ms")
+    for spans in traces.values():
+        for span in spans:
+            stages[(span["service"], span["name"])].append(span["duration_ms"])
+    print(f"\n{'Сервис':10} | {'Спан':28} | {'число':>6} | {'p50':>9} | {'max':>9}")
+    for (service, name), durations in sorted(stages.items()):
+        durations.sort()
+        print(f"{service:10} | {name:28} | {len(durations):6d} | {durations[len(durations) // 2]:6.2f} ms | "
+              f"{durations[-1]:6.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный сборщик спанов и отчёт по трассам")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collector = commands.add_parser("collect", help="Принимать спаны по HTTP и дописывать в файл")
+    collector.add_argument("--port", type=int, default=4318)
+    collector.add_argument("--out", default="traces.jsonl")
+    reporter = commands.add_parser("report", help="Трассы из файлов спанов бота и API")
+    reporter.add_argument("paths", nargs="+", help="Файлы JSON Lines (можно шаблоном)")
+    reporter.add_argument("--limit", type=int, default=20, help="Сколько последних трасс показать")
+    args = parser.parse_args(argv)
+    if args.command == "collect":
+        collect(args.port, args.out)
+    else:
+        report(args.paths, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+import argparse
+import json
+import os
+import numpy as np
+
+# === Компиляция ансамблей деревьев в плоские массивы NumPy ===
+#
+# Все деревья ансамбля упаковываются в общие массивы узлов (признак, порог,
+# левый/правый потомок, значения листьев). Предсказание выполняется одним
+# векторизованным обходом сразу по всем деревьям и всем строкам, без
+# python-диспетчеризации по отдельным эстиматорам и без joblib.
+#
+# Скомпилированный ансамбль сохраняется каталогом из .npy-файлов (по файлу на массив)
+# и meta.json. Такой артефакт открывается через mmap за миллисекунды и не требует
+# импорта sklearn/joblib — это быстрый холодный старт API.
+
+# Массивы, которые сохраняются в артефакт; default_left, tree_class и node_value есть только у boosting
+ARTIFACT_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "default_left", "tree_class",
+                   "children", "is_leaf", "node_value")
+
+
+class CompiledForest:
+    """
+    Скомпилированный ансамбль деревьев (RandomForestClassifier или XGBClassifier).
+
+    Повторяет интерфейс sklearn-классификатора, которым пользуется API:
+    predict, predict_proba и classes_.
+
+    Args:
+        kind (str): "forest" — усреднение вероятностей (RandomForest),
+            "boosting" — сумма отступов + softmax (XGBoost multi:softprob).
+        feature (np.array): Индекс признака для каждого узла (int32).
+        threshold (np.array): Порог разбиения для каждого узла (float32).
+        left (np.array): Индекс левого потомка; у листа указывает сам на себя.
+        right (np.array): Индекс правого потомка; у листа указывает сам на себя.
+        value (np.array): Для forest — нормированные вероятности классов (n_nodes, n_classes),
+            для boosting — значение листа (n_nodes,).
+        roots (np.array): Индекс корня каждого дерева.
+        max_depth (int): Максимальная глубина дерева в ансамбле.
+        classes (np.array): Метки классов в порядке столбцов predict_proba.
+        default_left (np.array, optional): Куда идти при NaN (только boosting).
+        tree_class (np.array, optional): Класс, к отступу которого относится дерево (только boosting).
+        base_score (float, optional): Начальный отступ (только boosting).
+        children (np.array, optional): Упакованные потомки (см. ниже); считаются, если не заданы.
+        is_leaf (np.array, optional): Маска листьев; считается, если не задана.
+        node_value (np.array, optional): Для boosting — значение каждого узла, включая внутренние
+            (среднее листьев поддерева, взвешенное по cover); нужно для explain.
+            У forest значения внутренних узлов уже лежат в value.
+    """
+
+    def __init__(self, kind, feature, threshold, left, right, value, roots, max_depth, classes,
+                 default_left=None, tree_class=None, base_score=0.0, children=None, is_leaf=None,
+                 node_value=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.default_left = default_left
+        self.tree_class = tree_class
+        self.base_score = base_score
+        self.node_value = node_value
+        # Версия исходной модели, если ансамбль открыт из артефакта (см. save/load)
+        self.model_version = None
+
+        # Потомки упакованы парами [right, left]: следующий узел = children[2 * node + go_left]
+        self.children = np.stack([right, left], axis=1).ravel() if children is None else children
+        self.is_leaf = left == np.arange(len(left), dtype=left.dtype) if is_leaf is None else is_leaf
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def save(self, path, model_version=None):
+        """
+        Сохраняет ансамбль каталогом: по .npy на массив + meta.json.
+
+        Args:
+            path (str): Каталог артефакта (например, models/RandomForest_Sleep.compiled).
+            model_version (str, optional): Версия исходной модели — API отдаёт её как model_version,
+                поэтому кэш и таблица ответов совпадают с нативной моделью.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = []
+        for name in ARTIFACT_ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(array))
+                arrays.append(name)
+
+        meta = {
+            "kind": self.kind,
+            "max_depth": self.max_depth,
+            "classes": self.classes_.tolist(),
+            "base_score": float(self.base_score),
+            "model_version": model_version,
+            "arrays": arrays,
+        }
+        # meta.json пишется последним: по нему наблюдатель модели видит, что артефакт готов
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Открывает артефакт из save(); массивы отображаются в память без копирования."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        # view(np.ndarray): данные остаются отображёнными, но результаты вычислений — обычные массивы
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode).view(np.ndarray)
+                  for name in meta["arrays"]}
+
+        forest = cls(meta["kind"], max_depth=meta["max_depth"], classes=meta["classes"],
+                     base_score=np.float32(meta["base_score"]), **arrays)
+        forest.model_version = meta["model_version"]
+        return forest
+
+    def apply(self, X):
+        """Возвращает индексы листьев формы (n_trees, n_rows) для каждой строки X."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Ожидается 2D массив признаков, получено: {X.ndim}D")
+
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        node = np.repeat(self.roots, n_rows)
+        offsets = np.tile(np.arange(n_rows, dtype=np.int32) * n_features, self.n_trees)
+
+        # Обход по уровням только для пар (дерево, строка), ещё не дошедших до листа:
+        # большинство путей заканчивается задолго до max_depth
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            x = flat[self.feature[current] + offsets[active]]
+            if self.kind == "forest":
+                go_left = x <= self.threshold[current]
+            else:
+                # XGBoost: x < threshold, пропуски идут по default_left
+                go_left = x < self.threshold[current]
+                missing = np.isnan(x)
+                if missing.any():
+                    go_left = np.where(missing, self.default_left[current], go_left)
+            current = self.children[2 * current + go_left]
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+
+        return node.reshape(self.n_trees, n_rows)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+
+        if self.kind == "forest":
+            # Суммирование по деревьям в том же порядке, что и у sklearn (последовательно
+            # от первого эстиматора к последнему), затем деление на число деревьев.
+            # Накопление по одному дереву: в памяти только (n_rows, n_classes), а не
+            # (n_trees, n_rows, n_classes), и порядок сложения тот же, что у sklearn
+            proba = self.value[leaves[0]].copy()
+            for tree_leaves in leaves[1:]:
+                proba += self.value[tree_leaves]
+            proba /= self.n_trees
+            return proba
+
+        # Как и XGBoost, отступ каждого класса накапливается во float32 начиная с base_score,
+        # деревья добавляются в порядке бустинга
+        n_classes = len(self.classes_)
+        n_rows = leaves.shape[1]
+        margin = np.full((n_rows, n_classes), self.base_score, dtype=np.float32)
+        for tree_leaves, k in zip(leaves, self.tree_class):
+            margin[:, k] += self.value[tree_leaves]
+
+        # Softmax в том же виде, что и в XGBoost: exp округляется до float32,
+        # а сумма экспонент накапливается в double
+        margin -= margin.max(axis=1, keepdims=True)
+        exps = np.exp(margin.astype(np.float64)).astype(np.float32)
+        total = np.zeros(n_rows, dtype=np.float64)
+        for k in range(n_classes):
+            total += exps[:, k]
+        exps /= total.astype(np.float32)[:, np.newaxis]
+        return exps
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+    def explain(self, X):
+        """
+        Вклад каждого признака в предсказание по путям в деревьях (метод Saabas).
+
+        На каждом шаге от корня к листу изменение значения узла (value потомка минус value
+        родителя) приписывается признаку, по которому шло разбиение. Значения всех узлов
+        посчитаны заранее, поэтому объяснение — тот же обход, что и в apply, плюс одно
+        накопление на уровень.
+
+        Returns:
+            bias (n_rows, n_classes) и contributions (n_rows, n_features, n_classes);
+            bias + contributions.sum(axis=1) точно раскладывает предсказание:
+            для forest — вероятности predict_proba, для boosting — отступы до softmax.
+        """
+        if self.kind == "forest":
+            values = self.value
+        elif self.node_value is not None:
+            values = self.node_value.astype(np.float64)
+        else:
+            raise ValueError("В артефакте нет значений внутренних узлов — перекомпилируйте модель")
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        n_classes = len(self.classes_)
+        flat = X.ravel()
+        node = np.repeat(self.roots, n_rows)
+        row = np.tile(np.arange(n_rows, dtype=np.int64), self.n_trees)
+        contributions = np.zeros(n_rows * n_features * n_classes)
+
+        if self.kind == "forest":
+            bias = values[self.roots].sum(axis=0) / self.n_trees
+            class_offsets = np.arange(n_classes)
+        else:
+            bias = np.full(n_classes, np.float64(self.base_score))
+            np.add.at(bias, self.tree_class, values[self.roots])
+            pair_class = np.repeat(self.tree_class, n_rows)
+
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            x = flat[self.feature[current] + row[active] * n_features]
+            if self.kind == "forest":
+                go_left = x <= self.threshold[current]
+            else:
+                go_left = x < self.threshold[current]
+                missing = np.isnan(x)
+                if missing.any():
+                    go_left = np.where(missing, self.default_left[current], go_left)
+            following = self.children[2 * current + go_left]
+
+            # Ячейка (строка, признак, класс) в плоском массиве вкладов
+            cell = (row[active] * n_features + self.feature[current]) * n_classes
+            delta = values[following] - values[current]
+            if self.kind == "forest":
+                contributions += np.bincount((cell[:, np.newaxis] + class_offsets).ravel(), weights=delta.ravel(),
+                                             minlength=contributions.size)
+            else:
+                contributions += np.bincount(cell + pair_class[active], weights=delta, minlength=contributions.size)
+
+            node[active] = following
+            active = active[~self.is_leaf[following]]
+
+        contributions = contributions.reshape(n_rows, n_features, n_classes)
+        if self.kind == "forest":
+            contributions /= self.n_trees
+        return np.tile(bias, (n_rows, 1)), contributions
+
+
+def _unwrap(model):
+    """Достаёт финальный эстиматор из Pipeline; шаги предобработки не поддерживаются."""
+    if hasattr(model, "steps"):
+        if len(model.steps) != 1:
+            raise ValueError(
+                f"Компиляция поддерживает только Pipeline из одного шага, получено шагов: {len(model.steps)}"
+            )
+        return model.steps[-1][1]
+    return model
+
+
+def _float32_floor(threshold):
+    """
+    Переводит float64-пороги sklearn во float32 с округлением вниз.
+
+    sklearn сравнивает float32-признак с float64-порогом (x <= t). Для любого float32 x
+    это эквивалентно x <= floor32(t), поэтому обход можно вести целиком во float32.
+    """
+    rounded = threshold.astype(np.float32)
+    too_big = rounded.astype(np.float64) > threshold
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def _compile_sklearn_forest(forest):
+    if forest.n_outputs_ != 1:
+        raise ValueError("Компиляция поддерживает только одно выходное значение (n_outputs_ == 1)")
+
+    n_classes = int(forest.n_classes_)
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(n)
+
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(_float32_floor(tree.threshold))
+        left.append(np.where(is_leaf, own, tree.children_left) + offset)
+        right.append(np.where(is_leaf, own, tree.children_right) + offset)
+
+        # Начиная с sklearn 1.4 tree_.value у классификатора уже хранит доли классов,
+        # и DecisionTreeClassifier.predict_proba возвращает их без перенормировки
+        value.append(tree.value[:, 0, :n_classes])
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return CompiledForest(
+        kind="forest",
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        classes=forest.classes_,
+    )
+
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int32)
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def _subtree_means(left, right, leaf_value, cover):
+    """
+    Значение каждого узла дерева XGBoost: среднее листьев поддерева, взвешенное по cover (sum_hessian).
+    Потомки в дереве XGBoost нумеруются после родителя, поэтому достаточно одного прохода с конца.
+    """
+    value = np.asarray(leaf_value, dtype=np.float64).copy()
+    cover = np.asarray(cover, dtype=np.float64)
+    for node in range(len(left) - 1, -1, -1):
+        if left[node] != -1:
+            l, r = left[node], right[node]
+            value[node] = (cover[l] * value[l] + cover[r] * value[r]) / (cover[l] + cover[r])
+    return value
+
+
+def _compile_xgboost(booster_model):
+    booster = booster_model.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective != "multi:softprob":
+        raise ValueError(f"Компиляция XGBoost поддерживает только multi:softprob, получено: {objective}")
+
+    gbtree = learner["gradient_booster"]
+    if gbtree.get("name") != "gbtree":
+        raise ValueError(f"Компиляция поддерживает только бустер gbtree, получено: {gbtree.get('name')}")
+
+    # Начиная с XGBoost 3.0 base_score хранится списком ("[5E-1]"), раньше — числом ("5E-1");
+    # у multi:softprob он один на все классы
+    base_score = learner["learner_model_param"]["base_score"]
+    base_score = json.loads(base_score) if base_score.startswith("[") else [float(base_score)]
+    if len(base_score) != 1:
+        raise ValueError(f"Ожидается один base_score, получено: {len(base_score)}")
+    base_score = float(base_score[0])
+    trees = gbtree["model"]["trees"]
+
+    feature, threshold, left, right, value, default_left, roots, node_value = [], [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for tree in trees:
+        if tree["categories_nodes"]:
+            raise ValueError("Категориальные разбиения XGBoost не поддерживаются")
+
+        tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+        tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+        is_leaf = tree_left == -1
+        own = np.arange(len(tree_left))
+
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+        # У листьев split_conditions хранит значение листа
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        threshold.append(conditions)
+        value.append(np.where(is_leaf, conditions, np.float32(0.0)))
+        node_value.append(_subtree_means(tree_left, tree_right, value[-1], tree["sum_hessian"]))
+        left.append(np.where(is_leaf, own, tree_left) + offset)
+        right.append(np.where(is_leaf, own, tree_right) + offset)
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+
+        roots.append(offset)
+        max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+        offset += len(tree_left)
+
+    return CompiledForest(
+        kind="boosting",
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float32),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value).astype(np.float32),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        classes=booster_model.classes_,
+        default_left=np.concatenate(default_left),
+        tree_class=np.asarray(gbtree["model"]["tree_info"], dtype=np.int32),
+        base_score=np.float32(base_score),
+        node_value=np.concatenate(node_value),
+    )
+
+
+def compile_model(model):
+    """
+    Компилирует загруженную модель (Pipeline или голый эстиматор) в CompiledForest.
+
+    Поддерживаются RandomForestClassifier и XGBClassifier (multi:softprob).
+    Для остальных моделей выбрасывается ValueError — в этом случае API остаётся
+    на нативном пути sklearn.
+    """
+    if isinstance(model, CompiledForest):
+        return model
+
+    estimator = _unwrap(model)
+
+    if hasattr(estimator, "estimators_") and hasattr(estimator.estimators_[0], "tree_"):
+        return _compile_sklearn_forest(estimator)
+    if hasattr(estimator, "get_booster"):
+        return _compile_xgboost(estimator)
+
+    raise ValueError(f"Компиляция не поддерживается для модели типа {type(estimator).__name__}")
+
+
+def main():
+    import joblib
+    from serving.model_store import file_version
+
+    parser = argparse.ArgumentParser(description="Сборка скомпилированного артефакта модели для быстрого старта API")
+    parser.add_argument("--model", required=True, help="Путь к .pkl модели")
+    parser.add_argument("--out", help="Каталог артефакта (по умолчанию рядом с моделью, расширение .compiled)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.splitext(args.model)[0] + ".compiled"
+    forest = compile_model(joblib.load(args.model))
+    forest.save(out, model_version=file_version(args.model))
+    print(f"💾 Артефакт сохранён: {out} ({forest.n_trees} деревьев, {forest.n_nodes} узлов)")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,9 @@ PROCESSED_DATA_PATH_WITH_COLLINEARITY_FOR_XG_RF_NO_REM = os.path.join(BASE_DIR,
                                                                                    "/Sleep_Efficiency_clear_yes_collinearity_forXG_RF_NO_REM.csv")
 PROCESSED_DATA_PATH_NO_COLLINEARITY_NO_REM = os.path.join(BASE_DIR, "Data/processed_data"
                                                                  "/Sleep_Efficiency_clear_no_collinearity_NO_REM.csv")
+# Сервис API: его модулем serving.introspection меряется память модели при регистрации
+API_DIR = os.path.join(BASE_DIR, "Fast_Api")
+
 # Папки для графиков
 FIGURES_DIR = os.path.join(REPORTS_DIR, "figures")
 ROC_DIR = os.path.join(FIGURES_DIR, "roc_auc")
@@ -27,6 +30,18 @@ CONF_MATRIX_DIR = os.path.join(FIGURES_DIR, "conf_matrix")
 RANDOM_STATE = 42
 TEST_SIZE = 0.1
 VALIDATION_SIZE = 0.2
+# Тип матриц признаков из load_data и при обучении: float64 или float32.
+# Деревья sklearn и XGBoost и так обучаются и предсказывают во float32 — с ним нет копии-преобразования
+# и вдвое меньше памяти на данные; модели деревьев получаются те же, у моделей со StandardScaler
+# (LogisticRegression, KNN, GaussianNB) вероятности расходятся не больше чем на 1e-5
+DATA_DTYPE = os.getenv("DATA_DTYPE", "float64")
+if DATA_DTYPE not in ("float32", "float64"):
+    raise ValueError(f"DATA_DTYPE должен быть float32 или float64, получено: {DATA_DTYPE}")
+
+# Сжатие леса после обучения (experiments/compression_experiment.py): допустимое падение accuracy
+# на валидации относительно исходной модели и необязательный бюджет задержки на строку, мс
+COMPRESSION_ACCURACY_TOLERANCE = 0.02
+COMPRESSION_LATENCY_BUDGET_MS = None
 
 # Настройки логирования MLflow
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "None")
@@ -1,5 +1,6 @@
 import time
 import numpy as np
+import pandas as pd
 import mlflow
 import mlflow.sklearn
 import os
@@ -14,12 +15,16 @@ from mlflow.tracking import MlflowClient
 
 # Импорты для визуализации
 from ml_experiments.utils.visualization import save_confusion_matrix, save_roc_curve, save_precision_recall_curve
+from ml_experiments.utils.data_processing import get_feature_names
+from ml_experiments.utils.model_memory import log_model_memory
+from ml_experiments.config.experiment_config import DATA_DTYPE
 
 
 def run_experiment(model_name, model_class, run_name,
                    grid_param, x_tr, y_tr, x_vl, y_vl, x_te, y_te,
                    scaler=False, mix=False, register_model=True,
-                   model_registry_name=None, refit_metric='f1_weighted', average="weighted"):
+                   model_registry_name=None, refit_metric='f1_weighted', average="weighted", feature_names=None,
+                   dtype=DATA_DTYPE):
     """
     Запускает эксперимент с машинным обучением и версионированием модели
 
@@ -45,7 +50,13 @@ def run_experiment(model_name, model_class, run_name,
         - 'weighted': усреднение с учётом количества примеров каждого класса
         - 'micro': глобальное усреднение по всем примерам
         Рекомендуется 'weighted' при наличии дисбаланса классов.
+        feature_names (list, optional): Имена столбцов x_* для сигнатуры модели.
+        По умолчанию — столбцы датасета из load_data. API сверяет с ними порядок признаков.
+        dtype (str, optional): Тип матриц признаков при обучении и оценке: float64 или float32
+        (по умолчанию DATA_DTYPE). Матрицы из load_data того же типа не копируются.
     """
+    # np.asarray не копирует матрицу, если тип уже совпадает
+    x_tr, x_vl, x_te = (np.asarray(x, dtype=dtype) for x in (x_tr, x_vl, x_te))
 
     with mlflow.start_run(run_name=run_name):
 
@@ -56,6 +67,7 @@ def run_experiment(model_name, model_class, run_name,
         mlflow.log_param("train_size", len(x_tr))
         mlflow.log_param("valid_size", len(x_vl))
         mlflow.log_param("test_size", len(x_te))
+        mlflow.log_param("dtype", x_tr.dtype.name)
 
         steps = []
         if scaler:
@@ -132,13 +144,18 @@ def run_experiment(model_name, model_class, run_name,
         save_roc_curve(y_te, y_test_prob, run_name, "test")
         save_precision_recall_curve(y_te, y_test_prob, run_name, "test")
 
-        # Сохраняем модель как артефакт
-        signature = infer_signature(x_tr, last_model.predict(x_tr))
+        # Сохраняем модель как артефакт.
+        # Сигнатура со столбцами по именам (а не безымянный тензор): по ней API проверяет
+        # порядок признаков при загрузке модели и в бинарном формате запросов
+        if feature_names is None:
+            feature_names = get_feature_names()
+        input_example = pd.DataFrame(x_tr, columns=feature_names)
+        signature = infer_signature(input_example, last_model.predict(x_tr))
         mlflow.sklearn.log_model(
             sk_model=last_model,
             name="model",
             signature=signature,
-            input_example=x_tr[:5],
+            input_example=input_example.iloc[:5],
         )
 
         # === ВЕРСИОНИРОВАНИЕ МОДЕЛИ ===
@@ -151,6 +168,18 @@ def run_experiment(model_name, model_class, run_name,
                 if model_registry_name is None:
                     model_registry_name = f"{model_name}_LungCancer"
 
+                # Память модели в процессе API: по ней подбирается размер контейнера
+                # и сравниваются версии. Ошибка замера не мешает регистрации
+                memory_tags = {}
+                try:
+                    memory = log_model_memory(last_model)
+                    if memory.get("deserialized_bytes") is not None:
+                        memory_tags["model_memory_mb"] = f"{memory['deserialized_bytes'] / 1e6:.2f}"
+                    if memory.get("nodes") is not None:
+                        memory_tags["model_nodes"] = str(memory["nodes"])
+                except Exception as e:
+                    print(f"⚠️ Не удалось замерить память модели: {e}")
+
                 # Регистрируем модель в Model Registry
                 f1_value = float(metrics_test['f1_score_test'])
                 roc_value = float(metrics_test['roc_auc_test'])
@@ -166,7 +195,8 @@ def run_experiment(model_name, model_class, run_name,
                         "training_strategy": "train+valid" if mix else "train_only",
                         "f1_score_test": f"{f1_value:.4f}",
                         "roc_auc_test": f"{roc_value:.4f}",
-                        "model_stage": "Staging"
+                        "model_stage": "Staging",
+                        **memory_tags
                     }
                 )
 
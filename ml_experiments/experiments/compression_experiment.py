@@ -0,0 +1,107 @@
+import time
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+from mlflow.models import infer_signature
+from sklearn.metrics import accuracy_score, f1_score
+
+from ml_experiments.config.experiment_config import COMPRESSION_ACCURACY_TOLERANCE, COMPRESSION_LATENCY_BUDGET_MS
+from ml_experiments.report_manager.model_registry import load_model_version
+from ml_experiments.utils.data_processing import get_feature_names
+from ml_experiments.utils.compression import (compression_candidates, select_compressed, model_size_bytes,
+                                              load_seconds, latency_ms_per_row)
+
+
+def _serving_metrics(model, x_vl, y_vl, x_te, y_te, average):
+    """Качество и стоимость обслуживания модели: то, что сравнивается у исходной и сжатой."""
+    return {
+        "accuracy_valid": accuracy_score(y_vl, model.predict(x_vl)),
+        "accuracy_test": accuracy_score(y_te, model.predict(x_te)),
+        "f1_score_test": f1_score(y_te, model.predict(x_te), average=average),
+        "size_bytes": model_size_bytes(model),
+        "load_seconds": load_seconds(model),
+        "latency_ms_per_row": latency_ms_per_row(model, x_te),
+    }
+
+
+def compress_registered_model(model_registry_name, version, x_tr, y_tr, x_vl, y_vl, x_te, y_te,
+                              tolerance=COMPRESSION_ACCURACY_TOLERANCE, latency_budget_ms=COMPRESSION_LATENCY_BUDGET_MS,
+                              average="macro", feature_names=None):
+    """
+    Сжимает зарегистрированный случайный лес и логирует результат отдельным запуском MLflow.
+
+    Кандидаты — подмножества деревьев, леса меньшей глубины и дистиллированные ученики
+    (см. utils/compression.py). Выбирается самый маленький кандидат, чья accuracy на валидации
+    не ниже, чем у исходной модели, минус tolerance (и, если задан, укладывающийся в бюджет задержки).
+    Сжатая модель логируется артефактом compressed_model; рядом — f1_score_test, размер, время загрузки
+    и задержка на строку для неё и для исходной модели (метрики с суффиксом _original).
+
+    Args:
+        model_registry_name (str): Имя модели в реестре.
+        version (str): Версия, которую нужно сжать. Лучше брать версию, обученную без train+valid:
+            иначе валидация уже видена моделью и допуск отсчитывается от завышенной точности.
+        x_tr, y_tr, x_vl, y_vl, x_te, y_te (np.array): Разбиение из load_data.
+        tolerance (float): Допустимое падение accuracy на валидации.
+        latency_budget_ms (float, optional): Бюджет задержки predict_proba на одну строку, мс.
+        average (str): Усреднение f1 для многоклассовой задачи.
+        feature_names (list, optional): Имена столбцов для сигнатуры. По умолчанию — столбцы датасета.
+
+    Returns:
+        (сжатая модель или None, метрики сжатой модели, метрики исходной модели)
+    """
+    model = load_model_version(model_registry_name, version=version)
+    if model is None:
+        raise ValueError(f"Не удалось загрузить {model_registry_name} версии {version}")
+
+    run_name = f"{model_registry_name}_v{version}_compressed"
+    with mlflow.start_run(run_name=run_name):
+        mlflow.log_param("source_model", model_registry_name)
+        mlflow.log_param("source_version", version)
+        mlflow.log_param("accuracy_tolerance", tolerance)
+        mlflow.log_param("latency_budget_ms", latency_budget_ms)
+        mlflow.log_param("timestamp", time.strftime("%Y-%m-%d %H:%M:%S"))
+
+        original = _serving_metrics(model, x_vl, y_vl, x_te, y_te, average)
+        mlflow.log_metrics({f"{name}_original": value for name, value in original.items()})
+
+        started = time.perf_counter()
+        candidates = compression_candidates(model, x_tr, y_tr, x_vl, y_vl)
+        chosen = select_compressed(candidates, original["accuracy_valid"], tolerance, latency_budget_ms, x_te)
+        mlflow.log_metric("compression_seconds", time.perf_counter() - started)
+
+        table = pd.DataFrame([{key: value for key, value in c.items() if key != "model"} for c in candidates])
+        mlflow.log_text(table.sort_values("size_bytes").to_csv(index=False), "compression_candidates.csv")
+        print(f"🗜️ Кандидатов сжатия: {len(candidates)}, исходная accuracy на валидации "
+              f"{original['accuracy_valid']:.4f}, допуск {tolerance}")
+
+        if chosen is None:
+            mlflow.set_tag("compression", "no_candidate")
+            print("⚠️ Ни один кандидат не уложился в допуск точности и бюджет задержки")
+            return None, None, original
+
+        compressed = chosen["model"]
+        metrics = _serving_metrics(compressed, x_vl, y_vl, x_te, y_te, average)
+        mlflow.log_metrics(metrics)
+        mlflow.log_metric("size_ratio", original["size_bytes"] / metrics["size_bytes"])
+        mlflow.log_metric("latency_speedup", original["latency_ms_per_row"] / metrics["latency_ms_per_row"])
+        mlflow.log_param("method", chosen["method"])
+        mlflow.log_param("n_estimators", chosen["n_estimators"])
+        mlflow.log_param("max_depth", chosen["max_depth"])
+        mlflow.set_tag("compression", chosen["method"])
+
+        # Отдельный артефакт с той же сигнатурой по именам признаков, что и у исходной модели
+        if feature_names is None:
+            feature_names = get_feature_names()
+        input_example = pd.DataFrame(x_tr, columns=feature_names)
+        mlflow.sklearn.log_model(
+            sk_model=compressed,
+            name="compressed_model",
+            signature=infer_signature(input_example, compressed.predict(x_tr)),
+            input_example=input_example.iloc[:5],
+        )
+
+        print(f"✅ Сжатая модель: {chosen['method']}, деревьев {chosen['n_estimators']}, глубина {chosen['max_depth']}")
+        print(f"   Размер: {original['size_bytes'] / 1e6:.2f} MB → {metrics['size_bytes'] / 1e6:.3f} MB; "
+              f"задержка на строку: {original['latency_ms_per_row']:.2f} → {metrics['latency_ms_per_row']:.2f} мс")
+        print(f"   F1 (test): {original['f1_score_test']:.4f} → {metrics['f1_score_test']:.4f}")
+        return compressed, metrics, original
@@ -6,7 +6,7 @@ from collections import defaultdict
 # === ФУНКЦИИ ДЛЯ УПРАВЛЕНИЯ ВЕРСИЯМИ МОДЕЛЕЙ ===
 
 
-def load_model_version(model_name, version=None, stage=None):
+def load_model_version(model_name, version=None, stage=None, alias=None):
     """
     Загружает конкретную версию модели из Model Registry
 
@@ -14,11 +14,15 @@ def load_model_version(model_name, version=None, stage=None):
         model_name: Имя модели в реестре
         version: Номер версии (например, "1", "2")
         stage: Стадия модели ("Staging", "Production", "Archived")
+        alias: Алиас версии (например, "staging", см. auto_stage_best_model)
     """
     try:
         if version:
             model_uri = f"models:/{model_name}/{version}"
             print(f"Загружаем модель {model_name} версии {version}")
+        elif alias:
+            model_uri = f"models:/{model_name}@{alias}"
+            print(f"Загружаем модель {model_name} по алиасу {alias}")
         elif stage:
             model_uri = f"models:/{model_name}/{stage}"
             print(f"Загружаем модель {model_name} со стадии {stage}")
@@ -35,6 +39,48 @@ def load_model_version(model_name, version=None, stage=None):
         return None
 
 
+def resolve_model_version(model_name, version=None, stage=None, alias=None):
+    """
+    Возвращает номер версии, на которую сейчас указывают version / alias / stage.
+
+    Нужен, чтобы загрузить именно ту версию, которую увидели при проверке: алиас
+    может переехать на другую версию между проверкой и загрузкой.
+
+    Args:
+        model_name: Имя модели в реестре
+        version: Номер версии — возвращается как есть
+        stage: Стадия модели ("Staging", "Production", "Archived")
+        alias: Алиас версии
+    """
+    if version:
+        return str(version)
+
+    client = MlflowClient()
+    if alias:
+        return str(client.get_model_version_by_alias(model_name, alias).version)
+    if stage:
+        versions = client.get_latest_versions(model_name, stages=[stage])
+    else:
+        versions = client.search_model_versions(f"name='{model_name}'")
+    if not versions:
+        raise ValueError(f"В реестре нет версий модели {model_name}")
+    return str(max(int(v.version) for v in versions))
+
+
+def get_model_input_names(model_name, version):
+    """
+    Имена входных столбцов из сигнатуры, залогированной вместе с версией модели.
+
+    Returns:
+        list[str] в порядке столбцов сигнатуры или None, если сигнатуры нет
+        или вход описан тензором без имён.
+    """
+    signature = mlflow.models.get_model_info(f"models:/{model_name}/{version}").signature
+    if signature is None or not signature.inputs.has_input_names():
+        return None
+    return signature.inputs.input_names()
+
+
 def list_model_versions(model_name, sort_by="f1_score_test", descending=True):
     """Показывает все версии модели, отсортированные по заданному полю."""
     try:
@@ -5,13 +5,14 @@ env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(env_path)
 MLFLOW_EXPERIMENT_NAME = os.getenv("MLFLOW_EXPERIMENT_NAME")
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
-from ml_experiments.config.experiment_config import MLFLOW_EXPERIMENT_NAME, MLFLOW_TRACKING_URI
+from ml_experiments.config.experiment_config import MLFLOW_EXPERIMENT_NAME, MLFLOW_TRACKING_URI, MLFLOW_MODEL_NAME
 from ml_experiments.utils.mlflow_setup import setup_mlflow
 from ml_experiments.models.LogisticRegression import logistic_regression_experiment
 from ml_experiments.models.KNN import knn_experiment
 from ml_experiments.models.naive_bayes import naive_bayes_experiment
 from ml_experiments.models.xgboost import xgboost_experiment
 from ml_experiments.models.random_forest import random_forest_experiment
+from ml_experiments.experiments.compression_experiment import compress_registered_model
 from ml_experiments.utils.data_processing import load_data
 
 
@@ -38,6 +39,12 @@ def main():
     RF = random_forest_experiment(x_train, y_train, x_valid, y_valid, x_test, y_test,
                                   oversample=use_oversample)
 
+    # TODO: Сжатие леса для API: берём версию без train+valid, чтобы допуск считался по невиданной валидации
+    rf_versions = RF.loc[~RF["mix"], "model_version"].dropna()
+    if not rf_versions.empty:
+        compress_registered_model(f"RandomForest_{MLFLOW_MODEL_NAME}", rf_versions.iloc[0],
+                                  x_train, y_train, x_valid, y_valid, x_test, y_test)
+
 
 if __name__ == "__main__":
     main()
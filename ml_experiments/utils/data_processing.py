@@ -16,13 +16,26 @@ from ml_experiments.config.experiment_config import (
     RANDOM_STATE,
     TEST_SIZE,
     VALIDATION_SIZE,
-    MLFLOW_MODEL_NAME
+    MLFLOW_MODEL_NAME,
+    DATA_DTYPE
 )
 from ml_experiments.utils.preprocessing import oversample_dataset
 from ml_experiments.report_manager.model_registry import load_model_version
 
 
-def load_data(oversample=False, samples=10, save_test_samples=False):
+def get_feature_names():
+    """Имена признаков в порядке столбцов матриц, которые возвращает load_data."""
+    columns = pd.read_csv(PROCESSED_DATA_PATH_WITH_COLLINEARITY_FOR_XG_RF_NO_REM, nrows=0).columns
+    return [column for column in columns if column != "sleep_efficiency_label"]
+
+
+def load_data(oversample=False, samples=10, save_test_samples=False, dtype=DATA_DTYPE):
+    """
+    Разбиение обработанного датасета на train/valid/test (стратифицированно, RANDOM_STATE).
+
+    dtype — тип матриц признаков (float64 или float32, по умолчанию DATA_DTYPE): матрицы сразу
+    создаются этого типа, без промежуточной float64-копии.
+    """
     df = pd.read_csv(PROCESSED_DATA_PATH_WITH_COLLINEARITY_FOR_XG_RF_NO_REM)
 
     # X = df.drop(columns=["sleep_efficiency_label"])
@@ -54,11 +67,11 @@ def load_data(oversample=False, samples=10, save_test_samples=False):
     )
 
     # Разделяем признаки и метки
-    x_train = train_df.drop("sleep_efficiency_label", axis=1).values
+    x_train = train_df.drop("sleep_efficiency_label", axis=1).to_numpy(dtype=dtype)
     y_train = train_df["sleep_efficiency_label"].values
-    x_valid = valid_df.drop("sleep_efficiency_label", axis=1).values
+    x_valid = valid_df.drop("sleep_efficiency_label", axis=1).to_numpy(dtype=dtype)
     y_valid = valid_df["sleep_efficiency_label"].values
-    x_test = test_df.drop("sleep_efficiency_label", axis=1).values
+    x_test = test_df.drop("sleep_efficiency_label", axis=1).to_numpy(dtype=dtype)
     y_test = test_df["sleep_efficiency_label"].values
 
     # Oversampling
@@ -71,7 +84,9 @@ def load_data(oversample=False, samples=10, save_test_samples=False):
 
         # Сохраняем features
         features = [
-            dict(zip(feature_names, x_test[i]))
+            # str у np.float32 — кратчайшая запись того же числа: в JSON попадает 0.1,
+            # а не 0.10000000149011612, как после tolist
+            dict(zip(feature_names, (float(str(value)) for value in x_test[i])))
             for i in range(min(n_samples, len(x_test)))
         ]
 
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import joblib
+import mlflow
+import pandas as pd
+from ml_experiments.config.experiment_config import API_DIR
+
+# === Память модели при регистрации ===
+#
+# Модель сохраняется так же, как её получает API (joblib), и открывается в отдельном процессе
+# модулем сервиса serving.introspection: RSS до и после загрузки — как у контейнера API при старте,
+# без библиотек и данных, уже загруженных в процесс обучения. Отчёт логируется метриками
+# в запуск MLflow, статистика деревьев — файлом model_memory_estimators.csv.
+
+
+def measure_model_memory(model, api_dir=API_DIR):
+    """Отчёт serving.introspection для модели (dict), загруженной в новом процессе из папки API."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.pkl")
+        joblib.dump(model, path)
+        out = subprocess.run([sys.executable, "-m", "serving.introspection", "--model", path, "--json",
+                              "--estimators"], cwd=api_dir, capture_output=True, text=True, check=True)
+    # Последняя строка — JSON отчёта; выше может быть вывод загрузки
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def log_model_memory(model, api_dir=API_DIR):
+    """
+    Меряет память модели и логирует её в активный запуск MLflow.
+
+    Метрики: model_deserialized_bytes, model_rss_before_load_bytes, model_rss_after_load_bytes,
+    model_rss_load_delta_bytes и для ансамблей деревьев — model_n_estimators, model_nodes, model_leaves,
+    model_max_depth, model_mean_depth, model_node_bytes, model_value_bytes.
+
+    Returns:
+        dict: Отчёт serving.introspection.
+    """
+    report = measure_model_memory(model, api_dir)
+    metrics = {f"model_{key}": report[key] for key in
+               ("deserialized_bytes", "rss_before_load_bytes", "rss_after_load_bytes", "n_estimators", "nodes",
+                "leaves", "max_depth", "mean_depth", "node_bytes", "value_bytes") if report.get(key) is not None}
+    if report["rss_before_load_bytes"] is not None:
+        metrics["model_rss_load_delta_bytes"] = report["rss_after_load_bytes"] - report["rss_before_load_bytes"]
+    mlflow.log_metrics(metrics)
+    if report.get("estimators"):
+        mlflow.log_text(pd.DataFrame(report["estimators"]).rename_axis("estimator").to_csv(),
+                        "model_memory_estimators.csv")
+
+    deserialized = report["deserialized_bytes"]
+    print(f"📐 Память модели: {report['model_type']}, "
+          + (f"{deserialized / 1e6:.2f} MB" if deserialized is not None else "размер н/д")
+          + (f", деревьев {report['n_estimators']}, узлов {report['nodes']}, глубина до {report['max_depth']}"
+             if report.get("n_estimators") is not None else ""))
+    return report
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Сервис API запускается из папки Fast_Api (python run_api.py), поэтому для
+# in-process тестов добавляем её в sys.path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Fast_Api"))
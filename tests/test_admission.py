@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.admission import BULK, INTERACTIVE, AdmissionController, classify
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+
+
+def test_classify_endpoints():
+    assert classify("/predict") == classify("/models/XGBoost@3/predict") == INTERACTIVE
+    assert classify("/predict_batch") == classify("/predict_stream") == classify("/models/XGBoost/predict_batch") == BULK
+    assert classify("/metrics") is None and classify("/admin/reload") is None
+
+
+def test_queue_then_reject_when_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        assert await controller.acquire(INTERACTIVE) is None
+        queued = asyncio.create_task(controller.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        assert controller.queued() == 1
+        # Очередь заполнена — сразу 429, без ожидания
+        assert await controller.acquire(INTERACTIVE) == "queue_full"
+
+        controller.release(INTERACTIVE, 0.01)
+        assert await queued is None
+        assert controller.in_flight[INTERACTIVE] == 1 and controller.queued() == 0
+        return controller.stats()["classes"][INTERACTIVE]
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 2 and stats["shed"]["queue_full"] == 1
+
+
+def test_interactive_overtakes_bulk_and_bulk_is_capped():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue=10, queue_timeout=5, bulk_max_in_flight=1)
+        assert await controller.acquire(BULK) is None
+        # Второй пакетный запрос ждёт, хотя общее место есть: bulk занимает не больше одного
+        bulk = asyncio.create_task(controller.acquire(BULK))
+        await asyncio.sleep(0)
+        assert controller.queued(BULK) == 1
+        assert await controller.acquire(INTERACTIVE) is None
+
+        # Всё занято; interactive встаёт в очередь позже bulk, но получает место первым
+        interactive = asyncio.create_task(controller.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        controller.release(INTERACTIVE, 0.01)
+        assert await interactive is None
+        assert not bulk.done()
+
+        controller.release(BULK, 0.01)
+        assert await bulk is None
+        return controller.in_flight
+
+    assert asyncio.run(scenario()) == {INTERACTIVE: 1, BULK: 1}
+
+
+def test_queue_timeout_and_latency_estimate():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=0.05)
+        assert await controller.acquire(INTERACTIVE) is None
+        assert await controller.acquire(INTERACTIVE) == "queue_timeout"
+        assert controller.queued() == 0
+
+        # Запросы обрабатываются по секунде: ждать места дольше допустимого — отказ сразу
+        controller.release(INTERACTIVE, 1.0)
+        assert await controller.acquire(INTERACTIVE) is None
+        assert await controller.acquire(INTERACTIVE) == "latency"
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.shed[(INTERACTIVE, "queue_timeout")] == 1 and controller.shed[(INTERACTIVE, "latency")] == 1
+    assert controller.retry_after() == 1
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=5)
+        assert await controller.acquire(INTERACTIVE) is None
+        waiter = asyncio.create_task(controller.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        # Первый запрос закончен, место выдано ожидающему, но клиент ушёл до того, как он его забрал
+        controller.release(INTERACTIVE, 0.01)
+        waiter.cancel()
+        # Python 3.11 отдаёт уже выданное место (запрос допущен и сам вызовет release), новее — отменяет ожидание
+        if (await asyncio.gather(waiter, return_exceptions=True))[0] is None:
+            controller.release(INTERACTIVE)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight[INTERACTIVE] == 0 and controller.queued() == 0
+
+
+def test_blocked_event_loop_sheds_requests():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=8, max_queue=10, max_loop_lag=0.1)
+        controller.start()
+        await asyncio.sleep(0.01)
+        time.sleep(0.3)  # обработчик, занявший цикл событий
+        await asyncio.sleep(0.06)
+        lagging = await controller.acquire(INTERACTIVE), controller.loop_lag
+        # Цикл снова свободен: задержка спадает, запросы проходят
+        await asyncio.sleep(0.5)
+        recovered = await controller.acquire(INTERACTIVE)
+        await controller.stop()
+        return lagging, recovered
+
+    (reason, lag), recovered = asyncio.run(scenario())
+    assert reason == "loop_lag" and lag > 0.1
+    assert recovered is None
+
+
+def test_api_sheds_inference_but_not_service_endpoints():
+    controller = run_api.admission_controller
+    limits = controller.max_in_flight, controller.max_queue
+    controller.max_in_flight, controller.max_queue = 0, 0
+    try:
+        with TestClient(run_api.app) as client:
+            rejected = client.post("/predict", json=samples[0])
+            rejected_batch = client.post("/predict_batch", json=samples)
+            health = client.get("/healthz")
+            stats = client.get("/admission/stats").json()
+            metrics = client.get("/metrics").text
+    finally:
+        controller.max_in_flight, controller.max_queue = limits
+
+    assert rejected.status_code == rejected_batch.status_code == 429
+    assert rejected.headers["Retry-After"] == "1" and rejected.json()["reason"] == "queue_full"
+    assert health.status_code == 200
+    assert stats["classes"]["interactive"]["shed"]["queue_full"] >= 1
+    assert 'sleep_api_admission_total{priority="bulk",result="queue_full"}' in metrics
+    assert 'sleep_api_requests_total{endpoint="/predict",outcome="rejected"' in metrics
+
+    with TestClient(run_api.app) as client:
+        assert client.post("/predict", json=samples[0]).status_code == 200
+    assert controller.in_flight == {INTERACTIVE: 0, BULK: 0}
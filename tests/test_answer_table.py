@@ -0,0 +1,132 @@
+import os
+import joblib
+import numpy as np
+
+from serving.settings import MODEL_PATH
+from serving.answer_table import AnswerTable, build_answer_table, build_grid, _decode
+from serving.schema import FEATURES
+
+
+def _small_grid():
+    # Урезанный домен, чтобы сборка в тесте занимала доли секунды
+    grid = build_grid("15:75:20", "5.5:8.5:1")
+    grid["Awakenings"] = ("exact", 0, 1, 2)
+    grid["Caffeine_consumption"] = ("exact", 0, 25, 3)
+    grid["Alcohol_consumption"] = ("exact", 0, 1, 2)
+    grid["Exercise_frequency"] = ("exact", 0, 1, 2)
+    grid["bed_hour"] = ("exact", 1, 1, 3)
+    grid["wake_hour"] = ("exact", 5, 1, 3)
+    return grid
+
+
+def test_table_lookup_matches_model_on_grid(tmp_path):
+    model = joblib.load(MODEL_PATH)
+    path = os.path.join(tmp_path, "answer_table")
+    grid = _small_grid()
+    meta = build_answer_table(model, "test-version", path=path, grid=grid, agreement_samples=100)
+
+    table = AnswerTable.load(path)
+    assert table.model_version == "test-version"
+    assert len(table.table) == meta["rows"]
+
+    # Для центров корзин таблица должна отвечать ровно как модель
+    rows = _decode(np.arange(0, meta["rows"], 7), grid)
+    probs = model.predict_proba(rows)
+    for row, p in zip(rows, probs):
+        label, confidence, table_probs = table.lookup(list(row))
+        assert label == model.classes_[p.argmax()]
+        assert abs(confidence - p.max()) <= 0.0005
+        assert np.abs(table_probs - p).max() <= 0.0005 + 1e-9
+
+
+def test_out_of_domain_falls_back(tmp_path):
+    model = joblib.load(MODEL_PATH)
+    path = os.path.join(tmp_path, "answer_table")
+    build_answer_table(model, "test-version", path=path, grid=_small_grid(), agreement_samples=10)
+    table = AnswerTable.load(path)
+
+    row = dict(zip(FEATURES, [30.0, 1, 7.0, 1, 25, 0, 0, 1, 2, 6]))
+    assert table.index(list(row.values())) is not None
+
+    for feature, value in [("Caffeine_consumption", 30), ("Awakenings", 1.5), ("Age", 90.0), ("wake_hour", 12)]:
+        changed = dict(row, **{feature: value})
+        assert table.lookup(list(changed.values())) is None
+
+
+def test_center_is_the_scored_vector(tmp_path):
+    model = joblib.load(MODEL_PATH)
+    path = os.path.join(tmp_path, "answer_table")
+    build_answer_table(model, "test-version", path=path, grid=_small_grid(), agreement_samples=10)
+    table = AnswerTable.load(path)
+
+    # Age и Sleep_duration внутри корзин — запись посчитана по их серединам
+    row = dict(zip(FEATURES, [33.0, 1, 6.2, 1, 25, 0, 0, 1, 2, 6]))
+    center = dict(zip(FEATURES, table.center(list(row.values()))))
+    assert center["Age"] == 25.0 and center["Sleep_duration"] == 6.0
+    assert all(center[feature] == row[feature] for feature in FEATURES if feature not in ("Age", "Sleep_duration"))
+
+    label, confidence, _ = table.lookup(list(row.values()))
+    probs = model.predict_proba([list(center.values())])[0]
+    assert label == model.classes_[probs.argmax()] and abs(confidence - probs.max()) <= 0.0005
+
+
+def test_rows_lookup_matches_single_lookup(tmp_path):
+    model = joblib.load(MODEL_PATH)
+    path = os.path.join(tmp_path, "answer_table")
+    build_answer_table(model, "test-version", path=path, grid=_small_grid(), agreement_samples=10)
+    table = AnswerTable.load(path)
+
+    rows = _domain_rows(40) + [[30.0, 1, 7.0, 1, 30, 0, 0, 1, 2, 6], [90.0, 1, 7.0, 1, 25, 0, 0, 1, 2, 6]]
+    hit, labels, probs = table.lookup_rows(np.array(rows))
+    assert hit.tolist() == [True] * 40 + [False, False]
+    for row, label, row_probs in zip(rows, labels, probs):
+        single_label, _, single_probs = table.lookup(row)
+        assert label == single_label and np.array_equal(row_probs, single_probs)
+
+    centers = table.centers(np.array(rows))
+    assert all(list(centers[i]) == table.center(rows[i]) for i in range(40))
+    # Строки вне домена не меняются
+    assert centers[-1].tolist() == rows[-1]
+
+
+def test_api_endpoints_answer_the_same_from_table(tmp_path, monkeypatch):
+    import json
+    from fastapi.testclient import TestClient
+    import run_api
+
+    rows = [dict(zip(FEATURES, row)) for row in _domain_rows(30)]
+    with TestClient(run_api.app) as client:
+        active = run_api.store.active
+        path = os.path.join(tmp_path, "answer_table")
+        build_answer_table(active.model, active.version, path=path, grid=_small_grid(), agreement_samples=10)
+        table = AnswerTable.load(path)
+        monkeypatch.setattr(active, "answer_table", table)
+
+        single = [client.post("/predict", json=row).json() for row in rows]
+        batch = client.post("/predict_batch", json=rows).json()["predictions"]
+        stream = client.post("/predict_stream", content="".join(json.dumps(row) + "\n" for row in rows),
+                             headers={"Content-Type": "application/x-ndjson"})
+        streamed = [json.loads(line) for line in stream.text.splitlines()]
+
+    # Возраст и длительность сна не в центрах корзин: все эндпоинты отвечают по таблице
+    assert table.hits == 3 * len(rows) and table.misses == 0
+    for one, many, streamed_row in zip(single, batch, streamed):
+        assert one["sleep_efficiency_label"] == many["sleep_efficiency_label"] == streamed_row["sleep_efficiency_label"]
+        assert one["confidence"] == many["confidence"] == streamed_row["confidence"]
+
+
+def _domain_rows(n, seed=0):
+    """Строки внутри _small_grid с Age и Sleep_duration не в серединах корзин."""
+    rng = np.random.default_rng(seed)
+    grid = _small_grid()
+    rows = []
+    for _ in range(n):
+        row = []
+        for feature in FEATURES:
+            mode, start, step, count = grid[feature]
+            if mode == "bucket":
+                row.append(round(float(start + rng.uniform(0.05, count - 0.05) * step), 1))
+            else:
+                row.append(start + int(rng.integers(count)) * step)
+        rows.append(row)
+    return rows
@@ -0,0 +1,37 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from run_api import app
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_batch_matches_single(client):
+    response = client.post("/predict_batch", json=features)
+    assert response.status_code == 200
+
+    predictions = response.json()["predictions"]
+    assert len(predictions) == len(features)
+
+    # Пакетный ответ должен совпадать с поштучными вызовами /predict и идти в том же порядке
+    for sample, batch_result in zip(features, predictions):
+        single = client.post("/predict", json=sample).json()
+        assert batch_result["sleep_efficiency_label"] == single["sleep_efficiency_label"]
+        assert batch_result["sleep_quality"] == single["sleep_quality"]
+        assert batch_result["confidence"] == single["confidence"]
+
+
+def test_batch_empty(client):
+    response = client.post("/predict_batch", json=[])
+    assert response.status_code == 200
+    assert response.json()["predictions"] == []
+    assert response.json()["model_version"].startswith("RandomForest_Sleep@")
@@ -0,0 +1,53 @@
+import os
+import pickle
+
+import joblib
+import numpy as np
+import pytest
+
+from serving.backends import BackendMismatch, build_backend, check_equivalence
+from serving.model_store import ModelStore, warmup_batch
+from serving.settings import BACKEND_TOLERANCE, MODELS_DIR
+
+X = warmup_batch(500, random_state=1)
+
+
+def _load(file_name):
+    if file_name.startswith("XGBoost"):
+        pytest.importorskip("xgboost")
+    return joblib.load(os.path.join(MODELS_DIR, file_name))
+
+
+@pytest.mark.parametrize("file_name", ["RandomForest_Sleep.pkl", "XGBoost_Sleep.pkl"])
+def test_onnx_backend_matches_native(file_name):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("skl2onnx")
+    if file_name.startswith("XGBoost"):
+        pytest.importorskip("onnxmltools")
+
+    native = _load(file_name)
+    onnx_model = build_backend("onnx", native)
+
+    assert check_equivalence(native, onnx_model, X, BACKEND_TOLERANCE) <= BACKEND_TOLERANCE
+    assert np.array_equal(native.predict(X), onnx_model.predict(X))
+    # Пул процессов передаёт модель через pickle: сессия пересоздаётся из байтов модели
+    assert np.array_equal(pickle.loads(pickle.dumps(onnx_model)).predict_proba(X), onnx_model.predict_proba(X))
+
+
+def test_equivalence_check_rejects_diverging_backend():
+    native = _load("RandomForest_Sleep.pkl")
+
+    class Shifted:
+        classes_ = native.classes_
+
+        def predict_proba(self, X):
+            return native.predict_proba(X) + 1e-3
+
+    with pytest.raises(BackendMismatch):
+        check_equivalence(native, Shifted(), X, BACKEND_TOLERANCE)
+
+
+def test_store_falls_back_to_native_for_unsupported_backend():
+    native = _load("RandomForest_Sleep.pkl")
+    serving = ModelStore(backend="no-such-backend").prepare(native, "v", {"kind": "file", "path": "-"})
+    assert serving.model is native
@@ -0,0 +1,94 @@
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from run_api import app
+from serving.schema import FEATURES
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+MATRIX = "application/x-sleep-matrix"
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _matrix(columns, dtype):
+    return np.array([[sample[c] for c in columns] for sample in features], dtype=dtype)
+
+
+@pytest.fixture(scope="module")
+def json_probs(client):
+    predictions = client.post("/predict_batch", json=features).json()["predictions"]
+    return [(p["sleep_efficiency_label"], p["confidence"]) for p in predictions]
+
+
+def _check(json_probs, probs, columns):
+    assert probs.shape == (len(features), 3)
+    for (label, confidence), row in zip(json_probs, probs):
+        assert columns[int(row.argmax())] == ["bad", "good", "medium"][label]
+        assert round(float(row.max()), 3) == confidence
+
+
+@pytest.mark.parametrize("dtype", ["f4", "f8"])
+def test_matrix_matches_json(client, json_probs, dtype):
+    body = _matrix(FEATURES, "<" + dtype).tobytes()
+    response = client.post("/predict_batch", content=body,
+                           headers={"Content-Type": f"{MATRIX}; dtype={dtype}", "X-Columns": ",".join(FEATURES)})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == f"{MATRIX}; dtype={dtype}"
+    assert response.headers["x-model-version"].startswith("RandomForest_Sleep@")
+
+    columns = response.headers["x-columns"].split(",")
+    probs = np.frombuffer(response.content, dtype="<" + dtype).reshape(-1, len(columns))
+    _check(json_probs, probs, columns)
+
+
+def test_matrix_reordered_columns(client, json_probs):
+    columns = FEATURES[::-1]
+    response = client.post("/predict", content=_matrix(columns, "<f8").tobytes(),
+                           headers={"Content-Type": MATRIX, "X-Columns": ",".join(columns)})
+    assert response.status_code == 200
+    _check(json_probs, np.frombuffer(response.content, dtype="<f8").reshape(-1, 3),
+           response.headers["x-columns"].split(","))
+
+
+@pytest.mark.parametrize("columns, body, message", [
+    (FEATURES[:-1], np.zeros((2, 9)).tobytes(), "не совпадают"),
+    (FEATURES, np.zeros(15).tobytes(), "не кратен"),
+    ([], np.zeros((1, 10)).tobytes(), "X-Columns"),
+])
+def test_matrix_rejected(client, columns, body, message):
+    response = client.post("/predict_batch", content=body,
+                           headers={"Content-Type": MATRIX, "X-Columns": ",".join(columns)})
+    assert response.status_code == 422
+    assert message in response.json()["detail"]
+
+
+def test_arrow_roundtrip(client, json_probs):
+    pa = pytest.importorskip("pyarrow")
+
+    table = pa.table({c: pa.array([s[c] for s in features], type=pa.float32()) for c in reversed(FEATURES)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    response = client.post("/predict_batch", content=sink.getvalue().to_pybytes(),
+                           headers={"Content-Type": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    result = pa.ipc.open_stream(response.content).read_all()
+    assert result.schema.metadata[b"model_version"].decode().startswith("RandomForest_Sleep@")
+    assert result.schema.field(0).type == pa.float32()
+    _check(json_probs, np.column_stack([c.to_numpy() for c in result.columns]), result.column_names)
+
+
+def test_json_still_served(client):
+    response = client.post("/predict", json=features[0])
+    assert response.status_code == 200
+    assert "sleep_quality" in response.json()
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.model_store import file_version
+from serving.settings import MODEL_PATH
+from serving.tree_engine import compile_model
+
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+@pytest.fixture()
+def client():
+    with TestClient(run_api.app) as c:
+        yield c
+    run_api.store.reload({"kind": "file", "path": MODEL_PATH})
+
+
+def test_health_and_readiness(client):
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert ready.json()["ready"] is True
+    assert {"model_loaded", "ready"} <= set(ready.json()["startup_seconds"])
+
+
+def test_reload_from_compiled_artifact_keeps_version(client, tmp_path):
+    # Артефакт отдаёт версию исходного .pkl, поэтому кэш и таблица ответов остаются валидными
+    path = str(tmp_path / "rf.compiled")
+    compile_model(run_api.store.active.model).save(path, model_version=file_version(MODEL_PATH))
+    native = client.post("/predict", json=features[0]).json()
+
+    run_api.store.reload({"kind": "file", "path": path})
+    compiled = client.post("/predict", json=features[1]).json()
+
+    assert type(run_api.store.active.model).__name__ == "CompiledForest"
+    assert compiled["model_version"] == native["model_version"]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from ml_experiments.config.experiment_config import RANDOM_STATE, TEST_SIZE, VALIDATION_SIZE
+from ml_experiments.utils.compression import compression_candidates, select_compressed, tree_subset
+from serving.drift import DEFAULT_DATA_PATH
+from serving.schema import FEATURES
+
+# === Разбиение как в load_data: train и valid без теста ===
+data = pd.read_csv(DEFAULT_DATA_PATH)
+rest, _ = train_test_split(data, test_size=TEST_SIZE, stratify=data["sleep_efficiency_label"],
+                           random_state=RANDOM_STATE)
+train, valid = train_test_split(rest, test_size=VALIDATION_SIZE / (1 - TEST_SIZE),
+                                stratify=rest["sleep_efficiency_label"], random_state=RANDOM_STATE)
+x_train, y_train = train[FEATURES].to_numpy(), train["sleep_efficiency_label"].to_numpy()
+x_valid, y_valid = valid[FEATURES].to_numpy(), valid["sleep_efficiency_label"].to_numpy()
+
+
+@pytest.fixture(scope="module")
+def forest():
+    return RandomForestClassifier(n_estimators=40, random_state=RANDOM_STATE).fit(x_train, y_train)
+
+
+@pytest.fixture(scope="module")
+def candidates(forest):
+    # Урезанные сетки, чтобы перебор в тесте занимал секунды
+    model = Pipeline([("scaler", StandardScaler().fit(x_train)), ("model", forest)])
+    return compression_candidates(model, x_train, y_train, x_valid, y_valid, tree_counts=(5, 20), depths=(4, 8),
+                                  distill_tree_counts=(5,))
+
+
+def test_tree_subset_keeps_first_trees_without_copying(forest):
+    subset = tree_subset(forest, 7)
+    assert subset.n_estimators == 7 and len(subset.estimators_) == 7
+    assert all(a is b for a, b in zip(subset.estimators_, forest.estimators_[:7]))
+    # Исходный лес не меняется
+    assert forest.n_estimators == len(forest.estimators_) == 40
+
+    expected = np.mean([tree.predict_proba(x_valid) for tree in forest.estimators_[:7]], axis=0)
+    np.testing.assert_allclose(subset.predict_proba(x_valid), expected)
+
+
+def test_candidates_cover_all_methods(candidates):
+    assert {c["method"] for c in candidates} == {"subset", "depth", "distill_tree", "distill_forest"}
+    for candidate in candidates:
+        assert isinstance(candidate["model"], Pipeline)
+        assert candidate["accuracy_valid"] == accuracy_score(y_valid, candidate["model"].predict(x_valid))
+        assert candidate["size_bytes"] > 0
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 0.02, 0.1])
+def test_selected_is_smallest_within_tolerance(candidates, forest, tolerance):
+    baseline = accuracy_score(y_valid, forest.predict(x_valid))
+    selected = select_compressed(candidates, baseline, tolerance)
+    allowed = [c for c in candidates if c["accuracy_valid"] >= baseline - tolerance - 1e-12]
+    if not allowed:
+        assert selected is None
+        return
+    assert selected["accuracy_valid"] >= baseline - tolerance - 1e-12
+    assert selected["size_bytes"] == min(c["size_bytes"] for c in allowed)
+
+
+def test_nothing_selected_when_no_candidate_qualifies(candidates):
+    assert select_compressed(candidates, baseline_accuracy=1.5, tolerance=0.02) is None
+    assert select_compressed([], baseline_accuracy=0.5, tolerance=0.02) is None
+    # Бюджет задержки, в который не укладывается ни один кандидат
+    assert select_compressed(candidates[:3], baseline_accuracy=0.0, tolerance=0.0, latency_budget_ms=0.0,
+                             x=x_valid) is None
+
+
+def test_selection_prefers_accuracy_among_equal_sizes():
+    candidates = [
+        {"accuracy_valid": 0.80, "size_bytes": 100, "model": "a"},
+        {"accuracy_valid": 0.90, "size_bytes": 100, "model": "b"},
+        {"accuracy_valid": 0.95, "size_bytes": 500, "model": "c"},
+        {"accuracy_valid": 0.50, "size_bytes": 10, "model": "d"},
+    ]
+    assert select_compressed(candidates, baseline_accuracy=0.9, tolerance=0.1)["model"] == "b"
+    assert select_compressed(candidates, baseline_accuracy=0.95, tolerance=0.0)["model"] == "c"
@@ -0,0 +1,106 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.drift import DEFAULT_DATA_PATH, DriftMonitor, build_reference, ks, psi
+from serving.schema import FEATURES
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+training = pd.read_csv(DEFAULT_DATA_PATH)[FEATURES].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return build_reference()
+
+
+def test_reference_histograms(reference):
+    assert reference["rows"] == len(training)
+    for spec in reference["features"].values():
+        assert len(spec["proportions"]) == len(spec["edges"]) + 1
+        assert sum(spec["proportions"]) == pytest.approx(1.0)
+    # Флаг — корзина на значение, возраст — децили
+    assert reference["features"]["Gender"] == {"kind": "discrete", "edges": [0.5], "proportions": pytest.approx(
+        [np.mean(training[:, FEATURES.index("Gender")] == 0), np.mean(training[:, FEATURES.index("Gender")] == 1)])}
+    assert reference["features"]["Age"]["kind"] == "quantile"
+
+
+def test_training_data_is_stable(reference):
+    monitor = DriftMonitor(reference)
+    monitor.update(training)
+    scores = monitor.scores()
+    assert scores["status"] == "stable"
+    assert all(score["psi"] < 1e-3 and score["ks"] < 1e-9 for score in scores["features"].values())
+
+
+def test_shifted_feature_is_flagged(reference):
+    monitor = DriftMonitor(reference)
+    shifted = training.copy()
+    shifted[:, FEATURES.index("Age")] += 20
+    # Поштучно — тот же путь, что у одиночных запросов /predict
+    for row in shifted:
+        monitor.update(row[np.newaxis])
+    scores = monitor.scores(detail=True)
+
+    assert scores["status"] == "significant"
+    assert scores["max_psi_feature"] == "Age"
+    assert scores["features"]["Age"]["ks"] > 0.4
+    assert scores["features"]["Gender"]["status"] == "stable"
+    assert len(scores["features"]["Age"]["live"]) == len(scores["features"]["Age"]["reference"])
+
+
+def test_window_forgets_old_traffic(reference):
+    monitor = DriftMonitor(reference, window_rows=len(training))
+    shifted = training.copy()
+    shifted[:, FEATURES.index("Age")] += 20
+    monitor.update(shifted)
+    assert monitor.scores()["status"] == "significant"
+
+    # Два окна обычных данных вытесняют сдвинутые
+    monitor.update(training)
+    monitor.update(training)
+    scores = monitor.scores()
+    assert scores["status"] == "stable"
+    assert scores["rows"] == len(training) and scores["total_rows"] == 3 * len(training)
+
+
+def test_insufficient_data(reference):
+    monitor = DriftMonitor(reference, min_rows=100)
+    monitor.update(training[:10])
+    assert monitor.scores()["status"] == "insufficient_data"
+
+
+def test_scores_against_known_values():
+    assert psi([0.5, 0.5], [0.5, 0.5]) == pytest.approx(0.0)
+    expected, actual = np.array([0.5, 0.5]), np.array([0.9, 0.1])
+    assert psi(expected, actual, epsilon=0) == pytest.approx(float(np.sum((actual - expected) * np.log(actual / expected))))
+    assert ks([0.2, 0.3, 0.5], [0.5, 0.3, 0.2]) == pytest.approx(0.3)
+
+
+def test_api_drift_endpoint():
+    monitor = run_api.drift_monitor
+    run_api.drift_monitor = DriftMonitor(build_reference(), min_rows=1)
+    try:
+        with TestClient(run_api.app) as client:
+            for sample in samples:
+                assert client.post("/predict", json=sample).status_code == 200
+            assert client.post("/predict_batch", json=samples).status_code == 200
+            stream = client.post("/predict_stream", content="".join(json.dumps(s) + "\n" for s in samples),
+                                 headers={"Content-Type": "application/x-ndjson"})
+            assert stream.status_code == 200
+            result = client.get("/drift").json()
+            detailed = client.get("/drift", params={"detail": "true"}).json()
+            metrics = client.get("/metrics").text
+    finally:
+        run_api.drift_monitor = monitor
+
+    assert result["enabled"] is True
+    assert result["rows"] == 3 * len(samples)
+    assert set(result["features"]) == set(FEATURES)
+    assert "live" in detailed["features"]["Age"]
+    assert 'sleep_api_feature_drift_psi{feature="Age"}' in metrics
@@ -0,0 +1,56 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from serving.executor import ExecutorSaturated, ProcessPoolModel
+from serving.settings import MODELS_DIR
+
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = np.array([list(sample.values()) for sample in json.load(f)], dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def native():
+    return joblib.load(os.path.join(MODELS_DIR, "RandomForest_Sleep.pkl"))
+
+
+@pytest.fixture(scope="module")
+def pooled(native):
+    # slot_rows меньше пакета — проверяем и передачу через слот по частям
+    model = ProcessPoolModel(native, n_features=features.shape[1], workers=1, queue_limit=1,
+                             queue_timeout=0.05, slot_rows=4)
+    yield model
+    model.close()
+
+
+def test_pool_matches_native_model(native, pooled):
+    assert np.array_equal(native.predict_proba(features), pooled.predict_proba(features))
+    assert np.array_equal(native.predict(features), pooled.predict(features))
+
+
+def test_saturated_pool_rejects_instead_of_queueing(pooled):
+    slot = pooled._slots.get()
+    try:
+        with pytest.raises(ExecutorSaturated):
+            pooled.predict_proba(features[:1])
+    finally:
+        pooled._slots.put(slot)
+    assert pooled.stats()["saturated"] == 1
+
+
+def test_pool_recovers_after_worker_is_killed(native, pooled):
+    import signal
+
+    restarts = pooled.stats()["restarts"]
+    for process in list(pooled._pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    # Пул пересоздаётся, часть пакета повторяется: вызов проходит и ответ тот же
+    assert np.array_equal(native.predict_proba(features), pooled.predict_proba(features))
+    assert pooled.stats()["restarts"] == restarts + 1
+    assert pooled.stats()["free_slots"] == pooled.queue_limit
+    assert np.array_equal(native.predict_proba(features), pooled.predict_proba(features))
@@ -0,0 +1,102 @@
+import json
+import os
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.explain import build_explainer, explain_rows
+from serving.schema import FEATURES
+from serving.settings import MODELS_DIR
+from serving.tree_engine import CompiledForest
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+features = np.array([list(sample.values()) for sample in samples], dtype=np.float64)
+
+
+def _load(file_name):
+    if file_name.startswith("XGBoost"):
+        pytest.importorskip("xgboost")
+    return joblib.load(os.path.join(MODELS_DIR, file_name))
+
+
+def test_forest_contributions_sum_to_probabilities():
+    native = _load("RandomForest_Sleep.pkl")
+    bias, contributions = build_explainer(native).explain(features)
+
+    assert contributions.shape == (len(features), len(FEATURES), len(native.classes_))
+    assert np.allclose(bias + contributions.sum(axis=1), native.predict_proba(features), atol=1e-9)
+
+
+def test_boosting_contributions_sum_to_margin():
+    native = _load("XGBoost_Sleep.pkl")
+    explainer = build_explainer(native)
+    bias, contributions = explainer.explain(features)
+
+    margin = bias + contributions.sum(axis=1)
+    probs = np.exp(margin - margin.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+    assert np.allclose(probs, native.predict_proba(features), atol=1e-5)
+
+
+def test_node_values_survive_artifact_roundtrip(tmp_path):
+    explainer = build_explainer(_load("XGBoost_Sleep.pkl"))
+    path = os.path.join(tmp_path, "compiled")
+    explainer.save(path)
+    loaded = CompiledForest.load(path)
+
+    assert np.array_equal(loaded.node_value, explainer.node_value)
+    for expected, actual in zip(explainer.explain(features), loaded.explain(features)):
+        assert np.array_equal(expected, actual)
+
+
+def test_api_explanation_matches_confidence():
+    with TestClient(run_api.app) as client:
+        for sample in samples:
+            response = client.post("/predict", json=sample, params={"explain": "true"})
+            assert response.status_code == 200
+            result = response.json()
+            explanation = result["explanation"]
+            label = result["sleep_quality"]
+
+            assert explanation["units"] == "probability"
+            assert list(explanation["contributions"][label]) == FEATURES
+            total = explanation["bias"][label] + sum(explanation["contributions"][label].values())
+            assert total == pytest.approx(result["confidence"], abs=2e-3)
+
+            # Без explain ответ прежний
+            assert "explanation" not in client.post("/predict", json=sample).json()
+
+
+def test_api_batch_explanations():
+    with TestClient(run_api.app) as client:
+        response = client.post("/predict_batch", json=samples, params={"explain": "true"})
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert len(predictions) == len(samples)
+    assert all(set(p["explanation"]["bias"]) == {"bad", "good", "medium"} for p in predictions)
+
+
+def test_explain_rows_format():
+    explainer = build_explainer(_load("RandomForest_Sleep.pkl"))
+    rows = explain_rows(explainer, features[:2], FEATURES)
+    assert len(rows) == 2
+    assert set(rows[0]) == {"units", "bias", "contributions"}
+
+
+def test_api_without_explainer_returns_null_explanation():
+    with TestClient(run_api.app) as client:
+        active = run_api.store.active
+        explainer, active.explainer = active.explainer, None
+        try:
+            single = client.post("/predict", json=samples[0], params={"explain": "true"})
+            batch = client.post("/predict_batch", json=samples[:3], params={"explain": "true"})
+        finally:
+            active.explainer = explainer
+
+    assert single.status_code == batch.status_code == 200
+    assert single.json()["explanation"] is None and "sleep_efficiency_label" in single.json()
+    assert [p["explanation"] for p in batch.json()["predictions"]] == [None] * 3
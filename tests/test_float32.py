@@ -0,0 +1,100 @@
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import run_api
+from ml_experiments.config.experiment_config import RANDOM_STATE, TEST_SIZE, VALIDATION_SIZE
+from serving.batching import MicroBatcher
+from serving.drift import DEFAULT_DATA_PATH
+from serving.model_store import load_from_file
+from serving.schema import FEATURES
+
+# === Разбиение как в load_data: test, затем train/valid из остатка ===
+data = pd.read_csv(DEFAULT_DATA_PATH)
+rest, test = train_test_split(data, test_size=TEST_SIZE, stratify=data["sleep_efficiency_label"],
+                              random_state=RANDOM_STATE)
+train, _ = train_test_split(rest, test_size=VALIDATION_SIZE / (1 - TEST_SIZE), stratify=rest["sleep_efficiency_label"],
+                            random_state=RANDOM_STATE)
+x_train, y_train = train[FEATURES].to_numpy(), train["sleep_efficiency_label"].to_numpy()
+x_test = test[FEATURES].to_numpy()
+
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+
+
+@pytest.mark.parametrize("name", ["RandomForest", "XGBoost"])
+def test_served_models_predict_the_same_on_float32(name):
+    if name == "XGBoost":
+        pytest.importorskip("xgboost")
+    model = load_from_file(f"Fast_Api/models/{name}_Sleep.pkl")[0]
+    # Деревья сравнивают признаки во float32: float32-вход даёт те же вероятности бит в бит
+    np.testing.assert_array_equal(model.predict_proba(x_test.astype(np.float32)), model.predict_proba(x_test))
+
+
+def test_forest_trained_on_float32_is_the_same():
+    def fit(dtype):
+        return RandomForestClassifier(n_estimators=30, random_state=RANDOM_STATE).fit(x_train.astype(dtype), y_train)
+
+    native, compact = fit(np.float64), fit(np.float32)
+    np.testing.assert_array_equal(compact.predict_proba(x_test.astype(np.float32)), native.predict_proba(x_test))
+
+
+@pytest.mark.parametrize("model_class", [LogisticRegression, KNeighborsClassifier, GaussianNB])
+def test_scaled_models_trained_on_float32_are_close(model_class):
+    def fit(dtype):
+        # Как run_experiment(scaler=True)
+        return Pipeline([("scaler", StandardScaler()), ("model", model_class())]).fit(x_train.astype(dtype), y_train)
+
+    native, compact = fit(np.float64), fit(np.float32)
+    # После масштабирования во float32 вероятности не побитовые: допуск 1e-5 (GaussianNB — до ~2.5e-6)
+    np.testing.assert_allclose(compact.predict_proba(x_test.astype(np.float32)), native.predict_proba(x_test),
+                               rtol=0, atol=1e-5)
+    np.testing.assert_array_equal(compact.predict(x_test.astype(np.float32)), native.predict(x_test))
+
+
+def test_micro_batcher_builds_matrix_of_dtype():
+    seen = []
+
+    def predict_proba(X):
+        seen.append(X.dtype)
+        return np.tile([0.2, 0.3, 0.5], (len(X), 1))
+
+    async def scenario():
+        batcher = MicroBatcher(predict_proba, max_wait_ms=1, dtype=np.float32)
+        await batcher.start()
+        await batcher.submit([1.0] * len(FEATURES))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert seen == [np.float32]
+
+
+def test_api_float32_mode(monkeypatch):
+    with TestClient(run_api.app) as client:
+        expected = client.post("/predict_batch", json=samples).json()
+        model = run_api.store.active.model
+        seen = []
+        predict_proba = model.predict_proba
+
+        def spy(X):
+            seen.append(X.dtype)
+            return predict_proba(X)
+
+        monkeypatch.setattr(run_api, "FEATURE_DTYPE", np.dtype(np.float32))
+        monkeypatch.setattr(model, "predict_proba", spy)
+        response = client.post("/predict_batch", json=samples)
+
+    assert response.status_code == 200
+    # Матрица собирается сразу во float32, и ответ тот же
+    assert seen == [np.float32]
+    assert response.json() == expected
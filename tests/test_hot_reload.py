@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.settings import MODELS_DIR, MODEL_PATH
+
+XGB_PATH = os.path.join(MODELS_DIR, "XGBoost_Sleep.pkl")
+
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    monkeypatch.setattr(run_api, "ADMIN_TOKEN", ADMIN_TOKEN)
+    with TestClient(run_api.app, headers={"X-Admin-Token": ADMIN_TOKEN}) as c:
+        yield c
+    # Возвращаем модель по умолчанию для остальных тестов
+    run_api.store.reload({"kind": "file", "path": MODEL_PATH})
+
+
+def _wait_reload(client, reloads_before, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get("/admin/model").json()
+        if not status["reloading"] and (status["reloads"] > reloads_before or status["last_error"]):
+            return status
+        time.sleep(0.05)
+    raise TimeoutError("Перезагрузка не завершилась")
+
+
+def test_reload_swaps_model_and_reports_version(client):
+    before = client.post("/predict", json=features[0]).json()
+    assert before["model_version"].startswith("RandomForest_Sleep@")
+
+    status = client.get("/admin/model").json()
+    response = client.post("/admin/reload", json={"kind": "file", "path": XGB_PATH})
+    assert response.status_code == 202
+
+    status = _wait_reload(client, status["reloads"])
+    assert status["last_error"] is None
+    assert status["active"]["model_version"].startswith("XGBoost_Sleep@")
+
+    after = client.post("/predict", json=features[0]).json()
+    assert after["model_version"] == status["active"]["model_version"]
+    batch = client.post("/predict_batch", json=features[:3]).json()
+    assert batch["model_version"] == status["active"]["model_version"]
+
+
+def test_failed_reload_keeps_active_model(client):
+    status = client.get("/admin/model").json()
+    active_version = status["active"]["model_version"]
+
+    client.post("/admin/reload", json={"kind": "file", "path": os.path.join(MODELS_DIR, "nonexistent.pkl")})
+    status = _wait_reload(client, status["reloads"])
+
+    assert status["failures"] >= 1
+    assert "FileNotFoundError" in status["last_error"]
+    assert status["active"]["model_version"] == active_version
+    assert client.post("/predict", json=features[0]).json()["model_version"] == active_version
+
+
+def test_snapshot_taken_before_swap_keeps_old_model(client):
+    # Запрос, взявший снимок до подмены, дорабатывает на старой модели
+    old = run_api.store.active
+    run_api.store.reload({"kind": "file", "path": XGB_PATH})
+
+    assert run_api.store.active is not old
+    assert old.version.startswith("RandomForest_Sleep@")
+    assert old.model.predict_proba([list(features[0].values())]).shape == (1, 3)
+
+
+
+def test_admin_requires_token_and_models_dir(client, monkeypatch):
+    assert client.get("/admin/model", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    # Файл вне MODELS_DIR не загружается, в том числе через ..
+    for path in ("/etc/passwd", "models/../../tests/conftest.py"):
+        assert client.post("/admin/reload", json={"kind": "file", "path": path}).status_code == 400
+    assert not run_api.store.reloading
+
+    # Без ADMIN_TOKEN админские эндпоинты закрыты
+    monkeypatch.setattr(run_api, "ADMIN_TOKEN", "")
+    assert client.get("/admin/model").status_code == 403
+    assert client.post("/admin/reload", json={"kind": "file", "path": XGB_PATH}).status_code == 403
+    assert client.get("/debug/model_memory").status_code == 403
@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+import run_api
+from serving.introspection import estimator_stats, model_memory, model_nbytes
+from serving.model_store import load_from_file
+from serving.tree_engine import compile_model
+
+rng = np.random.default_rng(0)
+X = rng.normal(size=(400, 6))
+y = (X[:, 0] + rng.normal(scale=0.8, size=400) > 0).astype(int) + (X[:, 1] > 1)
+
+
+def test_sklearn_forest_stats_match_trees():
+    forest = RandomForestClassifier(n_estimators=7, random_state=0).fit(X, y)
+    shallow = RandomForestClassifier(n_estimators=7, max_depth=4, random_state=0).fit(X, y)
+    stats = estimator_stats(forest)
+
+    assert [tree["nodes"] for tree in stats] == [e.tree_.node_count for e in forest.estimators_]
+    assert [tree["depth"] for tree in stats] == [e.tree_.max_depth for e in forest.estimators_]
+    assert [tree["leaves"] for tree in stats] == [e.tree_.n_leaves for e in forest.estimators_]
+    # Узел дерева sklearn — 64 байта, значение — n_classes чисел float64
+    assert all(tree["node_bytes"] == 64 * tree["nodes"] and tree["value_bytes"] == 3 * 8 * tree["nodes"]
+               for tree in stats)
+
+    report, small = model_memory(forest), model_memory(shallow)
+    # Неподрезанные деревья: больше узлов и байт, массивы узлов — основная часть модели
+    assert report["nodes"] > small["nodes"] and report["max_depth"] > small["max_depth"] == 4
+    assert report["node_bytes"] + report["value_bytes"] <= report["deserialized_bytes"] == model_nbytes(forest)
+    assert "estimators" not in report and len(model_memory(forest, estimators=True)["estimators"]) == 7
+
+
+@pytest.mark.parametrize("path", ["Fast_Api/models/RandomForest_Sleep.pkl", "Fast_Api/models/XGBoost_Sleep.pkl"])
+def test_compiled_forest_has_same_trees(path):
+    if "XGBoost" in path:
+        pytest.importorskip("xgboost")
+    model = load_from_file(path)[0]
+    native, compiled = estimator_stats(model), estimator_stats(compile_model(model))
+    assert [(t["nodes"], t["leaves"], t["depth"]) for t in native] == \
+           [(t["nodes"], t["leaves"], t["depth"]) for t in compiled]
+
+
+def test_gradient_boosting_and_unsupported_models():
+    boosting = GradientBoostingClassifier(n_estimators=4, max_depth=2).fit(X, y)
+    # Дерево на итерацию и класс
+    assert len(estimator_stats(boosting)) == 4 * 3
+
+    report = model_memory(LogisticRegression().fit(X, y))
+    assert report["n_estimators"] is None and "nodes" not in report and report["deserialized_bytes"] > 0
+
+
+def test_cli_reports_rss_in_fresh_process():
+    out = subprocess.run([sys.executable, "-m", "serving.introspection", "--model", "models/RandomForest_Sleep.pkl",
+                          "--json"], capture_output=True, text=True, cwd="Fast_Api", check=True)
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    assert report["model_version"].startswith("RandomForest_Sleep@")
+    assert report["rss_after_load_bytes"] > report["rss_before_load_bytes"] + report["deserialized_bytes"]
+    assert report["n_estimators"] == 200
+
+
+def test_cli_text_report_without_measurements(monkeypatch, capsys):
+    import serving.introspection as introspection
+
+    # Без /proc и с несериализуемой моделью замеры — None, текстовый отчёт всё равно печатается
+    monkeypatch.setattr(introspection, "process_rss", lambda: None)
+    monkeypatch.setattr(introspection, "model_nbytes", lambda model: 1 / 0)
+    report = introspection.main(["--model", "Fast_Api/models/RandomForest_Sleep.pkl"])
+    assert report["deserialized_bytes"] is None and report["rss_before_load_bytes"] is None
+    assert "н/д" in capsys.readouterr().out
+
+
+def test_debug_endpoint(monkeypatch):
+    monkeypatch.setattr(run_api, "ADMIN_TOKEN", "test-admin-token")
+    with TestClient(run_api.app, headers={"X-Admin-Token": "test-admin-token"}) as client:
+        response = client.get("/debug/model_memory")
+        with_trees = client.get("/debug/model_memory", params={"estimators": "true"}).json()
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["model_version"] == run_api.store.active.version
+    rss = body["load_rss"]
+    # RSS общий на процесс и в тестах зависит от уже загруженного: проверяем только, что он снят
+    assert 0 < rss["before_load"] <= rss["after_load"] and rss["after_prepare"] > 0 and body["rss_bytes"] > 0
+    assert body["model"]["nodes"] > 0 and body["model"]["deserialized_bytes"] > body["model"]["node_bytes"]
+    assert len(with_trees["model"]["estimators"]) == body["model"]["n_estimators"]
@@ -0,0 +1,43 @@
+import json
+from serving.schema import FEATURES
+from benchmarks import loadgen
+
+
+def test_synthetic_rows_follow_schema():
+    rows = loadgen.synthetic_rows(50, random_state=1)
+    assert len(rows) == 50
+    assert all(list(row) == FEATURES for row in rows)
+    assert all(isinstance(row["Gender"], int) and isinstance(row["Age"], float) for row in rows)
+    # Признаки выбираются независимо — записи не повторяют одну строку CSV
+    assert len({tuple(row.values()) for row in rows}) > 40
+
+
+def test_make_requests_batches():
+    rows = loadgen.fixture_rows()
+    assert len(loadgen.make_requests(rows, "/predict", 4)) == len(rows)
+    batches = loadgen.make_requests(rows, "/predict_batch", 4)
+    assert [len(b["json"]) for b in batches] == [4, 4, 2]
+    stream = loadgen.make_requests(rows, "/predict_stream", 4)
+    assert stream[0]["content"].count("\n") == 4
+
+
+def test_in_process_report(tmp_path):
+    out = tmp_path / "report.json"
+    report = loadgen.main(["--requests", "40", "--concurrency", "4", "--out", str(out)])
+
+    assert json.loads(out.read_text()) == report
+    assert report["target"] == "asgi"
+    assert report["requests"] == 40
+    assert report["error_rate"] == 0.0
+    assert report["model_version"].startswith("RandomForest_Sleep@")
+    latency = report["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+
+
+def test_summarize_counts_errors():
+    results = [(0.01, 200)] * 8 + [(0.02, 503), (0.5, "ReadTimeout")]
+    summary = loadgen.summarize(results, elapsed=2.0)
+    assert summary["throughput_rps"] == 5.0
+    assert summary["rows_per_s"] == 4.0
+    assert summary["errors"] == {"503": 1, "ReadTimeout": 1}
+    assert summary["error_rate"] == 0.2
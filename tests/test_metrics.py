@@ -0,0 +1,59 @@
+import json
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.metrics import Counter, HistogramVec, Registry
+
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Запросы", ("endpoint",)))
+    histogram = registry.register(HistogramVec("latency_ms", "Задержка", ("endpoint",), [1, 10]))
+    counter.inc('/a"b')
+    histogram.observe("/a", value=5)
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{endpoint="/a\\"b"} 1' in text
+    assert 'latency_ms_bucket{endpoint="/a",le="1"} 0' in text
+    assert 'latency_ms_bucket{endpoint="/a",le="+Inf"} 1' in text
+    assert 'latency_ms_count{endpoint="/a"} 1' in text
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(run_api.app) as c:
+        yield c
+
+
+def _sample(text, name, **labels):
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_counts_requests_and_stages(client):
+    version = run_api.store.active.version
+    before = client.get("/metrics").text
+
+    client.post("/predict", json=features[0])
+    client.post("/predict", json={"Age": "not a number"})
+    text = client.get("/metrics").text
+
+    assert _sample(text, "sleep_api_requests_total", endpoint="/predict", outcome="success",
+                   model_version=version) == \
+        _sample(before, "sleep_api_requests_total", endpoint="/predict", outcome="success", model_version=version) + 1
+    assert _sample(text, "sleep_api_requests_total", endpoint="/predict", outcome="client_error") >= 1
+
+    for stage in ("validation", "features", "serialization"):
+        assert _sample(text, "sleep_api_stage_duration_ms_count", endpoint="/predict", stage=stage) >= 1
+    assert _sample(text, "sleep_api_in_flight_requests", path="/predict") == 0
+    assert _sample(text, "sleep_api_model_load_seconds", model_version=version) > 0
+    assert re.search(r'sleep_api_startup_seconds\{mark="ready"\} [0-9.]+', text)
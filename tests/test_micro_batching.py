@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+
+from serving.batching import MicroBatcher
+
+
+def test_concurrent_submits_share_one_predict_proba_call():
+    calls = []
+
+    def predict_proba(X):
+        calls.append(len(X))
+        # Вероятности зависят от строки, чтобы проверить, что каждый получил свою
+        return np.column_stack([X[:, 0], -X[:, 0]])
+
+    async def main():
+        batcher = MicroBatcher(predict_proba, max_batch_size=64, max_wait_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(*[batcher.submit([float(i), 0.0]) for i in range(10)])
+        finally:
+            await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(main())
+
+    assert calls == [10]
+    assert [float(r[0]) for r in results] == [float(i) for i in range(10)]
+    assert stats["batch_size"]["count"] == 1
+    assert stats["batch_size"]["sum"] == 10
+    assert stats["queue_wait_ms"]["count"] == 10
+
+
+def test_batch_is_split_by_max_size_and_errors_reach_every_caller():
+    calls = []
+
+    def predict_proba(X):
+        calls.append(len(X))
+        if len(calls) == 3:
+            raise RuntimeError("boom")
+        return np.zeros((len(X), 2))
+
+    async def main():
+        batcher = MicroBatcher(predict_proba, max_batch_size=4, max_wait_ms=50)
+        await batcher.start()
+        try:
+            await asyncio.gather(*[batcher.submit([float(i)]) for i in range(8)])
+            return await asyncio.gather(*[batcher.submit([1.0]) for _ in range(3)], return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    failed = asyncio.run(main())
+
+    assert calls == [4, 4, 3]
+    assert all(isinstance(e, RuntimeError) for e in failed)
+
+
+def test_malformed_row_fails_its_batch_and_batcher_keeps_running():
+    def predict_proba(X):
+        return np.zeros((len(X), 2))
+
+    async def main():
+        batcher = MicroBatcher(predict_proba, max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        try:
+            # Строки разной длины: матрицу пакета не собрать
+            failed = await asyncio.gather(batcher.submit([1.0, 2.0]), batcher.submit([1.0]),
+                                          return_exceptions=True)
+            return failed, await batcher.submit([1.0, 2.0])
+        finally:
+            await batcher.stop()
+
+    failed, result = asyncio.run(main())
+
+    assert all(isinstance(e, ValueError) for e in failed)
+    assert list(result) == [0.0, 0.0]
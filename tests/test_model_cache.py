@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LogisticRegression
+
+import run_api
+from serving.model_cache import ModelCache, ModelUnavailable, UnknownModel, model_nbytes
+from serving.model_store import ModelStore, load_from_file
+from serving.schema import FEATURES
+from serving.settings import MODELS_DIR
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+
+FAMILIES = ["RandomForest", "XGBoost", "LogisticRegression", "GaussianNB"]
+
+
+def small_model(seed):
+    rng = np.random.default_rng(seed)
+    return LogisticRegression(max_iter=200).fit(rng.normal(size=(60, len(FEATURES))), np.arange(60) % 3)
+
+
+class CountingLoader:
+    """Загрузчик вместо MLflow: модель на каждый источник, с числом вызовов и необязательной задержкой."""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, source):
+        with self._lock:
+            self.calls.append(source)
+        time.sleep(self.delay)
+        name = source.get("model_name") or os.path.basename(source["path"])
+        if name in self.fail:
+            raise RuntimeError(f"{name} недоступна")
+        return small_model(len(self.calls)), f"{name}@{source.get('version') or source.get('alias')}", FEATURES
+
+
+def make_cache(loader, budget_bytes=10 ** 9, models_dir="/nonexistent"):
+    return ModelCache(ModelStore(), FAMILIES, budget_bytes, suffix="Sleep", load=loader, models_dir=models_dir)
+
+
+def test_spec_resolution():
+    cache = make_cache(CountingLoader())
+    assert cache.resolve("XGBoost") == ("XGBoost_Sleep", {"kind": "registry", "model_name": "XGBoost_Sleep",
+                                                          "alias": "staging"})
+    assert cache.resolve("XGBoost@v3")[1] == {"kind": "registry", "model_name": "XGBoost_Sleep", "version": "3"}
+    assert cache.resolve("GaussianNB@champion") == ("GaussianNB_Sleep@champion", {
+        "kind": "registry", "model_name": "GaussianNB_Sleep", "alias": "champion"})
+    # Без версии локальный файл models/<имя>.pkl предпочитается реестру
+    assert make_cache(CountingLoader(), models_dir=MODELS_DIR).resolve("XGBoost")[1] == {
+        "kind": "file", "path": os.path.join(MODELS_DIR, "XGBoost_Sleep.pkl")}
+    for spec in ("SVM", "XGBoost@", "../XGBoost", "XGBoost@a/b"):
+        with pytest.raises(UnknownModel):
+            cache.resolve(spec)
+
+
+def test_concurrent_cold_requests_load_once():
+    loader = CountingLoader(delay=0.3)
+    cache = make_cache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("LogisticRegression"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loader.calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    stats = cache.stats()["models"]["LogisticRegression_Sleep"]
+    assert stats["loads"] == 1 and stats["collapsed"] + stats["hits"] == 7
+
+    # Тёплая модель отдаётся без загрузки
+    assert cache.get("LogisticRegression") is results[0]
+    assert len(loader.calls) == 1
+
+
+def test_failed_load_is_remembered_for_ttl():
+    loader = CountingLoader(fail={"XGBoost_Sleep"})
+    clock = [0.0]
+    cache = ModelCache(ModelStore(), FAMILIES, 10 ** 9, suffix="Sleep", load=loader, models_dir="/nonexistent",
+                       failure_ttl=30, clock=lambda: clock[0])
+    with pytest.raises(RuntimeError):
+        cache.get("XGBoost")
+    # Повтор в пределах failure_ttl — сразу ошибка, без похода в реестр
+    with pytest.raises(ModelUnavailable, match="недоступна"):
+        cache.get("XGBoost")
+    assert len(loader.calls) == 1
+    stats = cache.stats()
+    assert stats["models"]["XGBoost_Sleep"]["failures_cached"] == 1 and stats["failed"] == ["XGBoost_Sleep"]
+    assert stats["cached"] == []
+
+    clock[0] = 31.0
+    with pytest.raises(RuntimeError):
+        cache.get("XGBoost")
+    assert len(loader.calls) == 2
+
+
+def test_loads_per_minute_limit():
+    loader = CountingLoader()
+    clock = [0.0]
+    cache = ModelCache(ModelStore(), FAMILIES, 10 ** 9, suffix="Sleep", load=loader, models_dir="/nonexistent",
+                       loads_per_minute=2, clock=lambda: clock[0])
+    cache.get("XGBoost@1")
+    cache.get("XGBoost@2")
+    with pytest.raises(ModelUnavailable):
+        cache.get("XGBoost@3")
+    # Загруженные модели отдаются и сверх лимита
+    cache.get("XGBoost@1")
+    assert len(loader.calls) == 2
+
+    clock[0] = 61.0
+    cache.get("XGBoost@3")
+    assert len(loader.calls) == 3
+
+
+def test_lru_eviction_under_budget():
+    one = model_nbytes(small_model(0))
+    # Помещаются две модели, но не три
+    cache = make_cache(CountingLoader(), budget_bytes=int(2.5 * one))
+    cache.get("LogisticRegression")
+    cache.get("GaussianNB")
+    cache.get("LogisticRegression")  # GaussianNB становится давно не использованной
+    cache.get("XGBoost")
+
+    stats = cache.stats()
+    assert [entry["model"] for entry in stats["cached"]] == ["LogisticRegression_Sleep", "XGBoost_Sleep"]
+    assert stats["used_bytes"] <= stats["budget_bytes"]
+    assert stats["models"]["GaussianNB_Sleep"]["evictions"] == 1
+
+    # Модель больше бюджета всё равно обслуживается, вытесняя остальные
+    tight = make_cache(CountingLoader(), budget_bytes=one // 2)
+    tight.get("LogisticRegression")
+    tight.get("GaussianNB")
+    assert [entry["model"] for entry in tight.stats()["cached"]] == ["GaussianNB_Sleep"]
+
+
+def test_primary_source_is_not_loaded_twice():
+    loader = CountingLoader()
+    cache = make_cache(loader, models_dir=MODELS_DIR)
+    model, version, features = load_from_file(os.path.join(MODELS_DIR, "RandomForest_Sleep.pkl"))
+    cache.store.active = cache.store.prepare(model, version, {"kind": "file", "path": os.path.join(
+        MODELS_DIR, "RandomForest_Sleep.pkl")}, features)
+    assert cache.get("RandomForest") is cache.store.active
+    assert loader.calls == [] and cache.stats()["models"]["RandomForest_Sleep"]["primary"] == 1
+
+
+def test_api_routes_by_header_and_path():
+    with TestClient(run_api.app) as client:
+        primary = client.post("/predict", json=samples[0]).json()
+        by_header = client.post("/predict", json=samples[0], headers={"X-Model": "XGBoost"}).json()
+        by_path = client.post("/models/XGBoost/predict", json=samples[0]).json()
+        batch = client.post("/models/XGBoost/predict_batch", json=samples).json()
+        unknown = client.post("/predict", json=samples[0], headers={"X-Model": "SVM"})
+        missing = client.post("/models/GaussianNB@7/predict", json=samples[0])
+        missing_again = client.post("/models/GaussianNB@7/predict", json=samples[0])
+        hits_before = client.get("/cache/stats").json()["hits"]
+        cached = client.post("/predict", json=samples[0], headers={"X-Model": "XGBoost"}).json()
+        cache_stats = client.get("/cache/stats").json()
+        stats = client.get("/models").json()
+        metrics = client.get("/metrics").text
+
+    xgb_version = load_from_file(os.path.join(MODELS_DIR, "XGBoost_Sleep.pkl"))[1]
+    assert primary["model_version"] == run_api.store.active.version != xgb_version
+    assert by_header["model_version"] == by_path["model_version"] == batch["model_version"] == xgb_version
+    assert by_header["confidence"] == by_path["confidence"]
+    assert len(batch["predictions"]) == len(samples)
+    assert unknown.status_code == 404
+    # Реестра в тестах нет: загрузка не удалась, но сервис отвечает
+    assert missing.status_code == missing_again.status_code == 503
+    assert stats["models"]["GaussianNB_Sleep@7"]["failures_cached"] >= 1
+    # Предсказания модели из кэша моделей тоже кэшируются
+    assert xgb_version in cache_stats["versions"] and cache_stats["hits"] == hits_before + 1
+    assert cached["confidence"] == by_header["confidence"]
+
+    assert "XGBoost_Sleep" in [entry["model"] for entry in stats["cached"]]
+    assert stats["models"]["XGBoost_Sleep"]["loads"] == 1
+    assert 'sleep_api_model_cache_total{model="XGBoost_Sleep",result="hits"}' in metrics
+    assert 'sleep_api_model_cache_bytes{model="XGBoost_Sleep"}' in metrics
@@ -0,0 +1,100 @@
+import subprocess
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.svm import SVC
+
+from serving.backends import build_backend
+from serving.drift import DEFAULT_DATA_PATH
+from serving.model_store import ModelStore, load_from_file, warmup_batch
+from serving.numpy_models import NumpyModel, export_model
+from serving.schema import FEATURES
+
+# Обучающие данные API и строки вне их: ответы бота и случайные значения
+data = pd.read_csv(DEFAULT_DATA_PATH)
+x_train = data[FEATURES].to_numpy(dtype=np.float64)
+y_train = data["sleep_efficiency_label"].to_numpy()
+x_check = np.vstack([x_train, warmup_batch(512), np.random.default_rng(0).normal(5, 5, size=(256, len(FEATURES)))])
+
+PIPELINES = {
+    "logreg": lambda: Pipeline([("scaler", StandardScaler()), ("model", LogisticRegression(C=1, max_iter=1000))]),
+    "logreg_ovr": lambda: LogisticRegression(solver="liblinear"),
+    "gnb": lambda: GaussianNB(var_smoothing=1e-9),
+    "gnb_scaled": lambda: Pipeline([("scaler", StandardScaler()), ("model", GaussianNB())]),
+}
+for neighbors in (3, 7):
+    for weights in ("uniform", "distance"):
+        for metric, p in (("euclidean", 2), ("manhattan", 2), ("minkowski", 1), ("minkowski", 3)):
+            PIPELINES[f"knn_{neighbors}_{weights}_{metric}_p{p}"] = (
+                lambda n=neighbors, w=weights, m=metric, p=p: Pipeline([
+                    ("scaler", StandardScaler()),
+                    ("model", KNeighborsClassifier(n_neighbors=n, weights=w, metric=m, p=p, algorithm="kd_tree"
+                                                   if m != "minkowski" or p <= 2 else "auto"))]))
+
+
+def knn_ties(exported, X):
+    """Строки, у которых k-й и (k+1)-й соседи на одном расстоянии: набор соседей там не определён и в sklearn."""
+    scaled = (X - exported.mean) / exported.scale
+    # Сумма p-х степеней монотонна по расстоянию Минковского — корень для сравнения не нужен
+    nearest = np.sort((np.abs(scaled[:, np.newaxis, :] - exported.points) ** exported.p).sum(axis=2), axis=1)
+    k = exported.n_neighbors
+    return np.isclose(nearest[:, k - 1], nearest[:, k], rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_export_matches_sklearn(name):
+    model = PIPELINES[name]().fit(pd.DataFrame(x_train, columns=FEATURES), y_train)
+    exported = export_model(model)
+    frame = pd.DataFrame(x_check, columns=FEATURES)
+    rows = ~knn_ties(exported, x_check) if exported.kind == "knn" else np.ones(len(x_check), dtype=bool)
+    assert rows.mean() > 0.99
+
+    np.testing.assert_allclose(exported.predict_proba(x_check)[rows], model.predict_proba(frame)[rows],
+                               rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(exported.predict(x_check)[rows], model.predict(frame)[rows])
+    assert exported.features == FEATURES
+
+
+def test_artifact_roundtrip_without_sklearn(tmp_path):
+    model = PIPELINES["logreg"]().fit(x_train, y_train)
+    joblib.dump(model, tmp_path / "LogisticRegression_Sleep.pkl")
+    export_model(model).save(str(tmp_path / "LogisticRegression_Sleep.numpy"), model_version="LogisticRegression_Sleep@v1")
+
+    loaded, version, features = load_from_file(str(tmp_path / "LogisticRegression_Sleep.numpy"))
+    assert isinstance(loaded, NumpyModel) and version == "LogisticRegression_Sleep@v1"
+    np.testing.assert_allclose(loaded.predict_proba(x_check), model.predict_proba(x_check), rtol=0, atol=1e-9)
+
+    # Загрузка и предсказание в чистом процессе не импортируют sklearn и joblib
+    script = (f"import sys, numpy as np; from serving.numpy_models import NumpyModel; "
+              f"m = NumpyModel.load({str(tmp_path / 'LogisticRegression_Sleep.numpy')!r}); "
+              f"m.predict_proba(np.zeros((1, {len(FEATURES)}))); "
+              f"print('sklearn' in sys.modules, 'joblib' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd="Fast_Api", check=True)
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_numpy_backend_in_model_store():
+    model = PIPELINES["gnb_scaled"]().fit(x_train, y_train)
+    serving = ModelStore(backend="numpy").prepare(model, "GaussianNB_Sleep@v1", {"kind": "file"})
+    assert isinstance(serving.model, NumpyModel)
+
+    # Деревья бэкенд numpy не поддерживает — ModelStore остаётся на нативной модели
+    tree_model = load_from_file("Fast_Api/models/RandomForest_Sleep.pkl")[0]
+    assert ModelStore(backend="numpy").prepare(tree_model, "rf", {"kind": "file"}).model is tree_model
+
+
+@pytest.mark.parametrize("model", [
+    Pipeline([("scaler", MinMaxScaler()), ("model", LogisticRegression())]),
+    SVC(probability=True),
+    KNeighborsClassifier(metric="chebyshev"),
+])
+def test_unsupported_models_are_rejected(model):
+    with pytest.raises(ValueError):
+        build_backend("numpy", model.fit(x_train, y_train))
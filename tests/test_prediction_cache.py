@@ -0,0 +1,107 @@
+import threading
+import time
+
+from serving.cache import PredictionCache, canonical_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.invalidate("v1")
+
+    for row in ([1.0], [2.0], [1.0], [3.0]):
+        cache.get_or_compute(canonical_key(row, "v1"), lambda: sum(row))
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["evictions"] == 1
+    # [2.0] был использован раньше всех и вытеснен, [1.0] остался
+    assert stats["size"] == 2
+    assert cache.get_or_compute(canonical_key([1.0], "v1"), lambda: -1) == 1.0
+
+
+def test_ttl_expiration():
+    clock = FakeClock()
+    cache = PredictionCache(max_size=10, ttl=5, clock=clock)
+    cache.invalidate("v1")
+    key = canonical_key([1.0, 2.0], "v1")
+
+    assert cache.get_or_compute(key, lambda: "old") == "old"
+    clock.now = 4.0
+    assert cache.get_or_compute(key, lambda: "new") == "old"
+    clock.now = 10.0
+    assert cache.get_or_compute(key, lambda: "new") == "new"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_key_canonicalization():
+    # Одинаковые после округления до float32 входы и -0.0/0.0 дают один ключ
+    assert canonical_key([0.1, -0.0], "v1") == canonical_key([0.1 + 1e-12, 0.0], "v1")
+    assert canonical_key([1.0], "v1") != canonical_key([1.0], "v2")
+
+
+def test_invalidate_on_model_change():
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.invalidate("v1")
+    cache.get_or_compute(canonical_key([1.0], "v1"), lambda: "v1 result")
+
+    cache.invalidate("v2")
+    assert cache.stats()["size"] == 0
+    assert cache.get_or_compute(canonical_key([1.0], "v2"), lambda: "v2 result") == "v2 result"
+
+
+def test_concurrent_identical_requests_are_collapsed():
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.invalidate("v1")
+    key = canonical_key([1.0], "v1")
+    calls = []
+    started = threading.Event()
+
+    def slow_compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_or_compute(key, slow_compute)))
+    first.start()
+    started.wait()
+    others = [threading.Thread(target=lambda: results.append(cache.get_or_compute(key, slow_compute)))
+              for _ in range(5)]
+    for t in others:
+        t.start()
+    for t in [first] + others:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["result"] * 6
+    assert cache.stats()["collapsed"] == 5
+
+
+def test_only_live_versions_are_cached():
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.invalidate("primary")
+    # Версия не загружена — мимо кэша, без промаха в счётчиках
+    assert cache.get_or_compute(canonical_key([1.0], "routed"), lambda: "a") == "a"
+    assert cache.get_or_compute(canonical_key([1.0], "routed"), lambda: "b") == "b"
+    assert cache.stats()["misses"] == 0 and cache.stats()["bypassed"] == 2
+
+    cache.track("routed")
+    cache.get_or_compute(canonical_key([1.0], "routed"), lambda: "c")
+    cache.get_or_compute(canonical_key([1.0], "primary"), lambda: "p")
+    assert cache.get_or_compute(canonical_key([1.0], "routed"), lambda: "d") == "c"
+    assert cache.stats()["versions"] == ["primary", "routed"]
+
+    # Вытеснение модели сбрасывает только её записи
+    cache.untrack("routed")
+    assert cache.stats()["size"] == 1
+    assert cache.get_or_compute(canonical_key([1.0], "primary"), lambda: "x") == "p"
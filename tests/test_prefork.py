@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+import run_api
+from serving.prefork import RestartPolicy, memory_report, smaps_rollup
+
+
+def test_load_model_skips_when_preloaded():
+    # Воркер после fork не должен грузить свою копию модели поверх загруженной мастером
+    run_api.load_model()
+    active = run_api.store.active
+    run_api.load_model()
+    assert run_api.store.active is active
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="smaps_rollup есть только в Linux")
+def test_memory_report_reads_smaps_rollup():
+    usage = smaps_rollup(os.getpid())
+    assert usage["Rss"] > 0
+    assert usage["Pss"] <= usage["Rss"]
+
+    rows = memory_report([("master", os.getpid())])
+    assert rows[0]["pid"] == os.getpid()
+    assert rows[0]["rss_mb"] == pytest.approx((usage["Rss"]) / 1024, abs=5)
+
+
+def test_restart_policy_backs_off_and_gives_up():
+    policy = RestartPolicy(min_uptime=10, base_delay=0.5, max_delay=3, max_failures=5)
+    # Падения сразу после старта: пауза растёт вдвое, не больше max_delay, затем мастер останавливается
+    assert [policy.delay(0.1) for _ in range(4)] == [0.5, 1.0, 2.0, 3]
+    assert policy.delay(0.1) is None
+
+    # Воркер, проживший дольше min_uptime, сбрасывает счётчик
+    policy = RestartPolicy(min_uptime=10, base_delay=0.5, max_failures=3)
+    assert [policy.delay(0.1), policy.delay(60), policy.delay(0.1)] == [0.5, 0.0, 0.5]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork только на POSIX")
+def test_master_stops_when_workers_fail_at_startup(monkeypatch):
+    import gc
+    import signal
+    from serving import prefork
+
+    # Воркер падает сразу после fork, как при ошибке конфигурации uvicorn
+    monkeypatch.setattr(prefork, "_run_worker", lambda app, sock: os._exit(3))
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1)}
+    try:
+        ok = prefork.serve(None, lambda: None, host="127.0.0.1", port=0, workers=2, report_delay=60,
+                           restart_policy=RestartPolicy(base_delay=0.05, max_failures=4))
+    finally:
+        gc.unfreeze()
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    assert ok is False
+
+
+def test_admin_reload_is_rejected_with_several_workers(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(run_api, "ADMIN_TOKEN", "test-admin-token")
+    monkeypatch.setattr(run_api, "API_WORKERS", 4)
+    with TestClient(run_api.app) as client:
+        response = client.post("/admin/reload", json={"kind": "file"}, headers={"X-Admin-Token": "test-admin-token"})
+    assert response.status_code == 409 and "MODEL_WATCH" in response.json()["detail"]
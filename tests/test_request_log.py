@@ -0,0 +1,108 @@
+import glob
+import json
+import os
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+import run_api
+from serving.request_log import RequestLog
+from serving.schema import FEATURES, LABELS
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+
+
+def _rows(n, start=0):
+    return np.arange(start, start + n, dtype=np.float64)[:, np.newaxis] * np.ones(len(FEATURES))
+
+
+def _read(directory, suffix=".parquet"):
+    paths = sorted(glob.glob(os.path.join(directory, "requests-*" + suffix)))
+    if suffix == ".parquet":
+        tables = [pq.read_table(path) for path in paths]
+    else:
+        import pyarrow as pa
+        tables = [pa.ipc.open_file(path).read_all() for path in paths]
+    return paths, [t.to_pandas() for t in tables]
+
+
+def test_flush_writes_rows_and_probabilities(tmp_path):
+    log = RequestLog(str(tmp_path), FEATURES, LABELS, capacity=16)
+    probs = np.array([[0.7, 0.2, 0.1], [0.1, 0.3, 0.6]])
+    # Столбцы probs идут в порядке classes_ модели, а не LABELS
+    log.append("/predict_batch", "v1", _rows(2), [2, 1], [0.7, 0.6], 1.5, probs=probs, classes=[2, 0, 1])
+    log.append("/predict", "v1", _rows(1, start=5), [0], [0.9], 0.5)
+    log.stop()
+
+    paths, frames = _read(str(tmp_path))
+    assert len(paths) == 1 and not glob.glob(os.path.join(str(tmp_path), "*.part"))
+    frame = frames[0]
+    assert list(frame.columns[:4]) == ["ts", "endpoint", "model_version", "latency_ms"]
+    assert frame["Age"].tolist() == [0.0, 1.0, 5.0]
+    assert frame["label"].tolist() == [2, 1, 0]
+    assert frame["proba_medium"].iloc[0] == pytest.approx(0.7)
+    assert frame["proba_bad"].iloc[0] == pytest.approx(0.2)
+    assert frame["proba_good"].iloc[1] == pytest.approx(0.6)
+    # Ответ без вероятностей: только уверенность
+    assert np.isnan(frame["proba_bad"].iloc[2]) and frame["confidence"].iloc[2] == pytest.approx(0.9)
+    assert log.stats()["written"] == 3
+
+
+def test_overflow_drops_and_counts(tmp_path):
+    log = RequestLog(str(tmp_path), FEATURES, LABELS, capacity=4)
+    log.append("/predict_batch", "v1", _rows(3), [0] * 3, [0.5] * 3, 1.0)
+    log.append("/predict_batch", "v1", _rows(3, start=3), [0] * 3, [0.5] * 3, 1.0)
+    assert log.stats()["buffered"] == 4
+    assert log.dropped == 2
+
+    # После сброса место освобождается; запись идёт через границу кольца
+    log.flush()
+    log.append("/predict_batch", "v1", _rows(3, start=10), [1] * 3, [0.5] * 3, 1.0)
+    log.stop()
+
+    _, frames = _read(str(tmp_path))
+    assert frames[0]["Age"].tolist() == [0.0, 1.0, 2.0, 3.0, 10.0, 11.0, 12.0]
+    assert log.stats()["dropped"] == 2
+
+
+def test_rotation_and_retention(tmp_path):
+    log = RequestLog(str(tmp_path), FEATURES, LABELS, capacity=16, rotate_rows=3, max_files=2, file_format="arrow")
+    for i in range(4):
+        log.append("/predict_batch", "v1", _rows(3, start=3 * i), [0] * 3, [0.5] * 3, 1.0)
+        log.flush()
+    log.stop()
+
+    paths, frames = _read(str(tmp_path), ".arrow")
+    assert log.files == 4
+    assert len(paths) == 2
+    assert [frame["Age"].tolist()[0] for frame in frames] == [6.0, 9.0]
+
+
+def test_api_requests_are_logged(tmp_path):
+    run_api.request_log = RequestLog(str(tmp_path), FEATURES, LABELS, flush_interval=60)
+    try:
+        with TestClient(run_api.app) as client:
+            for sample in samples:
+                assert client.post("/predict", json=sample).status_code == 200
+            assert client.post("/predict_batch", json=samples).status_code == 200
+            stats = client.get("/request_log/stats").json()
+    finally:
+        run_api.request_log = None
+
+    assert stats["enabled"] is True and stats["dropped"] == 0
+    assert stats["appended"] == 2 * len(samples)
+
+    _, frames = _read(str(tmp_path))
+    frame = frames[0]
+    assert frame["endpoint"].tolist() == ["/predict"] * len(samples) + ["/predict_batch"] * len(samples)
+    assert frame["model_version"].str.startswith("RandomForest_Sleep@").all()
+    assert frame["Age"].tolist()[:len(samples)] == [sample["Age"] for sample in samples]
+    # Вероятности есть у обоих эндпоинтов, в том числе у ответов /predict из кэша предсказаний
+    probs = frame[[f"proba_{label}" for label in LABELS]].to_numpy()
+    assert np.allclose(probs.sum(axis=1), 1.0, atol=1e-5)
+    assert np.allclose(probs[:len(samples)], probs[len(samples):], atol=1e-6)
+    assert (frame["latency_ms"] > 0).all()
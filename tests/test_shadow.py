@@ -0,0 +1,86 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.model_store import load_from_file
+from serving.settings import MODELS_DIR
+from serving.shadow import ShadowScorer
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+class ConstantModel:
+    """Претендент, который всегда отвечает одними и теми же вероятностями."""
+
+    classes_ = np.array([0, 1, 2])
+
+    def __init__(self, probs):
+        self.probs = np.asarray(probs)
+
+    def predict_proba(self, X):
+        return np.tile(self.probs, (len(X), 1))
+
+
+def test_agreement_and_deltas():
+    scorer = ShadowScorer(ConstantModel([0.1, 0.8, 0.1]), "const", sample_rate=1.0)
+    scorer.start()
+    try:
+        asyncio.run(scorer.submit([[0.0] * 10] * 3, [1, 1, 2], [0.6, 0.8, 0.5]))
+        scorer.join()
+    finally:
+        scorer.stop()
+
+    stats = scorer.stats()
+    assert stats["scored"] == 3
+    assert stats["agreement"] == pytest.approx(2 / 3, abs=1e-4)
+    assert stats["confusion"] == {"1->1": 2, "2->1": 1}
+    # |0.8 - 0.6|, |0.8 - 0.8|, |0.1 - 0.5|
+    assert stats["probability_delta"]["mean"] == pytest.approx(0.2, abs=1e-4)
+    assert stats["probability_delta"]["max"] == pytest.approx(0.4, abs=1e-4)
+    assert stats["challenger_latency_ms"]["count"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    # Поток оценки не запущен: очередь на одно задание заполняется первым же submit
+    scorer = ShadowScorer(ConstantModel([0.1, 0.8, 0.1]), "const", sample_rate=1.0, queue_size=1)
+    for _ in range(3):
+        asyncio.run(scorer.submit([[0.0] * 10] * 2, [1, 1], [0.8, 0.8]))
+    stats = scorer.stats()
+    assert stats["sampled"] == 6
+    assert stats["dropped"] == 4
+    assert stats["queued"] == 1
+
+
+def test_api_shadow_with_xgboost():
+    model, version, _ = load_from_file(f"{MODELS_DIR}/XGBoost_Sleep.pkl")
+    scorer = ShadowScorer(model, version, sample_rate=1.0)
+    run_api.shadow_scorer = scorer
+    try:
+        with TestClient(run_api.app) as client:
+            assert client.get("/shadow/stats").json()["challenger_version"].startswith("XGBoost_Sleep@")
+            scorer.start()
+            for sample in features:
+                assert client.post("/predict", json=sample).status_code == 200
+            assert client.post("/predict_batch", json=features).status_code == 200
+            scorer.join()
+            stats = client.get("/shadow/stats").json()
+    finally:
+        scorer.stop()
+        run_api.shadow_scorer = None
+
+    assert stats["enabled"] is True
+    assert stats["primary_version"].startswith("RandomForest_Sleep@")
+    assert stats["scored"] == 2 * len(features)
+    assert stats["dropped"] == 0
+    assert 0 <= stats["agreement"] <= 1
+    assert sum(stats["confusion"].values()) == 2 * len(features)
+
+
+def test_shadow_disabled_by_default():
+    with TestClient(run_api.app) as client:
+        assert client.get("/shadow/stats").json() == {"enabled": False}
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from run_api import app
+from serving.schema import FEATURES
+from serving.streaming import NdjsonFormat, score_stream, split_lines, LINE_TOO_LONG
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+async def _chunks(data, size, consumed=None):
+    for start in range(0, len(data), size):
+        if consumed is not None:
+            consumed.append(start)
+        yield data[start:start + size]
+
+
+def _collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+def test_split_lines_across_chunks():
+    data = b"ab\ncdef\n\nxyz"
+    lines = _collect(split_lines(_chunks(data, 3), max_line_bytes=10))
+    assert lines == [b"ab", b"cdef", b"", b"xyz"]
+
+    # Слишком длинная строка отмечается и пропускается до перевода строки
+    lines = _collect(split_lines(_chunks(b"ok\n" + b"x" * 50 + b"\nnext\n", 4), max_line_bytes=8))
+    assert lines == [b"ok", LINE_TOO_LONG, b"next"]
+
+
+def test_stream_scores_chunks_before_input_ends():
+    body = "".join(json.dumps(features[i % len(features)]) + "\n" for i in range(100)).encode()
+    consumed, batch_sizes, outputs = [], [], []
+
+    async def score(X):
+        batch_sizes.append(len(X))
+        return np.ones(len(X), dtype=int), np.full(len(X), 0.7), np.tile([0.2, 0.7, 0.1], (len(X), 1))
+
+    async def run():
+        stream = score_stream(_chunks(body, 256, consumed), NdjsonFormat(), score, chunk_rows=16)
+        async for piece in stream:
+            outputs.append((len(consumed), piece))
+
+    asyncio.run(run())
+    # Модель вызывается пакетами фиксированного размера, а ответ по первому пакету уходит
+    # задолго до конца входа — в памяти никогда не больше одного пакета
+    assert batch_sizes == [16] * 6 + [4]
+    assert outputs[0][0] < len(consumed) // 2
+    rows = [json.loads(line) for _, piece in outputs for line in piece.decode().splitlines()]
+    assert [r["row"] for r in rows] == list(range(100))
+    assert all(r["sleep_quality"] == "good" for r in rows)
+
+
+def test_ndjson_stream_matches_batch_with_inline_errors(client):
+    lines = [json.dumps(sample) for sample in features]
+    lines.insert(2, '{"Age": "много"}')
+    lines.insert(4, "not json")
+    response = client.post("/predict_stream", content="\n".join(lines) + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["x-model-version"].startswith("RandomForest_Sleep@")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == len(features) + 2
+    assert "Age" in rows[2]["error"] and "error" in rows[4]
+
+    batch = client.post("/predict_batch", json=features).json()["predictions"]
+    scored = [r for r in rows if "error" not in r]
+    assert [r["sleep_efficiency_label"] for r in scored] == [b["sleep_efficiency_label"] for b in batch]
+    assert [r["confidence"] for r in scored] == [b["confidence"] for b in batch]
+
+
+def test_csv_stream(client):
+    header = ",".join(FEATURES)
+    lines = [header] + [",".join(str(sample[f]) for f in FEATURES) for sample in features] + ["1,2,3"]
+    response = client.post("/predict_stream", content="\r\n".join(lines), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+
+    out = response.text.splitlines()
+    assert out[0] == "row,sleep_efficiency_label,sleep_quality,confidence,error"
+    assert len(out) == len(features) + 2
+    assert out[-1].startswith(f"{len(features)},,,,") and "столбцов" in out[-1]
+
+
+def test_stream_unsupported_content_type(client):
+    response = client.post("/predict_stream", json=features)
+    assert response.status_code == 415
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from fastapi.testclient import TestClient
+
+import run_api
+from serving.tracing import (SpanContext, SpanExporter, Tracer, group_traces, load_spans, new_span_id,
+                             new_trace_id, parse_traceparent)
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    samples = json.load(f)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_traceparent_roundtrip_and_invalid_headers():
+    context = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (TRACE_ID, PARENT_ID, True)
+    assert context.traceparent() == f"00-{TRACE_ID}-{PARENT_ID}-01"
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled is False
+
+    for header in (None, "", "garbage", f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{TRACE_ID}-{'0' * 16}-01",
+                   f"ff-{TRACE_ID}-{PARENT_ID}-01", f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+                   f"00-{TRACE_ID}-{PARENT_ID}-01-extra"):
+        assert parse_traceparent(header) is None
+    assert len(new_trace_id()) == 32 and len(new_span_id()) == 16
+
+
+def test_sampling_follows_parent_and_rate(tmp_path):
+    tracer = Tracer(SpanExporter(path=str(tmp_path / "spans.jsonl")), sample_rate=0.0)
+    # Выборку решил отправитель: флаг sampled важнее своей доли
+    assert tracer.start(f"00-{TRACE_ID}-{PARENT_ID}-01").trace_id == TRACE_ID
+    assert tracer.start(f"00-{TRACE_ID}-{PARENT_ID}-00") is None
+    # Своя трасса — с долей sample_rate
+    assert tracer.start(None) is None
+    tracer.sample_rate = 1.0
+    root = tracer.start(None)
+    assert root.sampled and root.span_id is None
+    assert (tracer.sampled, tracer.unsampled) == (2, 2)
+    # Без файла и сборщика трассировка выключена
+    assert Tracer(SpanExporter(), sample_rate=1.0).start(f"00-{TRACE_ID}-{PARENT_ID}-01") is None
+
+
+def test_exporter_batches_and_drops_when_full(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanExporter(path=str(path), batch_size=3, flush_interval=60, queue_size=5)
+    context = SpanContext(TRACE_ID, PARENT_ID, True)
+    spans = [{"trace_id": context.trace_id, "span_id": new_span_id(), "name": f"s{i}"} for i in range(7)]
+
+    started = time.perf_counter()
+    exporter.export(spans)
+    # export только кладёт в очередь: файла ещё нет
+    assert time.perf_counter() - started < 0.05 and not path.exists()
+    assert exporter.stats()["queued"] == 5 and exporter.dropped == 2
+
+    exporter.flush()
+    assert exporter.exported == 5 and exporter.batches == 2
+    assert [span["name"] for span in load_spans([str(path)])] == [f"s{i}" for i in range(5)]
+
+
+def test_exporter_posts_batches_to_collector():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = SpanExporter(url=f"http://127.0.0.1:{server.server_port}", batch_size=2, flush_interval=0.05)
+        exporter.start()
+        exporter.export([{"name": "a"}, {"name": "b"}, {"name": "c"}])
+        exporter.stop()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [[span["name"] for span in batch] for batch in received] == [["a", "b"], ["c"]]
+    assert exporter.exported == 3 and exporter.lost == 0
+
+
+def test_api_request_spans_join_parent_trace(tmp_path):
+    path = tmp_path / "api.jsonl"
+    exporter = run_api.tracer.exporter
+    run_api.tracer.exporter = SpanExporter(path=str(path), flush_interval=60)
+    try:
+        with TestClient(run_api.app) as client:
+            traced = client.post("/predict", json=samples[0], params={"explain": "true"},
+                                 headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+            unsampled = client.post("/predict", json=samples[1],
+                                    headers={"traceparent": f"00-{'a' * 32}-{PARENT_ID}-00"})
+            stats = client.get("/tracing/stats").json()
+            metrics = client.get("/metrics").text
+    finally:
+        run_api.tracer.exporter = exporter
+
+    assert traced.status_code == unsampled.status_code == 200
+    assert stats["enabled"] and stats["unsampled"] >= 1
+    assert 'sleep_api_trace_spans_total{result="dropped"}' in metrics
+
+    traces = group_traces(load_spans([str(path)]))
+    # Невыбранный запрос не пишется; сервисные запросы без traceparent — отдельные трассы
+    assert "a" * 32 not in traces
+    spans = traces[TRACE_ID]
+    request = next(span for span in spans if span["parent_id"] == PARENT_ID)
+    assert request["name"] == "POST /predict"
+    assert request["attributes"]["http.status_code"] == 200 and request["attributes"]["model_version"]
+
+    stages = [span for span in spans if span["parent_id"] == request["span_id"]]
+    names = [span["name"] for span in stages]
+    assert names[0] == "validation" and names[-1] == "serialization"
+    assert "explain" in names and ("inference" in names or "answer_table" in names)
+    # Этапы идут подряд внутри запроса
+    assert all(request["start"] <= span["start"] for span in stages)
+    assert sum(span["duration_ms"] for span in stages) <= request["duration_ms"] + 0.01
@@ -0,0 +1,94 @@
+import json
+import os
+import joblib
+import numpy as np
+import pytest
+
+from serving.settings import MODELS_DIR
+from serving.tree_engine import CompiledForest, compile_model
+
+# === Загрузка тестовых данных ===
+with open("tests/Json_test_samples/api_test_features_collinearity.json") as f:
+    features = np.array([list(sample.values()) for sample in json.load(f)], dtype=np.float64)
+
+
+def _load(file_name):
+    if file_name.startswith("XGBoost"):
+        pytest.importorskip("xgboost")
+    return joblib.load(os.path.join(MODELS_DIR, file_name))
+
+
+@pytest.mark.parametrize("file_name", ["RandomForest_Sleep.pkl", "XGBoost_Sleep.pkl"])
+def test_compiled_matches_native_bit_for_bit(file_name):
+    native = _load(file_name)
+    compiled = compile_model(native)
+
+    # Пакетом и поштучно: вероятности должны совпадать побитово
+    assert np.array_equal(native.predict_proba(features), compiled.predict_proba(features))
+    for row in features:
+        assert np.array_equal(native.predict_proba(row[np.newaxis]), compiled.predict_proba(row[np.newaxis]))
+
+    assert np.array_equal(native.predict(features), compiled.predict(features))
+
+
+def test_compiled_forest_on_split_thresholds():
+    native = _load("RandomForest_Sleep.pkl")
+    compiled = compile_model(native)
+
+    # Значения признаков ровно на порогах и на следующем float32 после порога
+    forest = native.named_steps["model"]
+    rng = np.random.default_rng(0)
+    X = features[rng.integers(0, len(features), 500)].copy()
+    tree = forest.estimators_[0].tree_
+    split = tree.feature >= 0
+    columns = tree.feature[split][:len(X)]
+    thresholds = tree.threshold[split][:len(X)]
+    rows = np.arange(len(columns))
+
+    X[rows, columns] = thresholds
+    assert np.array_equal(native.predict_proba(X), compiled.predict_proba(X))
+
+    X[rows, columns] = np.nextafter(thresholds.astype(np.float32), np.float32(np.inf))
+    assert np.array_equal(native.predict_proba(X), compiled.predict_proba(X))
+
+
+@pytest.mark.parametrize("file_name", ["RandomForest_Sleep.pkl", "XGBoost_Sleep.pkl"])
+def test_artifact_roundtrip_is_mmapped_and_exact(file_name, tmp_path):
+    native = _load(file_name)
+    path = str(tmp_path / "model.compiled")
+    compile_model(native).save(path, model_version="test@1")
+
+    loaded = CompiledForest.load(path)
+    assert loaded.model_version == "test@1"
+    assert isinstance(loaded.feature.base, np.memmap)
+    assert np.array_equal(native.predict_proba(features), loaded.predict_proba(features))
+
+
+def test_xgboost_base_score_formats():
+    from serving.tree_engine import _compile_xgboost
+
+    xgb_model = _load("XGBoost_Sleep.pkl").named_steps["model"]
+    raw = json.loads(xgb_model.get_booster().save_raw("json"))
+
+    class Booster:
+        def __init__(self, base_score):
+            raw["learner"]["learner_model_param"]["base_score"] = base_score
+            self.raw = json.dumps(raw).encode()
+
+        def save_raw(self, raw_format):
+            return self.raw
+
+    class Model:
+        classes_ = xgb_model.classes_
+
+        def __init__(self, base_score):
+            self.booster = Booster(base_score)
+
+        def get_booster(self):
+            return self.booster
+
+    # Число (XGBoost < 3.0) и список из одного значения (XGBoost >= 3.0)
+    assert _compile_xgboost(Model("5E-1")).base_score == np.float32(0.5)
+    assert _compile_xgboost(Model("[2.5E-1]")).base_score == np.float32(0.25)
+    with pytest.raises(ValueError, match="base_score"):
+        _compile_xgboost(Model("[5E-1,5E-1,5E-1]"))
@@ -1,10 +1,12 @@
 import json
+import time
 import asyncio
 import logging
 from aiohttp import ClientSession
 from bot.questions import questions
 from bot.utils import convert_to_12_hour, format_answers_for_api, validate_sleep_data, generate_advice
 from bot.session import user_data, user_results
+from bot.tracing import SurveyTrace
 from config.token import API_TOKEN, FASTAPI_URL
 from aiogram import Router, types, F
 from aiogram.filters import Command
@@ -54,7 +56,8 @@ async def help_command(message: types.Message):
 @router.message(Command("check"))
 async def check_start(message: types.Message):
     user_id = message.from_user.id
-    user_data[user_id] = {"step": 0, "answers": {}, "message": None}
+    # Трасса опроса: от /check до ответа с предсказанием
+    user_data[user_id] = {"step": 0, "answers": {}, "message": None, "trace": SurveyTrace()}
 
     sent = await message.answer("🧾 Начинаем опрос...")
     user_data[user_id]["message"] = sent
@@ -73,6 +76,8 @@ async def ask_question(user_id: int, bot: Bot):
 
     # Завершение опроса и отправка данных в API
     if step >= len(questions):
+        trace = user_data[user_id]["trace"]
+        trace.record("questions", trace.started, time.time(), questions=len(questions))
         await bot.send_message(user_id, "🔄 Анализирую твой сон...")
         await asyncio.sleep(1)
         answers = user_data[user_id]["answers"]
@@ -80,19 +85,27 @@ async def ask_question(user_id: int, bot: Bot):
 
         if not validate_sleep_data(payload):
             await bot.send_message(user_id, "⚠️ Некоторые значения некорректны. Попробуй /check заново.")
+            trace.finish(outcome="invalid")
             user_data.pop(user_id, None)
             return
 
         label = None
         label_text = None
+        explanation = None
 
+        api_span = trace.span("api_call")
         try:
             async with ClientSession() as session:
-                async with session.post(FASTAPI_URL, json=payload, timeout=10) as resp:
+                # explain=true: API возвращает вклады признаков, по ним ранжируются советы.
+                # traceparent: спаны API попадают в трассу опроса под api_call
+                async with session.post(FASTAPI_URL, json=payload, params={"explain": "true"}, timeout=10,
+                                        headers=api_span.headers()) as resp:
+                    api_span.end(status=resp.status)
                     if resp.status == 200:
                         try:
                             result = await resp.json()
                             label = result.get("sleep_efficiency_label", -1)
+                            explanation = result.get("explanation")
                             label_map = {
                                 0: "❌ Плохой сон",
                                 1: "✅ Хороший сон",
@@ -101,37 +114,43 @@ async def ask_question(user_id: int, bot: Bot):
                             label_text = label_map.get(label, "неизвестно")
                             # Сохраняем результат и советы
                             user_data[user_id]["last_label"] = label_text
-                            user_data[user_id]["last_advice"] = generate_advice(user_data[user_id]["answers"], label)
+                            user_data[user_id]["last_advice"] = generate_advice(
+                                user_data[user_id]["answers"], label, explanation)
 
                             # Отправляем сообщение
+                            reply_span = trace.span("reply")
                             await bot.send_message(
                                 user_id,
                                 f"🧠 Предсказание модели: <b>{label_text}</b>\n\n{user_data[user_id]['last_advice']}",
                                 parse_mode="HTML"
                             )
+                            reply_span.end()
                         except json.JSONDecodeError:
                             logging.exception("Ошибка декодирования JSON-ответа API")
                             await bot.send_message(user_id, "⚠️ Сервер вернул некорректный ответ.")
                     else:
                         await bot.send_message(user_id, f"⚠️ Ошибка от API: {resp.status}")
         except asyncio.TimeoutError:
+            api_span.end(error="timeout")
             await bot.send_message(user_id, "⏱️ Превышено время ожидания ответа от сервера.")
-        except Exception:
+        except Exception as e:
+            api_span.end(error=type(e).__name__)
             logging.exception("Ошибка при обращении к API")
             await bot.send_message(user_id, "❌ Произошла ошибка при анализе. Попробуй позже.")
 
         user_results[user_id] = {
             "label": label_text,
-            "advice": generate_advice(user_data[user_id]["answers"], label)
+            "advice": generate_advice(user_data[user_id]["answers"], label, explanation)
         }
         if label_text is not None and label is not None:
             user_results[user_id] = {
                 "label": label_text,
-                "advice": generate_advice(user_data[user_id]["answers"], label)
+                "advice": generate_advice(user_data[user_id]["answers"], label, explanation)
             }
         else:
             user_results.pop(user_id, None)
 
+        trace.finish(label=label)
         user_data.pop(user_id, None)
         return
 
@@ -0,0 +1,162 @@
+import collections
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+from config.token import BOT_TRACE_SAMPLE_RATE, BOT_TRACE_FILE, BOT_TRACE_COLLECTOR_URL
+
+# === Трассировка опроса ===
+#
+# На каждый опрос (/check) открывается трасса. Корневой спан survey длится от /check до ответа
+# пользователю, внутри него — questions (время ответов пользователя), api_call (запрос к API)
+# и reply (отправка результата). Контекст передаётся в API заголовком W3C traceparent с
+# span_id спана api_call, так что спаны API (validation, inference, serialization) ложатся
+# под него в той же трассе.
+#
+# Формат спанов и экспорт — как в Fast_Api/serving/tracing.py (бот разворачивается отдельно,
+# поэтому модуль свой): строки JSON в BOT_TRACE_FILE и/или POST в BOT_TRACE_COLLECTOR_URL,
+# пачками из фонового потока. Выборку решает бот (BOT_TRACE_SAMPLE_RATE) и передаёт её флагом
+# traceparent в каждом запросе, выбранном или нет, — API её соблюдает.
+
+SERVICE = "sleep-bot"
+
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class SpanExporter:
+    """Фоновая запись спанов пачками; handler только кладёт их в очередь, при переполнении — отбрасывает."""
+
+    def __init__(self, path="", url="", flush_interval=2.0, queue_size=4096, timeout=2.0):
+        self.path = path
+        self.url = url
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path or self.url)
+
+    def export(self, spans):
+        with self._lock:
+            accepted = spans[:max(self.queue_size - len(self._queue), 0)]
+            self._queue.extend(accepted)
+            self.dropped += len(spans) - len(accepted)
+            if self._thread is None:
+                # Поток запускается при первой трассе — под блокировкой, чтобы два первых опроса
+                # не запустили два потока
+                self._thread = threading.Thread(target=self._run, name="bot-span-exporter", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+        if not batch:
+            return
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(span, ensure_ascii=False) + "\n" for span in batch))
+            if self.url:
+                request = urllib.request.Request(self.url, data=json.dumps(batch).encode(), method="POST",
+                                                 headers={"Content-Type": "application/json"})
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+        except Exception:
+            logging.exception(f"Не удалось записать {len(batch)} спанов")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        """Останавливает фоновый поток и сбрасывает остаток очереди (при остановке бота)."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+exporter = SpanExporter(path=BOT_TRACE_FILE, url=BOT_TRACE_COLLECTOR_URL)
+
+
+class Span:
+    """Дочерний спан трассы опроса: время идёт с создания до end()."""
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.start = time.time()
+        self.ended = False
+
+    def headers(self):
+        """
+        Заголовки запроса, в котором этот спан — родитель (пусто, если трассировка не настроена).
+
+        Невыбранный опрос тоже передаёт traceparent — с флагом 00: иначе API сочтёт запрос началом
+        трассы и выберет его по своей TRACE_SAMPLE_RATE, без родителя в трассе бота.
+        """
+        if not exporter.enabled:
+            return {}
+        return {"traceparent": f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"}
+
+    def end(self, **attributes):
+        """Закрывает спан; повторный вызов (например, из обработчика ошибки) ничего не делает."""
+        if self.ended:
+            return
+        self.ended = True
+        self.trace.record(self.name, self.start, time.time(), span_id=self.span_id, **attributes)
+
+
+class SurveyTrace:
+    """Трасса одного опроса; решение о выборке принимается при /check."""
+
+    def __init__(self):
+        self.trace_id = _new_id(128)
+        self.root_id = _new_id(64)
+        self.started = time.time()
+        self.sampled = exporter.enabled and random.random() < BOT_TRACE_SAMPLE_RATE
+        self.spans = []
+
+    def _append(self, name, start, end, span_id, parent_id, attributes):
+        self.spans.append({
+            "trace_id": self.trace_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "service": SERVICE,
+            "start": round(start, 6),
+            "duration_ms": round((end - start) * 1000, 3),
+            "attributes": attributes,
+        })
+
+    def record(self, name, start, end, span_id=None, **attributes):
+        """Дочерний спан корня survey."""
+        if self.sampled:
+            self._append(name, start, end, span_id or _new_id(64), self.root_id, attributes)
+
+    def span(self, name):
+        return Span(self, name)
+
+    def finish(self, **attributes):
+        """Закрывает корневой спан survey и отдаёт все спаны трассы экспортёру."""
+        if not self.sampled:
+            return
+        self._append("survey", self.started, time.time(), self.root_id, None, attributes)
+        exporter.export(self.spans)
+        self.spans = []
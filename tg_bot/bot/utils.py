@@ -48,52 +48,66 @@ def validate_sleep_data(data: dict) -> bool:
     )
 
 
-def generate_advice(data: dict, label: int) -> str:
+def generate_advice(data: dict, label: int, explanation: dict = None) -> str:
     """
     Генерация персональных советов по улучшению сна
     на основе введённых пользователем данных и важности признаков.
+
+    Если API вернул объяснение предсказания (POST /predict?explain=true), советы
+    упорядочиваются по тому, насколько соответствующий признак снизил у пользователя
+    вероятность хорошего сна: первым идёт то, что сильнее всего тянуло прогноз вниз.
     """
-    advice = ["💡 <b>Персональные рекомендации:</b>"]
+    # Каждый совет привязан к признакам модели, к которым он относится
+    items = []
 
     # --- Awakenings ---
     if data.get("Awakenings", 0) > 2:
-        advice.append("• Старайтесь сократить количество пробуждений — возможно, стоит проветрить комнату или подобрать удобную подушку.")
+        items.append((("Awakenings",), "• Старайтесь сократить количество пробуждений — возможно, стоит проветрить комнату или подобрать удобную подушку."))
     elif data.get("Awakenings", 0) == 0:
-        advice.append("• Отлично! Вы спите без пробуждений — сохраняйте этот режим.")
+        items.append((("Awakenings",), "• Отлично! Вы спите без пробуждений — сохраняйте этот режим."))
 
     # --- Alcohol ---
     if data.get("Alcohol_consumption", 0) > 3:
-        advice.append("• Алкоголь перед сном снижает качество сна. Постарайтесь не употреблять за 3–4 часа до сна.")
+        items.append((("Alcohol_consumption",), "• Алкоголь перед сном снижает качество сна. Постарайтесь не употреблять за 3–4 часа до сна."))
     elif 0 < data.get("Alcohol_consumption", 0) <= 3:
-        advice.append("• Даже умеренное употребление алкоголя может влиять на фазы сна.")
+        items.append((("Alcohol_consumption",), "• Даже умеренное употребление алкоголя может влиять на фазы сна."))
 
     # --- Exercise ---
     if data.get("Exercise_frequency", 0) == 0:
-        advice.append("• Добавьте лёгкую физическую активность — прогулку или растяжку в течение дня.")
+        items.append((("Exercise_frequency",), "• Добавьте лёгкую физическую активность — прогулку или растяжку в течение дня."))
     elif data.get("Exercise_frequency", 0) > 5:
-        advice.append("• Слишком частые тренировки могут вызывать переутомление. Добавьте день отдыха.")
+        items.append((("Exercise_frequency",), "• Слишком частые тренировки могут вызывать переутомление. Добавьте день отдыха."))
 
     # --- Smoking ---
     if data.get("Smoking_status", 0) == 1:
-        advice.append("• Курение ухудшает насыщение кислородом и мешает засыпанию. Попробуйте сократить количество сигарет.")
+        items.append((("Smoking_status",), "• Курение ухудшает насыщение кислородом и мешает засыпанию. Попробуйте сократить количество сигарет."))
 
     # --- Sleep Duration ---
     sleep_dur = data.get("Sleep_duration", 7)
     if sleep_dur < 6:
-        advice.append("• Попробуйте спать дольше 6 часов. Недосып снижает восстановление мозга и памяти.")
+        items.append((("Sleep_duration",), "• Попробуйте спать дольше 6 часов. Недосып снижает восстановление мозга и памяти."))
     elif sleep_dur > 9:
-        advice.append("• Слишком долгий сон тоже может указывать на усталость или стресс. Оптимум — 7–9 часов.")
+        items.append((("Sleep_duration",), "• Слишком долгий сон тоже может указывать на усталость или стресс. Оптимум — 7–9 часов."))
 
     # --- Wake and Bed Time ---
     wake = data.get("wake_hour", 7)
     bed = data.get("bed_hour", 23)
     # bed — это 12-часовое время, где 12 = полночь
     if bed in [12, 1, 2, 3, 4] or wake < 5:
-        advice.append("• Вы ложитесь поздно или слишком рано встаёте. Попробуйте спать в диапазоне 22:00–7:00.")
+        items.append((("bed_hour", "wake_hour"), "• Вы ложитесь поздно или слишком рано встаёте. Попробуйте спать в диапазоне 22:00–7:00."))
     # --- Age ---
     age = data.get("Age", 25)
     if age > 60:
-        advice.append("• С возрастом сон становится более поверхностным. Попробуйте вечерние расслабляющие практики (чай с ромашкой, медитация).")
+        items.append((("Age",), "• С возрастом сон становится более поверхностным. Попробуйте вечерние расслабляющие практики (чай с ромашкой, медитация)."))
+
+    advice = ["💡 <b>Персональные рекомендации:</b>"]
+    good = (explanation or {}).get("contributions", {}).get("good")
+    if good:
+        # Самый отрицательный вклад в «хороший сон» — первым; sorted устойчив к равенствам
+        items = sorted(items, key=lambda item: sum(good.get(feature, 0.0) for feature in item[0]))
+        advice[0] = "💡 <b>Персональные рекомендации</b> (сначала — что сильнее всего влияет на ваш прогноз):"
+    advice.extend(text for _, text in items)
+
     # --- Итог по качеству сна ---
     if label == 0:
         advice.append("\n😴 Ваш сон нуждается в улучшении. Попробуйте применить несколько советов выше.")
@@ -103,4 +117,3 @@ def generate_advice(data: dict, label: int) -> str:
         advice.append("\n🌀 Сон средний — можно улучшить, Попробуйте применить несколько советов выше.")
 
     return "\n".join(advice)
-
@@ -9,3 +9,9 @@ load_dotenv(ENV_PATH)
 
 API_TOKEN = os.getenv("BOT_TOKEN")
 FASTAPI_URL = os.getenv("FASTAPI_URL")
+
+# Трассировка опроса (bot/tracing.py): доля трасс, файл спанов (JSON Lines) и/или адрес сборщика;
+# без файла и адреса трассы не пишутся и traceparent в API не передаётся
+BOT_TRACE_SAMPLE_RATE = float(os.getenv("BOT_TRACE_SAMPLE_RATE", 1.0))
+BOT_TRACE_FILE = os.getenv("BOT_TRACE_FILE", "")
+BOT_TRACE_COLLECTOR_URL = os.getenv("BOT_TRACE_COLLECTOR_URL", "")
@@ -5,6 +5,7 @@ from aiogram import Bot, Dispatcher, F, types
 from aiogram.filters import CommandStart, Command
 from config.token import API_TOKEN, FASTAPI_URL
 from bot.handlers import router
+from bot.tracing import exporter
 
 # Настройка логирования
 os.makedirs("logs", exist_ok=True)
@@ -27,3 +28,6 @@ if __name__ == "__main__":
         asyncio.run(dp.start_polling(bot))
     except Exception as e:
         logging.exception("Фатальная ошибка при запуске бота")
+    finally:
+        # Последняя пачка спанов иначе теряется при остановке и передеплое
+        exporter.stop()